@@ -18,7 +18,11 @@ sys.path.append(parent_dir)
 
 
 from src.config import DATA_DIR
-from src.inference import fetch_next_hour_predictions, load_batch_of_features_from_store
+from src.inference import (
+    fetch_multi_horizon_predictions,
+    fetch_next_hour_predictions,
+    load_batch_of_features_from_store,
+)
 from src.plot_utils import plot_prediction
 
 # Set the GDAL configuration to restore SHX files
@@ -160,6 +164,7 @@ with st.spinner("Fetching batch of inference data"):
 
 with st.spinner("Fetching predictions"):
     predictions = fetch_next_hour_predictions()
+    forecast = fetch_multi_horizon_predictions()
     st.sidebar.write("Model was loaded from the registry")
     progress_bar.progress(3 / N_STEPS)
 
@@ -216,13 +221,15 @@ if selected_option == "Top 10 Locations":
         st.markdown(f"### Taxi Zone: {display_label}")
         filtered_features = features[features["pickup_location_id"] == loc_id]
         filtered_predictions = predictions[predictions["pickup_location_id"] == loc_id]
+        filtered_forecast = forecast[forecast["pickup_location_id"] == loc_id]
         if not filtered_features.empty and not filtered_predictions.empty:
-            fig = plot_prediction(filtered_features, filtered_predictions)
+            fig = plot_prediction(filtered_features, filtered_predictions, filtered_forecast)
             st.plotly_chart(fig, theme="streamlit", use_container_width=True)
 else:
     st.subheader(f"Prediction Details for Taxi Zone: {selected_option}")
     filtered_features = features[features["pickup_location_id"] == highlight_id]
     filtered_predictions = predictions[predictions["pickup_location_id"] == highlight_id]
+    filtered_forecast = forecast[forecast["pickup_location_id"] == highlight_id]
     if not filtered_features.empty and not filtered_predictions.empty:
-        fig = plot_prediction(filtered_features, filtered_predictions)
+        fig = plot_prediction(filtered_features, filtered_predictions, filtered_forecast)
         st.plotly_chart(fig, theme="streamlit", use_container_width=True)
@@ -1,29 +1,62 @@
-import joblib
-from hsml.model_schema import ModelSchema
-from hsml.schema import Schema
-from sklearn.metrics import mean_absolute_error
+import logging
+import os
+import resource
+import sys
+
+import pandas as pd
 
 import src.config as config
-from src.data_utils import transform_ts_data_info_features_and_target
+from src.backtest import backtest, compare_on_unseen_rows, registration_decision
+from src.feature_store import get_feature_store_backend
 from src.inference import (
     fetch_days_data,
-    get_hopsworks_project,
     load_metrics_from_registry,
     load_model_from_registry,
 )
-from src.pipeline_utils import get_pipeline
+from src.pipeline_utils import (
+    build_training_matrix,
+    feature_frame,
+    fit_pipeline_on_matrix,
+    get_pipeline,
+    warm_start_pipeline,
+)
+from src.retraining import (
+    choose_training_mode,
+    decayed_sample,
+    holdout_split,
+    rows_since,
+    score_new_rows,
+    trained_until,
+    warm_start_helped,
+)
+from src.time_series import TimeSeriesTensor
+from src.tuning import cache_training_matrix, prune_training_matrices
+
+# Configure logging (progress of the tuning and backtest modules)
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    handlers=[
+        logging.StreamHandler(sys.stdout),
+    ],
+)
 
 print(f"Fetching data from group store ...")
 ts_data = fetch_days_data(180)
 
 print(f"Transforming to ts_data ...")
 
-features, targets = transform_ts_data_info_features_and_target(
-    ts_data, window_size=24 * 28, step_size=23
+# One float32 matrix serves the tuning trials, the fit and the backtest. Only the keys
+# (pickup_location_id, pickup_hour) of its rows are kept as a frame; the feature table
+# is rebuilt just for the rows a fitted pipeline predicts on
+ts_tensor = TimeSeriesTensor.from_long(ts_data)
+matrix, targets, keys, feature_names = build_training_matrix(
+    ts_tensor, window_size=24 * 28, step_size=23
 )
+targets = pd.Series(targets, name="target")
 
 
-best_parameters = {"bagging_fraction": 0.7,
+fixed_parameters = {"bagging_fraction": 0.7,
     "bagging_freq": 1,
     "colsample_bytree": 0.6,
     "feature_fraction": 0.6,
@@ -34,36 +67,153 @@ best_parameters = {"bagging_fraction": 0.7,
     "reg_alpha": 1.0,
     "reg_lambda": 0.1}
 
-pipeline = get_pipeline(**best_parameters)
-print(f"Training model ...")
+# Continue the registered model on the hours it has not seen, unless its MAE on them
+# drifted from its backtest MAE; then retrain from scratch
+metric = load_metrics_from_registry()
+registered = load_model_from_registry() if metric is not None else None
+new_rows, recent_mae = None, None
+if metric is not None and "trained_until" in metric:
+    new_rows = rows_since(keys, metric["trained_until"])
+    recent_mae = score_new_rows(
+        registered, feature_frame(matrix, keys, feature_names, new_rows), targets[new_rows]
+    )
 
-pipeline.fit(features, targets)
+mode, reason = choose_training_mode(metric, recent_mae)
+if config.RETRAIN_MODE == "full":
+    mode, reason = "full", "RETRAIN_MODE is full"
+elif config.RETRAIN_MODE == "warm" and recent_mae is not None:
+    mode, reason = "warm", "RETRAIN_MODE is warm"
+print(f"Training mode: {mode} ({reason})")
 
-predictions = pipeline.predict(features)
+if mode == "warm":
+    # The last new hours are held out to check that the warm start actually helps
+    fit_rows, holdout_rows = holdout_split(
+        keys, new_rows, config.WARM_START_HOLDOUT_DAYS
+    )
+    if not fit_rows.any() or not holdout_rows.any():
+        mode = "full"
+        print("Too few new hours to validate a warm start; retraining from scratch")
 
-test_mae = mean_absolute_error(targets, predictions)
-metric = load_metrics_from_registry()
+if mode == "warm":
+    warm_keys, warm_targets = decayed_sample(
+        keys, targets, fit_rows, config.WARM_START_HALF_LIFE_DAYS
+    )
+    warm_features = feature_frame(matrix, keys, feature_names, warm_keys.index)
+    print(f"Continuing the registered model on {len(warm_features)} rows ...")
+    pipeline = warm_start_pipeline(registered, warm_features, warm_targets)
+
+    helped, warm_mae, holdout_mae = warm_start_helped(
+        pipeline,
+        registered,
+        feature_frame(matrix, keys, feature_names, holdout_rows),
+        targets[holdout_rows],
+    )
+    print(
+        f"Held-out MAE of the warm-started model {warm_mae:.4f}, "
+        f"of the registered model {holdout_mae:.4f}"
+    )
+    if not helped:
+        mode = "full"
+        print("The warm start made the model worse; retraining from scratch")
 
-print(f"The new MAE is {test_mae:.4f}")
-print(f"The previous MAE is {metric['test_mae']:.4f}")
-
-if test_mae < metric.get("test_mae"):
-    print(f"Registering new model")
-    model_path = config.MODELS_DIR / "lgb_model.pkl"
-    joblib.dump(pipeline, model_path)
-
-    input_schema = Schema(features)
-    output_schema = Schema(targets)
-    model_schema = ModelSchema(input_schema=input_schema, output_schema=output_schema)
-    project = get_hopsworks_project()
-    model_registry = project.get_model_registry()
-
-    model = model_registry.sklearn.create_model(
-        name="taxi_demand_predictor_next_hour",
-        metrics={"test_mae": test_mae},
-        input_example=features.sample(),
-        model_schema=model_schema,
+if mode == "warm":
+    print("Registering warm-started model")
+    get_feature_store_backend().register_model(
+        name=config.MODEL_NAME,
+        model=pipeline,
+        metrics={
+            # Measured on hours neither the warm start nor the registered model saw
+            "test_mae": warm_mae,
+            "recent_mae": recent_mae,
+            "warm_starts": metric.get("warm_starts", 0) + 1,
+            # The held-out hours are new again for the next run
+            "trained_until": trained_until(keys[fit_rows]),
+        },
+        features=warm_features,
+        targets=warm_targets,
     )
-    model.save(str(model_path))
 else:
-    print(f"Skipping model registration because new model is not better!")
+    # The cached matrix and LightGBM Dataset are shared with the worker processes
+    print("Caching the training matrix ...")
+    training_matrix = cache_training_matrix(matrix, targets, feature_names)
+    # A few rows of the feature table, for the pipeline's feature steps and the model schema
+    example_features = feature_frame(matrix, keys, feature_names, slice(0, 5))
+
+    if config.TUNE_HYPERPARAMETERS:
+        from src.tuning import tune_hyperparameters
+
+        print("Tuning hyperparameters ...")
+        tuning = tune_hyperparameters(
+            keys,
+            targets,
+            n_jobs=os.cpu_count(),
+            time_budget_seconds=config.TUNING_TIME_BUDGET_SECONDS,
+            training_matrix=training_matrix,
+        )
+        print(f"Best cross-validated MAE {tuning['best_mae']:.4f}: {tuning['best_params']}")
+        best_parameters = tuning["best_params"]
+    else:
+        best_parameters = fixed_parameters
+
+    pipeline = get_pipeline(**best_parameters)
+    print("Training model ...")
+
+    fit_pipeline_on_matrix(pipeline, example_features, matrix, targets, feature_names)
+
+    if config.TUNE_HYPERPARAMETERS and os.getenv("MLFLOW_TRACKING_URI"):
+        from src.experiment_utils import set_mlflow_tracking
+        from src.tuning import log_tuning_to_mlflow
+
+        set_mlflow_tracking()
+        log_tuning_to_mlflow(tuning, pipeline, example_features)
+
+    print(f"Backtesting on the last {config.BACKTEST_WEEKS} weeks ...")
+    report = backtest(
+        keys,
+        targets,
+        {"new": best_parameters},
+        n_jobs=os.cpu_count(),
+        training_matrix=training_matrix,
+    )
+    test_mae = report["new"]["mae"]
+
+    print(f"The new MAE is {test_mae:.4f}")
+    worst_zones = report["new"]["zone_mae"].nlargest(5, "mae")
+    print(f"Zones with the highest MAE:\n{worst_zones.to_string(index=False)}")
+
+    # The registered pipeline is scored as it is, on the backtest weeks it never saw
+    comparison = None
+    if metric is not None and "trained_until" in metric:
+        unseen_rows = rows_since(keys, metric["trained_until"])
+        comparison = compare_on_unseen_rows(
+            report["new"]["predictions"],
+            registered,
+            feature_frame(matrix, keys, feature_names, unseen_rows),
+            metric["trained_until"],
+        )
+    register, reason = registration_decision(test_mae, metric, comparison)
+    print(f"Registration: {reason}")
+
+    if register:
+        print("Registering new model")
+        get_feature_store_backend().register_model(
+            name=config.MODEL_NAME,
+            model=pipeline,
+            metrics={
+                "test_mae": test_mae,
+                "backtest_weeks": config.BACKTEST_WEEKS,
+                "warm_starts": 0,
+                "trained_until": trained_until(keys),
+            },
+            features=example_features,
+            targets=targets,
+        )
+    else:
+        print("Skipping model registration because new model is not better!")
+
+    # Only this run's matrix is kept; earlier runs cached theirs under other hashes
+    stale = prune_training_matrices(training_matrix)
+    print(f"Removed {len(stale)} stale training matrix files")
+
+# ru_maxrss is in KiB on Linux
+print(f"Peak memory: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MiB")
@@ -0,0 +1,193 @@
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import src.config as config
+from src.retraining import rows_since
+from src.tuning import (
+    cache_feature_matrix,
+    fit_booster,
+    open_feature_matrix,
+    time_series_folds,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _predict_fold(
+    task: Tuple[str, Dict, int],
+    training_matrix: Dict,
+    folds: List[Tuple[np.ndarray, np.ndarray]],
+) -> Tuple[str, int, np.ndarray]:
+    """Fits one model on the training rows of a fold; returns its test predictions."""
+    name, params, fold = task
+    matrix, _ = open_feature_matrix(training_matrix)
+    train_rows, test_rows = folds[fold]
+
+    booster = fit_booster(training_matrix, params, train_rows)
+    return name, fold, booster.predict(matrix[test_rows])
+
+
+def _mae_by(predictions: pd.DataFrame, key: pd.Series, name: str) -> pd.DataFrame:
+    errors = (predictions["predicted_demand"] - predictions["target"]).abs()
+    return errors.groupby(key.rename(name)).mean().rename("mae").reset_index()
+
+
+def backtest(
+    features: pd.DataFrame,
+    targets: pd.Series,
+    models: Dict[str, Dict],
+    n_weeks: int = config.BACKTEST_WEEKS,
+    n_jobs: int = 1,
+    cache_dir: Path = config.TRAINING_MATRIX_DIR,
+    training_matrix: Optional[Dict] = None,
+) -> Dict[str, Dict]:
+    """
+    Walk-forward evaluation of LightGBM parameter sets over the last `n_weeks` weeks.
+
+    Each week is one expanding-window fold (see `time_series_folds`): the model is fit
+    on every row before the week and scored on the week. The feature engineering runs
+    once; all folds of all models train on row subsets of the same cached LightGBM
+    Dataset and predict from the same memmapped matrix, and with n_jobs > 1
+    the (model, fold) fits run in a process pool. Comparing models on the same folds
+    gives a like-for-like retraining decision.
+
+    Args:
+        features (pd.DataFrame): Feature table from `transform_ts_data_info_features_and_target`;
+            with `training_matrix`, its pickup_location_id and pickup_hour columns suffice
+            (the index frame of `build_training_matrix`).
+        targets (pd.Series): Targets of `features`.
+        models (Dict[str, Dict]): LGBMRegressor parameters by model name.
+        n_weeks (int): Number of weekly folds.
+        n_jobs (int): Number of worker processes.
+        cache_dir (Path): Directory of the memmapped matrix.
+        training_matrix (Optional[Dict]): Matrix of `features` already cached with
+            `cache_training_matrix`; built from `features` if None.
+
+    Returns:
+        Dict[str, Dict]: Per model name:
+            - 'mae' (float): MAE over every test row.
+            - 'fold_mae' (pd.DataFrame): first test hour, rows and MAE of each fold.
+            - 'zone_mae' (pd.DataFrame): MAE per pickup_location_id.
+            - 'hour_mae' (pd.DataFrame): MAE per hour of the day.
+            - 'predictions' (pd.DataFrame): pickup_location_id, pickup_hour, target
+              and predicted_demand of every test row.
+    """
+    folds = time_series_folds(features["pickup_hour"], n_folds=n_weeks, test_days=7)
+    if training_matrix is None:
+        training_matrix = cache_feature_matrix(features, targets, cache_dir)
+    logger.info(f"Backtesting {len(models)} models on {len(folds)} weekly folds")
+
+    tasks = [(name, params, fold) for name, params in models.items() for fold in range(len(folds))]
+    predict_args = (tasks, repeat(training_matrix), repeat(folds))
+    if n_jobs > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            results = list(executor.map(_predict_fold, *predict_args, chunksize=1))
+    else:
+        results = list(map(_predict_fold, *predict_args))
+
+    pickup_hours = pd.to_datetime(features["pickup_hour"]).to_numpy()
+    location_ids = features["pickup_location_id"].to_numpy()
+    target_values = np.asarray(targets, dtype=np.float32)
+
+    fold_predictions: Dict[str, List[pd.DataFrame]] = {name: [] for name in models}
+    for name, fold, predictions in sorted(results, key=lambda result: result[1]):
+        test_rows = folds[fold][1]
+        fold_predictions[name].append(
+            pd.DataFrame(
+                {
+                    "fold": fold,
+                    "pickup_location_id": location_ids[test_rows],
+                    "pickup_hour": pickup_hours[test_rows],
+                    "target": target_values[test_rows],
+                    "predicted_demand": predictions,
+                }
+            )
+        )
+
+    report = {}
+    for name, frames in fold_predictions.items():
+        predictions = pd.concat(frames, ignore_index=True)
+        errors = (predictions["predicted_demand"] - predictions["target"]).abs()
+        fold_mae = (
+            predictions.assign(error=errors)
+            .groupby("fold")
+            .agg(test_start=("pickup_hour", "min"), rows=("error", "size"), mae=("error", "mean"))
+            .reset_index(drop=True)
+        )
+        report[name] = {
+            "mae": float(errors.mean()),
+            "fold_mae": fold_mae,
+            "zone_mae": _mae_by(predictions, predictions["pickup_location_id"], "pickup_location_id"),
+            "hour_mae": _mae_by(predictions, predictions["pickup_hour"].dt.hour, "hour"),
+            "predictions": predictions.drop(columns=["fold"]),
+        }
+        logger.info(f"Backtest MAE of {name}: {report[name]['mae']:.4f}")
+    return report
+
+
+def compare_on_unseen_rows(
+    predictions: pd.DataFrame, registered, features: pd.DataFrame, since: float
+) -> Optional[Dict[str, float]]:
+    """
+    Scores the registered pipeline, as it is, on the backtest rows it was not trained on.
+
+    Only test rows at or after `since` (the end of the registered model's training
+    window) are compared, so neither the walk-forward fits of the new model nor the
+    registered model have seen them.
+
+    Args:
+        predictions (pd.DataFrame): 'predictions' of a model in a `backtest` report.
+        registered: Fitted pipeline of the registered model.
+        features (pd.DataFrame): Feature table the backtest ran on.
+        since (float): End of the registered model's training window, as epoch seconds.
+
+    Returns:
+        Optional[Dict[str, float]]: 'rows', 'new_mae' and 'registered_mae' on those rows,
+        or None if no backtest row is that recent.
+    """
+    features = features.reset_index(drop=True)
+    keys = ["pickup_location_id", "pickup_hour"]
+    unseen = features.loc[rows_since(features, since), keys].reset_index()
+    rows = predictions.merge(unseen, on=keys)
+    if rows.empty:
+        return None
+
+    registered_predictions = registered.predict(features.iloc[rows["index"].to_numpy()])
+    return {
+        "rows": len(rows),
+        "new_mae": float((rows["predicted_demand"] - rows["target"]).abs().mean()),
+        "registered_mae": float(np.abs(registered_predictions - rows["target"]).mean()),
+    }
+
+
+def registration_decision(
+    new_mae: float, metric: Optional[Dict], comparison: Optional[Dict[str, float]]
+) -> Tuple[bool, str]:
+    """
+    Decides whether a newly trained model replaces the registered one.
+
+    The new model has to beat the registered model on the rows of `comparison` (see
+    `compare_on_unseen_rows`). Without such rows its backtest MAE has to beat the
+    registered model's recorded `test_mae`.
+
+    Returns:
+        Tuple[bool, str]: Whether to register, and a human-readable reason.
+    """
+    if metric is None:
+        return True, "no model is registered"
+    if comparison is not None:
+        new_mae, registered_mae = comparison["new_mae"], comparison["registered_mae"]
+        where = f"on {comparison['rows']} backtest rows the registered model has not seen"
+    else:
+        registered_mae = metric["test_mae"]
+        where = "against the registered model's recorded backtest MAE"
+    verdict = "beats" if new_mae < registered_mae else "does not beat"
+    return new_mae < registered_mae, (
+        f"the new MAE {new_mae:.4f} {verdict} {registered_mae:.4f} {where}"
+    )
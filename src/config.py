@@ -12,6 +12,10 @@ RAW_DATA_DIR = DATA_DIR / "raw"
 PROCESSED_DATA_DIR = DATA_DIR / "processed"
 TRANSFORMED_DATA_DIR = DATA_DIR / "transformed"
 MODELS_DIR = PARENT_DIR / "models"
+LOCAL_FEATURE_STORE_DIR = DATA_DIR / "feature_store"
+FEATURE_CACHE_DIR = DATA_DIR / "feature_cache"
+# float32 training matrices and their LightGBM Dataset binaries (src/tuning.py)
+TRAINING_MATRIX_DIR = TRANSFORMED_DATA_DIR / "training_matrix"
 
 # Create directories if they don't exist
 for directory in [
@@ -26,6 +30,19 @@ for directory in [
 
 HOPSWORKS_API_KEY = os.getenv("HOPSWORKS_API_KEY")
 HOPSWORKS_PROJECT_NAME = os.getenv("HOPSWORKS_PROJECT_NAME")
+# Hopsworks logins are reused for this long before logging in again
+HOPSWORKS_SESSION_TTL_SECONDS = int(os.getenv("HOPSWORKS_SESSION_TTL_SECONDS", 3600))
+
+# "hopsworks", or "local" to keep feature groups and models under LOCAL_FEATURE_STORE_DIR
+FEATURE_STORE_BACKEND = os.getenv("FEATURE_STORE_BACKEND", "hopsworks")
+# Long feature group reads are split into queries of at most this many days
+FEATURE_STORE_READ_PAGE_DAYS = 30
+
+# Read-through cache of feature group reads (see src/feature_cache.py)
+FEATURE_CACHE_MAX_BYTES = int(os.getenv("FEATURE_CACHE_MAX_BYTES", 512 * 1024**2))
+# Partitions overlapping the last hours are re-read from the store, since late records
+# and backfills may still change them
+FEATURE_CACHE_REVALIDATE_HOURS = 6
 
 FEATURE_GROUP_NAME = "time_series_hourly_feature_group"
 FEATURE_GROUP_VERSION = 1
@@ -36,5 +53,49 @@ FEATURE_VIEW_VERSION = 1
 
 MODEL_NAME = "taxi_demand_predictor_next_hour"
 MODEL_VERSION = 1
+# Serve this model version instead of the latest one (unset: latest)
+MODEL_VERSION_PIN = int(os.getenv("MODEL_VERSION_PIN")) if os.getenv("MODEL_VERSION_PIN") else None
+MODEL_CACHE_DIR = MODELS_DIR / "cache"
+# How long the latest registered model version is trusted before asking the registry again
+MODEL_VERSION_CHECK_SECONDS = 300
+# LightGBM threads used to score predictions (0: LightGBM's default)
+PREDICTION_NUM_THREADS = int(os.getenv("PREDICTION_NUM_THREADS", 0))
+
+# Prediction service (src/prediction_service.py)
+PREDICTION_SERVICE_PORT = int(os.getenv("PREDICTION_SERVICE_PORT", 8080))
+# Concurrent requests are merged into one predict call of up to this many rows...
+PREDICTION_BATCH_MAX_ROWS = 1024
+# ...waiting at most this long for other requests to join the batch
+PREDICTION_BATCH_MAX_WAIT_MS = 2
 
 FEATURE_GROUP_MODEL_PREDICTION = "taxi_hourly_model_prediction"
+# Weekly training: search hyperparameters (src/tuning.py) instead of using the fixed ones
+TUNE_HYPERPARAMETERS = os.getenv("TUNE_HYPERPARAMETERS", "").lower() in ("1", "true", "yes")
+# No new successive-halving rung is started after this long
+TUNING_TIME_BUDGET_SECONDS = 45 * 60
+# Weekly walk-forward folds the new and the registered model are compared on
+BACKTEST_WEEKS = 4
+# Weekly training: "auto" continues the registered model on the new week unless its MAE
+# drifted (src/retraining.py), "warm" / "full" force one mode when possible
+RETRAIN_MODE = os.getenv("RETRAIN_MODE", "auto")
+# Largest relative MAE increase on unseen hours that still allows a warm start
+WARM_START_MAX_DRIFT = 0.10
+# Consecutive warm starts before a full retrain is forced
+WARM_START_MAX_CHAIN = 4
+# Trees added by a warm start
+WARM_START_N_ESTIMATORS = 50
+# The last days of new hours are held out of a warm start to check that it helped
+WARM_START_HOLDOUT_DAYS = 2
+# Also sample older rows with this half-life (days) during a warm start (unset: new rows only)
+WARM_START_HALF_LIFE_DAYS = (
+    float(os.getenv("WARM_START_HALF_LIFE_DAYS")) if os.getenv("WARM_START_HALF_LIFE_DAYS") else None
+)
+
+FEATURE_GROUP_MULTI_HORIZON_PREDICTION = "taxi_hourly_model_prediction_multi_horizon"
+# Hours ahead forecast by the inference pipeline for dispatch planning
+PREDICTION_HORIZON_HOURS = 24
+
+# Days of rides the feature pipeline (re)builds when no high-water mark is available
+FEATURE_PIPELINE_LOOKBACK_DAYS = 28
+# Already-ingested hours the incremental feature pipeline re-processes each run
+FEATURE_PIPELINE_BACKFILL_HOURS = 2
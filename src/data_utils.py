@@ -6,33 +6,302 @@ sys.path.append(os.path.abspath(os.path.join(os.getcwd(), "..")))
 # sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 import calendar
+import hashlib
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 # Add the parent directory to the Python path
 from datetime import datetime, timedelta
+from functools import partial
+from itertools import repeat
 from pathlib import Path
-from typing import List, Optional, Tuple, Union
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import pytz
 import requests
+from numpy.lib.stride_tricks import sliding_window_view
+
+from src.config import PROCESSED_DATA_DIR, RAW_DATA_DIR, TRANSFORMED_DATA_DIR
+from src.sharding import map_shards, split_zones
+from src.time_series import ALL_ZONE_IDS, TimeSeriesTensor
+
+# Pickup locations outside of NYC (Newark airport and the "unknown" zones)
+NON_NYC_LOCATION_IDS = (1, 264, 265)
+# Zones the feature group holds a row for every hour
+NYC_ZONE_IDS = np.setdiff1d(ALL_ZONE_IDS, NON_NYC_LOCATION_IDS)
+
+# Outlier thresholds used by `filter_nyc_taxi_data`
+MAX_TRIP_DURATION = pd.Timedelta(hours=5)
+TOTAL_AMOUNT_QUANTILE = 0.999
+# Relative error bound of the sketch that estimates the `total_amount` quantile
+TOTAL_AMOUNT_RELATIVE_ACCURACY = 0.001
+
+# Bump whenever `filter_nyc_taxi_data` changes in a way not captured by the constants
+# above, so processed-month caches built by the old filter are not reused
+FILTER_VERSION = 2
+
+RAW_TRIP_DATA_URL = "https://d37ci6vzurychx.cloudfront.net/trip-data/yellow_tripdata_{year}-{month:02}.parquet"
+
+# Raw trip columns read by `filter_nyc_taxi_data`; the other ~15 are never loaded
+RAW_TRIP_COLUMNS = [
+    "tpep_pickup_datetime",
+    "tpep_dropoff_datetime",
+    "PULocationID",
+    "total_amount",
+]
+
+
+def _download_file(
+    session: requests.Session,
+    url: str,
+    path: Path,
+    max_retries: int = 3,
+    timeout: int = 60,
+    chunk_size: int = 1 << 20,
+) -> Path:
+    """
+    Streams `url` to `path` in chunks, resuming and retrying on connection errors.
 
-from src.config import RAW_DATA_DIR
+    Bytes are written to `<path>.part` and only renamed to `path` once the size matches
+    the advertised Content-Length and the file has a valid parquet footer, so an
+    interrupted run never leaves a truncated file behind. A leftover `.part` file is
+    resumed with an HTTP Range request (or restarted if the server ignores it).
+    """
+    part_path = path.with_name(path.name + ".part")
 
+    for attempt in range(1, max_retries + 1):
+        try:
+            resume_from = part_path.stat().st_size if part_path.exists() else 0
+            headers = {"Range": f"bytes={resume_from}-"} if resume_from else {}
+
+            with session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+                if response.status_code == 416:
+                    # Nothing left to fetch; the footer check below decides if it is complete
+                    expected_size = resume_from
+                elif response.status_code in (200, 206):
+                    if response.status_code == 200:
+                        resume_from = 0
+                    content_length = response.headers.get("Content-Length")
+                    expected_size = (
+                        resume_from + int(content_length) if content_length else None
+                    )
+                    with open(part_path, "ab" if resume_from else "wb") as f:
+                        for chunk in response.iter_content(chunk_size=chunk_size):
+                            f.write(chunk)
+                else:
+                    raise Exception(f"{url} is not available")
+
+            size = part_path.stat().st_size
+            if expected_size is not None and size != expected_size:
+                raise IOError(f"Incomplete download of {url}: {size:,} of {expected_size:,} bytes")
+            try:
+                pq.ParquetFile(part_path)
+            except pa.ArrowInvalid as e:
+                part_path.unlink()
+                raise IOError(f"Corrupt download of {url}: {e}")
+
+            os.replace(part_path, path)
+            return path
+
+        except (requests.ConnectionError, requests.Timeout, IOError) as e:
+            if attempt == max_retries:
+                raise
+            print(f"Download of {url} failed ({e}), retrying ({attempt}/{max_retries})...")
+            time.sleep(2**attempt)
+
+
+def fetch_raw_trip_data(
+    year: int, month: int, session: Optional[requests.Session] = None
+) -> Path:
+    URL = RAW_TRIP_DATA_URL.format(year=year, month=month)
+    path = RAW_DATA_DIR / f"rides_{year}_{month:02}.parquet"
+    return _download_file(session or requests.Session(), URL, path)
+
+
+def fetch_raw_trip_data_bulk(
+    year_months: List[Tuple[int, int]],
+    max_workers: int = 4,
+    overwrite: bool = False,
+) -> Dict[Tuple[int, int], Path]:
+    """
+    Downloads several raw monthly files concurrently.
 
-def fetch_raw_trip_data(year: int, month: int) -> Path:
-    URL = f"https://d37ci6vzurychx.cloudfront.net/trip-data/yellow_tripdata_{year}-{month:02}.parquet"
-    response = requests.get(URL)
+    Downloads share one HTTP session (and its connection pool) and run in a bounded
+    thread pool. Each file is streamed, verified and atomically renamed as in
+    `fetch_raw_trip_data`; files that already exist are skipped unless `overwrite`.
 
-    if response.status_code == 200:
-        path = RAW_DATA_DIR / f"rides_{year}_{month:02}.parquet"
-        open(path, "wb").write(response.content)
-        return path
-    else:
-        raise Exception(f"{URL} is not available")
+    Args:
+        year_months (List[Tuple[int, int]]): (year, month) pairs to download.
+        max_workers (int): Maximum number of concurrent downloads.
+        overwrite (bool): Download again even if the file already exists.
 
+    Returns:
+        Dict[Tuple[int, int], Path]: Path of every requested file, in input order.
 
-def filter_nyc_taxi_data(rides: pd.DataFrame, year: int, month: int) -> pd.DataFrame:
+    Raises:
+        Exception: If any download failed, after all the others have finished.
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=max_workers)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    paths, failures = {}, {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for year, month in year_months:
+            path = RAW_DATA_DIR / f"rides_{year}_{month:02}.parquet"
+            if path.exists() and not overwrite:
+                print(f"File already exists for {year}-{month:02}.")
+                paths[(year, month)] = path
+                continue
+            print(f"Downloading data for {year}-{month:02}...")
+            futures[(year, month)] = executor.submit(
+                fetch_raw_trip_data, year, month, session
+            )
+
+        for (year, month), future in futures.items():
+            try:
+                paths[(year, month)] = future.result()
+                print(f"Successfully downloaded data for {year}-{month:02}.")
+            except Exception as e:
+                failures[(year, month)] = e
+                print(f"Error downloading data for {year}-{month:02}: {str(e)}")
+
+    if failures:
+        raise Exception(f"Failed to download {sorted(failures)}")
+
+    return {year_month: paths[year_month] for year_month in year_months}
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch with a bounded relative error.
+
+    Values are counted in logarithmically sized buckets (as in DDSketch), so any
+    quantile is returned within `relative_accuracy` of the exact nearest-rank value
+    while memory only grows with the logarithm of the value range. Values can be added
+    in chunks, e.g. one parquet row group at a time. NaNs are ignored.
+    """
+
+    def __init__(self, relative_accuracy: float = TOTAL_AMOUNT_RELATIVE_ACCURACY):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1.")
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = np.log(self._gamma)
+        self._positive: Dict[int, int] = {}
+        self._negative: Dict[int, int] = {}
+        self._zero_count = 0
+        self.count = 0
+
+    def _add_to_store(self, store: Dict[int, int], magnitudes: np.ndarray):
+        keys, counts = np.unique(
+            np.ceil(np.log(magnitudes) / self._log_gamma).astype(np.int64),
+            return_counts=True,
+        )
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            store[key] = store.get(key, 0) + count
+
+    def add(self, values: np.ndarray) -> "QuantileSketch":
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        tiny = np.finfo(np.float64).tiny
+        self._add_to_store(self._positive, values[values > tiny])
+        self._add_to_store(self._negative, -values[values < -tiny])
+        self._zero_count += int(np.count_nonzero(np.abs(values) <= tiny))
+        self.count += len(values)
+        return self
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        """Adds the counts of `other`, e.g. a sketch of another row group or month."""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Only sketches with the same relative_accuracy can be merged.")
+        for store, other_store in (
+            (self._positive, other._positive),
+            (self._negative, other._negative),
+        ):
+            for key, count in other_store.items():
+                store[key] = store.get(key, 0) + count
+        self._zero_count += other._zero_count
+        self.count += other.count
+        return self
+
+    def _bucket_value(self, key: int) -> float:
+        return 2 * self._gamma**key / (self._gamma + 1)
+
+    def quantile(self, q: float) -> float:
+        if self.count == 0:
+            return np.nan
+        rank = q * (self.count - 1)
+
+        seen = 0
+        for key in sorted(self._negative, reverse=True):
+            seen += self._negative[key]
+            if seen > rank:
+                return -self._bucket_value(key)
+        seen += self._zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self._positive):
+            seen += self._positive[key]
+            if seen > rank:
+                return self._bucket_value(key)
+        return self._bucket_value(max(self._positive))
+
+
+def _valid_rides_mask(
+    pickup: np.ndarray,
+    dropoff: np.ndarray,
+    total_amount: np.ndarray,
+    location_id: np.ndarray,
+    start_date: pd.Timestamp,
+    end_date: pd.Timestamp,
+    total_amount_cap: float,
+    chunk_size: int = 1 << 18,
+) -> np.ndarray:
+    """
+    Computes the keep-mask of `filter_nyc_taxi_data` in one chunked pass.
+
+    All conditions are evaluated chunk by chunk on the raw column arrays, so the
+    temporaries stay cache-sized and no duration column or intermediate masks the size
+    of the whole month are allocated.
+    """
+    start_date = start_date.to_datetime64()
+    end_date = end_date.to_datetime64()
+    max_duration = MAX_TRIP_DURATION.to_timedelta64()
+    zero_duration = np.timedelta64(0, "ns")
+    excluded_locations = np.asarray(NON_NYC_LOCATION_IDS)
+
+    keep = np.empty(len(pickup), dtype=bool)
+    for lo in range(0, len(pickup), chunk_size):
+        chunk = slice(lo, lo + chunk_size)
+        chunk_pickup = pickup[chunk]
+        duration = dropoff[chunk] - chunk_pickup
+        chunk_amount = total_amount[chunk]
+        keep[chunk] = (
+            (duration > zero_duration)
+            & (duration <= max_duration)
+            & (chunk_amount > 0)
+            & (chunk_amount <= total_amount_cap)
+            & (chunk_pickup >= start_date)
+            & (chunk_pickup < end_date)
+            & ~np.isin(location_id[chunk], excluded_locations)
+        )
+    return keep
+
+
+def filter_nyc_taxi_data(
+    rides: pd.DataFrame,
+    year: int,
+    month: int,
+    total_amount_cap: Optional[float] = None,
+) -> pd.DataFrame:
     """
     Filters NYC Taxi ride data for a specific year and month, removing outliers and invalid records.
 
@@ -40,6 +309,9 @@ def filter_nyc_taxi_data(rides: pd.DataFrame, year: int, month: int) -> pd.DataF
         rides (pd.DataFrame): DataFrame containing NYC Taxi ride data.
         year (int): Year to filter for.
         month (int): Month to filter for (1-12).
+        total_amount_cap (Optional[float]): Upper bound for `total_amount`. Defaults to the
+            TOTAL_AMOUNT_QUANTILE quantile of `rides`, estimated with a QuantileSketch;
+            pass the cap of the whole month when `rides` only holds part of it.
 
     Returns:
         pd.DataFrame: Filtered DataFrame containing only valid rides for the specified year and month.
@@ -57,29 +329,30 @@ def filter_nyc_taxi_data(rides: pd.DataFrame, year: int, month: int) -> pd.DataF
     start_date = pd.Timestamp(year=year, month=month, day=1)
     end_date = pd.Timestamp(year=year + (month // 12), month=(month % 12) + 1, day=1)
 
-    # Add a duration column for filtering
-    rides["duration"] = rides["tpep_dropoff_datetime"] - rides["tpep_pickup_datetime"]
-
-    # Define filters
-    duration_filter = (rides["duration"] > pd.Timedelta(0)) & (
-        rides["duration"] <= pd.Timedelta(hours=5)
-    )
-    total_amount_filter = (rides["total_amount"] > 0) & (
-        rides["total_amount"] <= rides["total_amount"].quantile(0.999)
-    )
-    nyc_location_filter = ~rides["PULocationID"].isin((1, 264, 265))
-    date_range_filter = (rides["tpep_pickup_datetime"] >= start_date) & (
-        rides["tpep_pickup_datetime"] < end_date
-    )
+    if total_amount_cap is None:
+        total_amount_cap = (
+            QuantileSketch()
+            .add(rides["total_amount"].to_numpy())
+            .quantile(TOTAL_AMOUNT_QUANTILE)
+        )
 
-    # Combine all filters
-    final_filter = (
-        duration_filter & total_amount_filter & nyc_location_filter & date_range_filter
+    # Duration, amount, location and date range filters in one pass, without
+    # modifying `rides`
+    pickup = rides["tpep_pickup_datetime"].to_numpy()
+    location_id = rides["PULocationID"].to_numpy()
+    final_filter = _valid_rides_mask(
+        pickup,
+        rides["tpep_dropoff_datetime"].to_numpy(),
+        rides["total_amount"].to_numpy(),
+        location_id,
+        start_date,
+        end_date,
+        total_amount_cap,
     )
 
     # Calculate dropped records
     total_records = len(rides)
-    valid_records = final_filter.sum()
+    valid_records = int(final_filter.sum())
     records_dropped = total_records - valid_records
     percent_dropped = (records_dropped / total_records) * 100
 
@@ -88,14 +361,12 @@ def filter_nyc_taxi_data(rides: pd.DataFrame, year: int, month: int) -> pd.DataF
     print(f"Records dropped: {records_dropped:,} ({percent_dropped:.2f}%)")
 
     # Filter the DataFrame
-    validated_rides = rides[final_filter]
-    validated_rides = validated_rides[["tpep_pickup_datetime", "PULocationID"]]
-    validated_rides.rename(
-        columns={
-            "tpep_pickup_datetime": "pickup_datetime",
-            "PULocationID": "pickup_location_id",
+    validated_rides = pd.DataFrame(
+        {
+            "pickup_datetime": pickup[final_filter],
+            "pickup_location_id": location_id[final_filter],
         },
-        inplace=True,
+        index=rides.index[final_filter],
     )
 
     # Verify we have data in the correct time range
@@ -105,8 +376,337 @@ def filter_nyc_taxi_data(rides: pd.DataFrame, year: int, month: int) -> pd.DataF
     return validated_rides
 
 
+def _to_naive_timestamp(value: Union[datetime, str]) -> pd.Timestamp:
+    """Converts `value` to a naive timestamp (in UTC when it is timezone-aware)."""
+    value = pd.Timestamp(value)
+    if value.tzinfo is not None:
+        value = value.tz_convert(None)
+    return value
+
+
+def read_raw_trip_data(
+    file_path: Path,
+    pickup_from: Optional[Union[datetime, str]] = None,
+    pickup_to: Optional[Union[datetime, str]] = None,
+) -> Tuple[pd.DataFrame, Optional[float]]:
+    """
+    Reads the columns of a raw monthly trip file needed by `filter_nyc_taxi_data`.
+
+    When a pickup range is given it is pushed down to pyarrow, so row groups whose
+    statistics fall outside [pickup_from, pickup_to) are skipped and the remaining
+    rows are filtered while decoding.
+
+    Args:
+        file_path (Path): Path to the raw parquet file.
+        pickup_from (Optional[datetime | str]): Inclusive lower bound on pickup time.
+        pickup_to (Optional[datetime | str]): Exclusive upper bound on pickup time.
+
+    Returns:
+        Tuple[pd.DataFrame, Optional[float]]: The projected rides, and the `total_amount` cap
+        (TOTAL_AMOUNT_QUANTILE) over the whole file when a range was pushed down (None otherwise,
+        since the filter can then compute it from the rides themselves).
+    """
+    filters = _pickup_range_filters("tpep_pickup_datetime", pickup_from, pickup_to)
+
+    if not filters:
+        return pd.read_parquet(file_path, engine="pyarrow", columns=RAW_TRIP_COLUMNS), None
+
+    # The outlier cap is defined over the whole month, so sketch that single column
+    # batch by batch
+    sketch = QuantileSketch()
+    for batch in pq.ParquetFile(file_path).iter_batches(columns=["total_amount"]):
+        sketch.add(batch.column(0).to_numpy(zero_copy_only=False))
+    total_amount_cap = sketch.quantile(TOTAL_AMOUNT_QUANTILE)
+
+    rides = pd.read_parquet(
+        file_path, engine="pyarrow", columns=RAW_TRIP_COLUMNS, filters=filters
+    )
+    return rides, total_amount_cap
+
+
+def file_digest(file_path: Path) -> str:
+    """
+    Returns the sha256 hex digest of a file's content.
+
+    The digest is memoised in a `<file>.sha256` sidecar keyed by size and modification
+    time, so an unchanged file is only hashed once.
+    """
+    sidecar_path = file_path.with_name(file_path.name + ".sha256")
+    stat = file_path.stat()
+    signature = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    if sidecar_path.exists():
+        sidecar = json.loads(sidecar_path.read_text())
+        if {k: sidecar.get(k) for k in signature} == signature:
+            return sidecar["sha256"]
+
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+
+    sidecar_path.write_text(json.dumps({**signature, "sha256": digest.hexdigest()}))
+    return digest.hexdigest()
+
+
+def month_cache_key(raw_file_path: Path) -> str:
+    """
+    Returns the cache key of a raw monthly file.
+
+    The key hashes the raw file content and the filter parameters, so a re-downloaded
+    raw file or a changed filter never hits a stale cache entry.
+    """
+    key_material = json.dumps(
+        {
+            "raw_sha256": file_digest(raw_file_path),
+            "filter_version": FILTER_VERSION,
+            "max_trip_duration": str(MAX_TRIP_DURATION),
+            "total_amount_quantile": TOTAL_AMOUNT_QUANTILE,
+            "total_amount_relative_accuracy": TOTAL_AMOUNT_RELATIVE_ACCURACY,
+            "non_nyc_location_ids": list(NON_NYC_LOCATION_IDS),
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(key_material.encode()).hexdigest()[:16]
+
+
+def processed_cache_path(year: int, month: int, raw_file_path: Path) -> Path:
+    """Returns the processed-month cache path for a raw file."""
+    key = month_cache_key(raw_file_path)
+    return PROCESSED_DATA_DIR / f"rides_{year}_{month:02}_{key}.parquet"
+
+
+def _write_month_cache(df: pd.DataFrame, cache_path: Path, stale_pattern: str):
+    """Atomically writes a month cache entry and removes the month's other entries."""
+    for stale_path in cache_path.parent.glob(stale_pattern):
+        stale_path.unlink()
+    tmp_path = cache_path.with_suffix(".parquet.tmp")
+    df.to_parquet(tmp_path, engine="pyarrow", index=False)
+    os.replace(tmp_path, cache_path)
+
+
+def _pickup_range_filters(
+    column: str,
+    pickup_from: Optional[Union[datetime, str]] = None,
+    pickup_to: Optional[Union[datetime, str]] = None,
+) -> Optional[list]:
+    """Returns pyarrow `filters=` for [pickup_from, pickup_to) on `column`, or None."""
+    filters = []
+    if pickup_from is not None:
+        filters.append((column, ">=", _to_naive_timestamp(pickup_from)))
+    if pickup_to is not None:
+        filters.append((column, "<", _to_naive_timestamp(pickup_to)))
+    return filters or None
+
+
+def load_processed_month(
+    year: int,
+    month: int,
+    raw_file_path: Path,
+    pickup_from: Optional[Union[datetime, str]] = None,
+    pickup_to: Optional[Union[datetime, str]] = None,
+) -> pd.DataFrame:
+    """
+    Returns the validated rides of one month, filtering the raw file only on a cache miss.
+
+    Validated rides are cached in PROCESSED_DATA_DIR with compact dtypes (datetime64
+    pickup times and int16 location IDs). Entries for the same month built from another
+    raw file or filter configuration are removed when a new entry is written.
+
+    Args:
+        year (int): Year of the raw file.
+        month (int): Month of the raw file (1-12).
+        raw_file_path (Path): Path to the raw parquet file.
+        pickup_from (Optional[datetime | str]): Inclusive lower bound on pickup time.
+        pickup_to (Optional[datetime | str]): Exclusive upper bound on pickup time.
+
+    Returns:
+        pd.DataFrame: Validated rides with pickup_datetime and pickup_location_id columns.
+    """
+    cache_path = processed_cache_path(year, month, raw_file_path)
+
+    if not cache_path.exists():
+        print(f"Building processed cache for {year}-{month:02}...")
+        rides, _ = read_raw_trip_data(raw_file_path)
+        rides = filter_nyc_taxi_data(rides, year, month)
+        rides = rides.astype({"pickup_location_id": "int16"}).reset_index(drop=True)
+
+        _write_month_cache(rides, cache_path, f"rides_{year}_{month:02}_*.parquet")
+
+        if pickup_from is None and pickup_to is None:
+            return rides
+    else:
+        print(f"Using processed cache for {year}-{month:02}.")
+
+    filters = _pickup_range_filters("pickup_datetime", pickup_from, pickup_to)
+    return pd.read_parquet(cache_path, engine="pyarrow", filters=filters)
+
+
+def ensure_raw_trip_data(year: int, month: int) -> Path:
+    """Returns the path of the raw monthly file, downloading it if needed."""
+    file_path = RAW_DATA_DIR / f"rides_{year}_{month:02}.parquet"
+    if not file_path.exists():
+        print(f"Downloading data for {year}-{month:02}...")
+        fetch_raw_trip_data(year, month)
+        print(f"Successfully downloaded data for {year}-{month:02}.")
+    return file_path
+
+
+def aggregate_hourly_counts(rides: pd.DataFrame) -> pd.DataFrame:
+    """
+    Counts rides per pickup hour and location, without adding columns to `rides`.
+
+    Args:
+        rides: DataFrame with pickup_datetime and location columns
+
+    Returns:
+        pd.DataFrame: pickup_hour, pickup_location_id and rides columns, one row per
+        non-empty (hour, location) slot.
+    """
+    return (
+        rides.groupby(
+            [
+                rides["pickup_datetime"].dt.floor("h").rename("pickup_hour"),
+                "pickup_location_id",
+            ]
+        )
+        .size()
+        .reset_index(name="rides")
+    )
+
+
+def load_monthly_hourly_counts(
+    year: int,
+    month: int,
+    pickup_from: Optional[Union[datetime, str]] = None,
+    pickup_to: Optional[Union[datetime, str]] = None,
+) -> pd.DataFrame:
+    """
+    Returns the hourly ride counts per zone of one month from the counts cache.
+
+    Counts are stored sparsely (only non-zero hours) in TRANSFORMED_DATA_DIR, keyed like
+    the processed-month cache. On a miss they are aggregated once from the validated
+    rides; afterwards the month is answered without reading any individual trip.
+
+    Args:
+        year (int): Year to load counts for.
+        month (int): Month to load counts for (1-12).
+        pickup_from (Optional[datetime | str]): Inclusive lower bound on pickup hour.
+        pickup_to (Optional[datetime | str]): Exclusive upper bound on pickup hour.
+
+    Returns:
+        pd.DataFrame: pickup_hour, pickup_location_id (int16) and rides (int16) columns.
+    """
+    raw_file_path = ensure_raw_trip_data(year, month)
+    key = month_cache_key(raw_file_path)
+    cache_path = TRANSFORMED_DATA_DIR / f"ts_{year}_{month:02}_{key}.parquet"
+
+    if not cache_path.exists():
+        print(f"Building hourly counts cache for {year}-{month:02}...")
+        rides = load_processed_month(year, month, raw_file_path)
+        counts = aggregate_hourly_counts(rides).astype(
+            {"pickup_location_id": "int16", "rides": "int16"}
+        )
+        del rides
+        _write_month_cache(counts, cache_path, f"ts_{year}_{month:02}_*.parquet")
+
+    filters = _pickup_range_filters("pickup_hour", pickup_from, pickup_to)
+    return pd.read_parquet(cache_path, engine="pyarrow", filters=filters)
+
+
+def _load_month(
+    year: int,
+    month: int,
+    pickup_from: Optional[Union[datetime, str]] = None,
+    pickup_to: Optional[Union[datetime, str]] = None,
+    use_cache: bool = True,
+) -> Optional[pd.DataFrame]:
+    """Loads and filters one month of rides, or returns None if that fails."""
+    # Construct the file path
+    file_path = RAW_DATA_DIR / f"rides_{year}_{month:02}.parquet"
+
+    try:
+        # Download the file if it doesn't exist
+        if not file_path.exists():
+            print(f"Downloading data for {year}-{month:02}...")
+            fetch_raw_trip_data(year, month)
+            print(f"Successfully downloaded data for {year}-{month:02}.")
+        else:
+            print(f"File already exists for {year}-{month:02}.")
+
+        # Load the data
+        print(f"Loading data for {year}-{month:02}...")
+        if use_cache:
+            rides = load_processed_month(
+                year, month, file_path, pickup_from=pickup_from, pickup_to=pickup_to
+            )
+        else:
+            rides, total_amount_cap = read_raw_trip_data(
+                file_path, pickup_from=pickup_from, pickup_to=pickup_to
+            )
+
+            # Filter and process the data
+            rides = filter_nyc_taxi_data(
+                rides, year, month, total_amount_cap=total_amount_cap
+            )
+        print(f"Successfully processed data for {year}-{month:02}.")
+
+        return rides
+
+    except FileNotFoundError:
+        print(f"File not found for {year}-{month:02}. Skipping...")
+    except Exception as e:
+        print(f"Error processing data for {year}-{month:02}: {str(e)}")
+    return None
+
+
+def _load_month_arrays(
+    year: int,
+    month: int,
+    pickup_from: Optional[Union[datetime, str]] = None,
+    pickup_to: Optional[Union[datetime, str]] = None,
+    use_cache: bool = True,
+) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+    """
+    Process-pool worker: loads one month and returns its two columns as plain arrays,
+    which are much cheaper to send back to the parent than a DataFrame.
+    """
+    rides = _load_month(year, month, pickup_from, pickup_to, use_cache)
+    if rides is None:
+        return None, None
+    return rides["pickup_datetime"].to_numpy(), rides["pickup_location_id"].to_numpy()
+
+
+def iter_taxi_data(
+    year: int,
+    months: Optional[List[int]] = None,
+    pickup_from: Optional[Union[datetime, str]] = None,
+    pickup_to: Optional[Union[datetime, str]] = None,
+    use_cache: bool = True,
+) -> Iterator[pd.DataFrame]:
+    """
+    Yields the processed rides of each month in turn, like `load_and_process_taxi_data`
+    but without holding more than one month in memory.
+
+    Months that cannot be loaded are skipped with a message.
+    """
+    # Use all months if none are specified
+    if months is None:
+        months = list(range(1, 13))
+
+    for month in months:
+        rides = _load_month(year, month, pickup_from, pickup_to, use_cache)
+        if rides is not None:
+            yield rides
+
+
 def load_and_process_taxi_data(
-    year: int, months: Optional[List[int]] = None
+    year: int,
+    months: Optional[List[int]] = None,
+    pickup_from: Optional[Union[datetime, str]] = None,
+    pickup_to: Optional[Union[datetime, str]] = None,
+    use_cache: bool = True,
+    n_jobs: int = 1,
 ) -> pd.DataFrame:
     """
     Load and process NYC yellow taxi ride data for a specified year and list of months.
@@ -114,6 +714,15 @@ def load_and_process_taxi_data(
     Args:
         year (int): Year to load data for.
         months (Optional[List[int]]): List of months to load. If None, loads all months (1-12).
+        pickup_from (Optional[datetime | str]): If set, only rides picked up at or after this
+            time are read from disk.
+        pickup_to (Optional[datetime | str]): If set, only rides picked up before this time
+            are read from disk.
+        use_cache (bool): Read validated rides from the processed-month cache, building it
+            on a miss. If False, the raw file is always re-read and re-filtered.
+        n_jobs (int): Number of worker processes. Months are independent, so with
+            n_jobs > 1 they are loaded and filtered in a process pool; the result is
+            identical to the serial one.
 
     Returns:
         pd.DataFrame: Combined and processed ride data for the specified year and months.
@@ -126,38 +735,43 @@ def load_and_process_taxi_data(
     if months is None:
         months = list(range(1, 13))
 
-    # List to store DataFrames for each month
-    monthly_rides = []
-
-    for month in months:
-        # Construct the file path
-        file_path = RAW_DATA_DIR / f"rides_{year}_{month:02}.parquet"
-
-        try:
-            # Download the file if it doesn't exist
-            if not file_path.exists():
-                print(f"Downloading data for {year}-{month:02}...")
-                fetch_raw_trip_data(year, month)
-                print(f"Successfully downloaded data for {year}-{month:02}.")
-            else:
-                print(f"File already exists for {year}-{month:02}.")
-
-            # Load the data
-            print(f"Loading data for {year}-{month:02}...")
-            rides = pd.read_parquet(file_path, engine="pyarrow")
-
-            # Filter and process the data
-            rides = filter_nyc_taxi_data(rides, year, month)
-            print(f"Successfully processed data for {year}-{month:02}.")
-
-            # Append the processed DataFrame to the list
-            monthly_rides.append(rides)
-
-        except FileNotFoundError:
-            print(f"File not found for {year}-{month:02}. Skipping...")
-        except Exception as e:
-            print(f"Error processing data for {year}-{month:02}: {str(e)}")
-            continue
+    if n_jobs > 1 and len(months) > 1:
+        # Download missing files up front so workers never race on the same file
+        missing = [
+            (year, month)
+            for month in months
+            if not (RAW_DATA_DIR / f"rides_{year}_{month:02}.parquet").exists()
+        ]
+        if missing:
+            try:
+                fetch_raw_trip_data_bulk(missing, max_workers=min(n_jobs, len(missing)))
+            except Exception as e:
+                print(str(e))
+
+        # Workers return compact column arrays; map() keeps them in month order
+        with ProcessPoolExecutor(max_workers=min(n_jobs, len(months))) as executor:
+            monthly_arrays = executor.map(
+                _load_month_arrays,
+                repeat(year),
+                months,
+                repeat(pickup_from),
+                repeat(pickup_to),
+                repeat(use_cache),
+            )
+            monthly_rides = [
+                pd.DataFrame(
+                    {"pickup_datetime": pickup_datetime, "pickup_location_id": location_id}
+                )
+                for pickup_datetime, location_id in monthly_arrays
+                if pickup_datetime is not None
+            ]
+    else:
+        monthly_rides = [
+            rides
+            for month in months
+            if (rides := _load_month(year, month, pickup_from, pickup_to, use_cache))
+            is not None
+        ]
 
     # Combine all monthly data
     if not monthly_rides:
@@ -196,21 +810,153 @@ def fill_missing_rides_full_range(df, hour_col, location_col, rides_col):
     # Get all unique location IDs
     all_locations = df[location_col].unique()
 
-    # Create a DataFrame with all combinations of hours and locations
+    # Scatter the observed rides into a dense (hours x locations) grid; every cell
+    # that has no observation stays at 0
+    hour_offsets = (df[hour_col] - full_hours[0]).to_numpy()
+    hour_idx, hour_remainder = np.divmod(hour_offsets, np.timedelta64(1, "h"))
+    on_grid = hour_remainder == np.timedelta64(0, "h")
+    location_idx = pd.Index(all_locations).get_indexer(df[location_col])
+
+    rides_grid = np.zeros((len(full_hours), len(all_locations)), dtype=int)
+    rides_grid[hour_idx[on_grid], location_idx[on_grid]] = (
+        df[rides_col].fillna(0).to_numpy()[on_grid]
+    )
+
+    # Flatten the grid back to the long format, hour-major like the full combinations
+    merged_df = pd.DataFrame(
+        {
+            hour_col: full_hours.repeat(len(all_locations)),
+            location_col: np.tile(all_locations, len(full_hours)),
+            rides_col: rides_grid.ravel(),
+        }
+    )
+
+    return merged_df
+
+
+def fill_missing_rides_full_range_merge(df, hour_col, location_col, rides_col):
+    """
+    Tuple-and-merge reference implementation of `fill_missing_rides_full_range`, kept to
+    check and benchmark the grid scatter against.
+    """
+    df[hour_col] = pd.to_datetime(df[hour_col])
+    full_hours = pd.date_range(
+        start=df[hour_col].min(), end=df[hour_col].max(), freq="h"
+    )
+    all_locations = df[location_col].unique()
+
     full_combinations = pd.DataFrame(
         [(hour, location) for hour in full_hours for location in all_locations],
         columns=[hour_col, location_col],
     )
-
-    # Merge the original DataFrame with the full combinations DataFrame
     merged_df = pd.merge(full_combinations, df, on=[hour_col, location_col], how="left")
-
-    # Fill missing rides with 0
     merged_df[rides_col] = merged_df[rides_col].fillna(0).astype(int)
-
     return merged_df
 
 
+def gap_filling_benchmark(
+    months: Iterable[int] = (1, 6, 12), n_zones: int = 260, missing: float = 0.3
+) -> pd.DataFrame:
+    """
+    Times `fill_missing_rides_full_range` against the tuple-and-merge reference.
+
+    Runs on synthetic ts_data of `n_zones` zones over 30-day months with a `missing`
+    fraction of (hour, zone) slots dropped. Peaks are traced with tracemalloc (numpy and
+    pandas buffers included); every result is checked against the reference.
+
+    Returns:
+        pd.DataFrame: months, rows, seconds and peak_mib of both implementations, and
+        whether the results matched.
+    """
+    import tracemalloc
+
+    from src.time_series import synthetic_ts_data
+
+    def traced(function, df):
+        tracemalloc.start()
+        started_at = time.perf_counter()
+        result = function(df.copy(), "pickup_hour", "pickup_location_id", "rides")
+        seconds = time.perf_counter() - started_at
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return result, seconds, peak / 2**20
+
+    rng = np.random.default_rng(0)
+    rows = []
+    for n_months in months:
+        ts_data = synthetic_ts_data(n_zones, 30 * n_months)
+        ts_data = ts_data[rng.random(len(ts_data)) >= missing].reset_index(drop=True)
+
+        merged, merge_seconds, merge_peak = traced(fill_missing_rides_full_range_merge, ts_data)
+        filled, grid_seconds, grid_peak = traced(fill_missing_rides_full_range, ts_data)
+        rows.append(
+            {
+                "months": n_months,
+                "rows": len(filled),
+                "merge_seconds": merge_seconds,
+                "grid_seconds": grid_seconds,
+                "merge_peak_mib": merge_peak,
+                "grid_peak_mib": grid_peak,
+                "identical": filled.equals(merged),
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+def load_scaling_benchmark(
+    worker_counts: Iterable[int] = (1, 2, 4, 8),
+    n_months: int = 8,
+    rides_per_month: int = 1_000_000,
+    year: int = 2000,
+) -> pd.DataFrame:
+    """
+    Times `load_and_process_taxi_data` over `n_months` months for each worker count.
+
+    Synthetic raw files of `rides_per_month` rides are written to RAW_DATA_DIR for
+    `year` (before the TLC data starts, so no real file is touched) and deleted
+    afterwards. Months are read and filtered without the processed-month cache, and every
+    result is checked against the single-worker one.
+
+    Returns:
+        pd.DataFrame: n_jobs, seconds, speedup and whether the result matched.
+    """
+    rng = np.random.default_rng(0)
+    paths = []
+    for month in range(1, n_months + 1):
+        start = pd.Timestamp(year=year, month=month, day=1)
+        pickup = start + pd.to_timedelta(rng.integers(0, 28 * 24 * 3600, rides_per_month), unit="s")
+        path = RAW_DATA_DIR / f"rides_{year}_{month:02}.parquet"
+        pd.DataFrame(
+            {
+                "tpep_pickup_datetime": pickup,
+                "tpep_dropoff_datetime": pickup
+                + pd.to_timedelta(rng.integers(60, 3600, rides_per_month), unit="s"),
+                "PULocationID": rng.integers(1, 266, rides_per_month).astype(np.int32),
+                "total_amount": rng.lognormal(3, 0.5, rides_per_month),
+            }
+        ).to_parquet(path)
+        paths.append(path)
+
+    rows = []
+    try:
+        for n_jobs in worker_counts:
+            started_at = time.perf_counter()
+            rides = load_and_process_taxi_data(
+                year, list(range(1, n_months + 1)), use_cache=False, n_jobs=n_jobs
+            )
+            seconds = time.perf_counter() - started_at
+            if not rows:
+                reference = rides
+            rows.append({"n_jobs": n_jobs, "seconds": seconds, "identical": rides.equals(reference)})
+    finally:
+        for path in paths:
+            path.unlink(missing_ok=True)
+
+    report = pd.DataFrame(rows)
+    report["speedup"] = report["seconds"].iloc[0] / report["seconds"]
+    return report
+
+
 def transform_raw_data_into_ts_data(rides: pd.DataFrame) -> pd.DataFrame:
     """
     Transform raw ride data into time series format.
@@ -231,6 +977,41 @@ def transform_raw_data_into_ts_data(rides: pd.DataFrame) -> pd.DataFrame:
         .reset_index(name="rides")
     )
 
+    return _fill_hourly_counts(agg_rides)
+
+
+def transform_raw_data_into_ts_data_streaming(
+    batches: Iterable[pd.DataFrame],
+) -> pd.DataFrame:
+    """
+    Transform batches of raw ride data into time series format.
+
+    Each batch (e.g. one month from `iter_taxi_data`) is reduced to its hourly counts
+    as soon as it arrives, so peak memory is bounded by one batch plus the counts. The
+    result is the same as `transform_raw_data_into_ts_data` on the concatenated batches.
+
+    Args:
+        batches: Iterable of DataFrames with pickup_datetime and location columns
+
+    Returns:
+        pd.DataFrame: Time series data with filled gaps
+    """
+    partial_counts = [aggregate_hourly_counts(batch) for batch in batches]
+    if not partial_counts:
+        raise ValueError("No ride batches to transform.")
+
+    # Batches may share hours (e.g. row groups of the same month), so sum their counts
+    agg_rides = (
+        pd.concat(partial_counts, ignore_index=True)
+        .groupby(["pickup_hour", "pickup_location_id"], as_index=False)["rides"]
+        .sum()
+    )
+
+    return _fill_hourly_counts(agg_rides)
+
+
+def _fill_hourly_counts(agg_rides: pd.DataFrame) -> pd.DataFrame:
+    """Gap-fills aggregated hourly counts and sorts them by location and hour."""
     agg_rides_all_slots = (
         fill_missing_rides_full_range(
             agg_rides, "pickup_hour", "pickup_location_id", "rides"
@@ -246,6 +1027,22 @@ def transform_raw_data_into_ts_data(rides: pd.DataFrame) -> pd.DataFrame:
     return agg_rides_all_slots
 
 
+def transform_raw_data_into_ts_tensor(rides: pd.DataFrame) -> TimeSeriesTensor:
+    """
+    Transform raw ride data into a dense hourly time series tensor.
+
+    Produces the same counts as `transform_raw_data_into_ts_data` (same hour range and
+    locations) as an (hours x zones) int16 array, without adding columns to `rides`.
+
+    Args:
+        rides: DataFrame with pickup_datetime and location columns
+
+    Returns:
+        TimeSeriesTensor: Hourly ride counts with gaps filled with 0
+    """
+    return TimeSeriesTensor.from_rides(rides)
+
+
 def transform_ts_data_info_features_and_target_loop(
     df, feature_col="rides", window_size=12, step_size=1
 ):
@@ -254,6 +1051,8 @@ def transform_ts_data_info_features_and_target_loop(
     The first `window_size` rows are used as features, and the next row is the target.
     The process slides down by `step_size` rows at a time to create the next set of features and target.
     Feature columns are named based on their hour offsets relative to the target.
+    Row-by-row reference implementation, kept to check the vectorized
+    `transform_ts_data_info_features_and_target` against.
 
     Parameters:
         df (pd.DataFrame): The input DataFrame containing time series data with 'pickup_hour' column.
@@ -329,8 +1128,179 @@ def transform_ts_data_info_features_and_target_loop(
     return features, targets
 
 
+def _iter_location_series(df, feature_col):
+    """
+    Yields (location_id, values, times) for every location in order of first appearance.
+
+    The frame is grouped with a single stable argsort instead of re-filtering it once per
+    location, so the rows of each location keep their original relative order.
+    """
+    codes, location_ids = pd.factorize(df["pickup_location_id"], sort=False)
+    order = np.argsort(codes, kind="stable")
+    bounds = np.cumsum(np.bincount(codes[codes >= 0], minlength=len(location_ids)))
+    order = order[len(order) - bounds[-1] :] if len(bounds) else order[:0]
+
+    values = df[feature_col].to_numpy()[order]
+    times = df["pickup_hour"].to_numpy()[order]
+
+    start = 0
+    for location_id, end in zip(np.asarray(location_ids), bounds):
+        yield location_id, values[start:end], times[start:end]
+        start = end
+
+
+def _target_columns(horizon):
+    """Target column names: 'target' for one step, 'target_h1'...'target_h<horizon>' otherwise."""
+    if horizon == 1:
+        return ["target"]
+    return [f"target_h{h}" for h in range(1, horizon + 1)]
+
+
+def _sliding_window_shard(shard, feature_col, window_size, step_size, horizon):
+    """Builds the sliding-window table of one zone shard; None if no zone has a window."""
+    try:
+        return _sliding_window_frame(shard, feature_col, window_size, step_size, horizon)[0]
+    except ValueError:
+        return None
+
+
+def _sliding_window_frame_sharded(df, feature_col, window_size, step_size, horizon, n_jobs):
+    """
+    Builds the sliding-window table in a process pool, one shard of zones per task.
+
+    Shards are runs of whole zones in the zone order of the unsharded path, so
+    concatenating their tables in shard order gives the same rows in the same order.
+    """
+    if isinstance(df, TimeSeriesTensor):
+        shards = [
+            df.select_zones(zone_ids)
+            for zone_ids in np.array_split(df.zone_ids, min(n_jobs, df.n_zones))
+        ]
+    else:
+        shards = [
+            df.iloc[rows] for rows in split_zones(df["pickup_location_id"].to_numpy(), n_jobs)
+        ]
+    frames = map_shards(
+        partial(
+            _sliding_window_shard,
+            feature_col=feature_col,
+            window_size=window_size,
+            step_size=step_size,
+            horizon=horizon,
+        ),
+        shards,
+        n_jobs,
+    )
+    frames = [frame for frame in frames if frame is not None]
+    if not frames:
+        raise ValueError(
+            "No data could be transformed. Check if input DataFrame is empty or window size is too large."
+        )
+    return pd.concat(frames, ignore_index=True)
+
+
+def _sliding_window_frame(
+    df, feature_col="rides", window_size=12, step_size=1, horizon=1, n_jobs=1
+):
+    """
+    Builds the sliding-window table for all locations with numpy strides.
+
+    Every row holds `window_size` feature values followed by the target (the next value,
+    or the next `horizon` values), the location ID and the (first) target timestamp.
+    Columns keep the numeric dtype of the source data instead of the object dtype
+    produced by appending values row by row.
+
+    Parameters:
+        df (pd.DataFrame | TimeSeriesTensor): Time series data with 'pickup_location_id' and
+            'pickup_hour' columns, or a dense tensor of ride counts.
+        feature_col (str): The column name containing the values to use as features and target.
+        window_size (int): The number of rows to use as features.
+        step_size (int): The number of rows to slide the window by.
+        horizon (int): The number of rows after each window to use as targets.
+        n_jobs (int): Number of worker processes, each building the table of a shard
+            of zones (see `_sliding_window_frame_sharded`).
+
+    Returns:
+        tuple: (DataFrame with feature columns, target columns (see `_target_columns`),
+        'pickup_location_id' and 'pickup_hour' columns, list of feature column names)
+    """
+    feature_columns = [f"{feature_col}_t-{window_size - i}" for i in range(window_size)]
+
+    if n_jobs > 1:
+        final_df = _sliding_window_frame_sharded(
+            df, feature_col, window_size, step_size, horizon, n_jobs
+        )
+        return final_df, feature_columns
+
+    if isinstance(df, TimeSeriesTensor):
+        return _sliding_window_frame_from_tensor(
+            df, feature_columns, window_size, step_size, horizon
+        )
+
+    windows, location_ids, target_times = [], [], []
+    for location_id, values, times in _iter_location_series(df, feature_col):
+        # Ensure there are enough rows to create at least one window
+        if len(values) < window_size + horizon:
+            print(
+                f"Skipping location_id {location_id}: Not enough data to create even one window."
+            )
+            continue
+
+        # Each view row is `window_size` features followed by the target value(s)
+        location_windows = sliding_window_view(values, window_size + horizon)[::step_size]
+        windows.append(location_windows)
+        location_ids.append(np.full(len(location_windows), location_id))
+        target_times.append(times[window_size : len(values) - horizon + 1 : step_size])
+
+    if not windows:
+        raise ValueError(
+            "No data could be transformed. Check if input DataFrame is empty or window size is too large."
+        )
+
+    windows = np.concatenate(windows)
+    final_df = pd.DataFrame(windows[:, :window_size], columns=feature_columns)
+    for h, target_column in enumerate(_target_columns(horizon)):
+        final_df[target_column] = windows[:, window_size + h]
+    final_df["pickup_location_id"] = np.concatenate(location_ids)
+    final_df["pickup_hour"] = np.concatenate(target_times)
+
+    return final_df, feature_columns
+
+
+def _sliding_window_frame_from_tensor(
+    ts_tensor, feature_columns, window_size, step_size, horizon=1
+):
+    """
+    Builds the sliding-window table straight from a dense (hours x zones) tensor.
+
+    All zones share the same hours, so the windows of every zone come out of a single
+    strided view. Rows are ordered by zone, then by target hour, like the long-format path.
+    """
+    if ts_tensor.n_hours < window_size + horizon:
+        raise ValueError(
+            "No data could be transformed. Check if input DataFrame is empty or window size is too large."
+        )
+
+    # (n_windows, n_zones, window_size + horizon) view, reordered zone-major
+    windows = sliding_window_view(ts_tensor.values, window_size + horizon, axis=0)[
+        ::step_size
+    ]
+    n_windows = windows.shape[0]
+    windows = windows.transpose(1, 0, 2).reshape(-1, window_size + horizon)
+
+    target_hours = ts_tensor.hours[window_size : ts_tensor.n_hours - horizon + 1 : step_size]
+
+    final_df = pd.DataFrame(windows[:, :window_size], columns=feature_columns)
+    for h, target_column in enumerate(_target_columns(horizon)):
+        final_df[target_column] = windows[:, window_size + h]
+    final_df["pickup_location_id"] = np.repeat(ts_tensor.zone_ids, n_windows)
+    final_df["pickup_hour"] = target_hours[np.tile(np.arange(n_windows), ts_tensor.n_zones)]
+
+    return final_df, feature_columns
+
+
 def transform_ts_data_info_features_and_target(
-    df, feature_col="rides", window_size=12, step_size=1
+    df, feature_col="rides", window_size=12, step_size=1, horizon=1, n_jobs=1
 ):
     """
     Transforms time series data for all unique location IDs into a tabular format.
@@ -338,78 +1308,125 @@ def transform_ts_data_info_features_and_target(
     The process slides down by `step_size` rows at a time to create the next set of features and target.
     Feature columns are named based on their hour offsets relative to the target.
 
+    Windows are built with a strided view per location, so feature and target columns keep
+    the numeric dtype of `feature_col` (int16 for ts_data) instead of object.
+
     Parameters:
-        df (pd.DataFrame): The input DataFrame containing time series data with 'pickup_hour' column.
+        df (pd.DataFrame | TimeSeriesTensor): The input DataFrame containing time series data with
+            'pickup_hour' column, or a TimeSeriesTensor (read without re-sorting or filtering).
         feature_col (str): The column name containing the values to use as features and target (default is "rides").
         window_size (int): The number of rows to use as features (default is 12).
         step_size (int): The number of rows to slide the window by (default is 1).
+        horizon (int): The number of rows after each window to use as targets (default
+            is 1). With more than one, pickup_hour is the first target hour.
+        n_jobs (int): Number of worker processes (default is 1). With more than one,
+            zones are split into shards built in a process pool; the result is identical.
 
     Returns:
-        tuple: (features DataFrame with pickup_hour, targets Series, complete DataFrame)
+        tuple: (features DataFrame with pickup_hour, targets Series; for horizon > 1 a
+        targets DataFrame with columns 'target_h1'...'target_h<horizon>')
     """
-    # Get all unique location IDs
-    location_ids = df["pickup_location_id"].unique()
-    # List to store transformed data for each location
-    transformed_data = []
-
-    # Loop through each location ID and transform the data
-    for location_id in location_ids:
-        try:
-            # Filter the data for the given location ID
-            location_data = df[df["pickup_location_id"] == location_id].reset_index(
-                drop=True
-            )
+    final_df, feature_columns = _sliding_window_frame(
+        df,
+        feature_col=feature_col,
+        window_size=window_size,
+        step_size=step_size,
+        horizon=horizon,
+        n_jobs=n_jobs,
+    )
 
-            # Extract the feature column and pickup_hour as NumPy arrays
-            values = location_data[feature_col].values
-            times = location_data["pickup_hour"].values
+    # Extract features (including pickup_hour) and targets
+    features = final_df[feature_columns + ["pickup_hour", "pickup_location_id"]]
+    if horizon == 1:
+        targets = final_df["target"]
+    else:
+        targets = final_df[_target_columns(horizon)]
 
-            # Ensure there are enough rows to create at least one window
-            if len(values) <= window_size:
-                raise ValueError("Not enough data to create even one window.")
+    return features, targets
 
-            # Create the tabular data using a sliding window approach
-            rows = []
-            for i in range(0, len(values) - window_size, step_size):
-                # The first `window_size` values are features, and the next value is the target
-                features = values[i : i + window_size]
-                target = values[i + window_size]
-                # Get the corresponding target timestamp
-                target_time = times[i + window_size]
-                # Combine features, target, location_id, and timestamp
-                row = np.append(features, [target, location_id, target_time])
-                rows.append(row)
 
-            # Convert the list of rows into a DataFrame
-            feature_columns = [
-                f"{feature_col}_t-{window_size - i}" for i in range(window_size)
-            ]
-            all_columns = feature_columns + [
-                "target",
-                "pickup_location_id",
-                "pickup_hour",
-            ]
-            transformed_df = pd.DataFrame(rows, columns=all_columns)
+def transform_ts_data_info_latest_features(
+    df,
+    window_size=12,
+    prediction_hour=None,
+    feature_col="rides",
+    short_history="pad",
+):
+    """
+    Builds one feature row per location: the `window_size` hours before `prediction_hour`.
 
-            # Append the transformed data to the list
-            transformed_data.append(transformed_df)
+    This is the inference counterpart of `transform_ts_data_info_features`. Instead of
+    every historical window it only emits the window used to predict `prediction_hour`,
+    sliced out of a dense (hours x zones) tensor in one step.
 
-        except ValueError as e:
-            print(f"Skipping location_id {location_id}: {str(e)}")
+    Parameters:
+        df (pd.DataFrame | TimeSeriesTensor): Long-format time series data with
+            'pickup_hour', 'pickup_location_id' and `feature_col` columns, or a tensor.
+        window_size (int): The number of hours to use as features (default is 12).
+        prediction_hour (pd.Timestamp, optional): Hour to predict. Defaults to the hour
+            after the latest hour in `df`. Timezone-aware values are converted to UTC,
+            naive ones are taken as UTC.
+        feature_col (str): The column name containing the values to use as features.
+        short_history (str): What to do with locations observed for fewer than
+            `window_size` hours before `prediction_hour` (a location's history starts at
+            its first row in a DataFrame, and at the tensor start for a tensor). "pad"
+            zero-fills the missing hours, "skip" drops the location.
 
-    # Combine all transformed data into a single DataFrame
-    if not transformed_data:
-        raise ValueError(
-            "No data could be transformed. Check if input DataFrame is empty or window size is too large."
+    Returns:
+        pd.DataFrame: Features DataFrame with pickup_location_id and pickup_hour, one row
+        per location, with the same columns as `transform_ts_data_info_features`.
+    """
+    if short_history not in ("pad", "skip"):
+        raise ValueError(f"short_history must be 'pad' or 'skip', got {short_history!r}.")
+
+    if isinstance(df, TimeSeriesTensor):
+        ts_tensor = df
+        first_hours = np.full(ts_tensor.n_zones, ts_tensor.start)
+    elif df.empty:
+        # An empty read has no zones, hence no windows
+        features = pd.DataFrame(
+            np.empty((0, window_size), dtype=np.int16),
+            columns=[f"{feature_col}_t-{window_size - i}" for i in range(window_size)],
+        )
+        features["pickup_location_id"] = np.empty(0, dtype=np.int16)
+        features["pickup_hour"] = pd.Series(dtype=df["pickup_hour"].dtype)
+        return features
+    else:
+        ts_tensor = TimeSeriesTensor.from_long(df, rides_col=feature_col)
+        first_hours = (
+            pd.to_datetime(df["pickup_hour"])
+            .groupby(df["pickup_location_id"].to_numpy())
+            .min()
+            .reindex(ts_tensor.zone_ids)
+            .to_numpy()
+        )
+    if prediction_hour is None:
+        prediction_hour = ts_tensor.end
+    # Features (the hour of day in particular) are built in UTC, like the ts_data
+    prediction_hour = _to_naive_timestamp(prediction_hour)
+    if ts_tensor.start.tzinfo is not None:
+        prediction_hour = prediction_hour.tz_localize("UTC")
+    if ts_tensor.end < prediction_hour:
+        print(
+            f"No data after {ts_tensor.end - pd.Timedelta(hours=1)}: zero-filling the "
+            f"hours up to {prediction_hour}."
         )
 
-    final_df = pd.concat(transformed_data, ignore_index=True)
-
-    # Extract features (including pickup_hour), targets, and keep the complete DataFrame
-    features = final_df[feature_columns + ["pickup_hour", "pickup_location_id"]]
-    targets = final_df["target"]
+    windows = ts_tensor.window(prediction_hour, window_size)
+    history_hours = (prediction_hour - pd.DatetimeIndex(first_hours)) // pd.Timedelta(hours=1)
+    short = np.asarray(history_hours) < window_size
+    if short.any():
+        print(
+            f"{short.sum()} locations have less than {window_size} hours of history: "
+            f"{'zero-padding' if short_history == 'pad' else 'skipping'} them."
+        )
+    keep = ~short if short_history == "skip" else np.ones(len(short), dtype=bool)
 
-    return features, targets
+    feature_columns = [f"{feature_col}_t-{window_size - i}" for i in range(window_size)]
+    features = pd.DataFrame(windows[keep], columns=feature_columns)
+    features["pickup_location_id"] = ts_tensor.zone_ids[keep]
+    features["pickup_hour"] = prediction_hour
+    return features
 
 
 def split_time_series_data(
@@ -476,21 +1493,28 @@ def fetch_batch_raw_data(
     historical_from_date = from_date - timedelta(weeks=52)
     historical_to_date = to_date - timedelta(weeks=52)
 
-    # Load and filter data for the historical period
+    # Load and filter data for the historical period, reading only the needed hours
     rides_from = load_and_process_taxi_data(
-        year=historical_from_date.year, months=[historical_from_date.month]
+        year=historical_from_date.year,
+        months=[historical_from_date.month],
+        pickup_from=historical_from_date,
+        pickup_to=historical_to_date,
     )
-    rides_from = rides_from[
-        rides_from.pickup_datetime >= historical_from_date.to_datetime64()
-    ]
 
-    if historical_to_date.month != historical_from_date.month:
+    # The second month is only needed if the range reaches past its first instant
+    to_month_start = historical_to_date.replace(
+        day=1, hour=0, minute=0, second=0, microsecond=0
+    )
+    if (
+        historical_to_date.month != historical_from_date.month
+        and historical_to_date > to_month_start
+    ):
         rides_to = load_and_process_taxi_data(
-            year=historical_to_date.year, months=[historical_to_date.month]
+            year=historical_to_date.year,
+            months=[historical_to_date.month],
+            pickup_from=historical_from_date,
+            pickup_to=historical_to_date,
         )
-        rides_to = rides_to[
-            rides_to.pickup_datetime < historical_to_date.to_datetime64()
-        ]
         # Combine the filtered data
         rides = pd.concat([rides_from, rides_to], ignore_index=True)
     else:
@@ -504,8 +1528,61 @@ def fetch_batch_raw_data(
     return rides
 
 
+def fetch_batch_ts_data(
+    from_date: Union[datetime, str], to_date: Union[datetime, str]
+) -> pd.DataFrame:
+    """
+    Simulate production ts_data from the hourly counts of 52 weeks ago.
+
+    Same counts as `transform_raw_data_into_ts_data(fetch_batch_raw_data(from_date, to_date))`,
+    but answered from the per-month hourly counts cache instead of individual trips, and
+    gap-filled over every hour of [from_date, to_date) for the zones that had rides. Dates
+    that are not on the hour fall back to the trip-level path.
+
+    Args:
+        from_date (datetime or str): The start date for the data batch.
+        to_date (datetime or str): The end date for the data batch.
+
+    Returns:
+        pd.DataFrame: Gap-filled time series data sorted by location and hour.
+    """
+    from_date = _to_naive_timestamp(from_date)
+    to_date = _to_naive_timestamp(to_date)
+    if from_date >= to_date:
+        raise ValueError("'from_date' must be earlier than 'to_date'.")
+    if from_date != from_date.floor("h") or to_date != to_date.floor("h"):
+        return transform_raw_data_into_ts_data(fetch_batch_raw_data(from_date, to_date))
+
+    # Shift dates back by 52 weeks (1 year)
+    historical_from_date = from_date - timedelta(weeks=52)
+    historical_to_date = to_date - timedelta(weeks=52)
+
+    monthly_counts = []
+    for month_start in pd.date_range(
+        historical_from_date.replace(day=1).floor("D"), historical_to_date, freq="MS"
+    ):
+        if month_start >= historical_to_date:
+            break
+        monthly_counts.append(
+            load_monthly_hourly_counts(
+                month_start.year,
+                month_start.month,
+                pickup_from=historical_from_date,
+                pickup_to=historical_to_date,
+            )
+        )
+    agg_rides = pd.concat(monthly_counts, ignore_index=True)
+
+    # Shift the data forward by 52 weeks to simulate recent data
+    agg_rides["pickup_hour"] += timedelta(weeks=52)
+
+    # The grid spans the requested hours rather than those that had rides, so a quiet
+    # or not yet published range comes back as zeros instead of failing
+    return TimeSeriesTensor.from_long(agg_rides, start=from_date, end=to_date).to_long()
+
+
 def transform_ts_data_info_features(
-    df, feature_col="rides", window_size=12, step_size=1
+    df, feature_col="rides", window_size=12, step_size=1, n_jobs=1
 ):
     """
     Transforms time series data for all unique location IDs into a tabular format.
@@ -514,65 +1591,52 @@ def transform_ts_data_info_features(
     Feature columns are named based on their hour offsets.
 
     Parameters:
-        df (pd.DataFrame): The input DataFrame containing time series data with 'pickup_hour' column.
+        df (pd.DataFrame | TimeSeriesTensor): The input DataFrame containing time series data with
+            'pickup_hour' column, or a TimeSeriesTensor (read without re-sorting or filtering).
         feature_col (str): The column name containing the values to use as features (default is "rides").
         window_size (int): The number of rows to use as features (default is 12).
         step_size (int): The number of rows to slide the window by (default is 1).
+        n_jobs (int): Number of worker processes (default is 1). With more than one,
+            zones are split into shards built in a process pool; the result is identical.
 
     Returns:
         pd.DataFrame: Features DataFrame with pickup_hour and location_id.
     """
-    # Get all unique location IDs
-    location_ids = df["pickup_location_id"].unique()
-    # List to store transformed data for each location
-    transformed_data = []
-
-    # Loop through each location ID and transform the data
-    for location_id in location_ids:
-        try:
-            # Filter the data for the given location ID
-            location_data = df[df["pickup_location_id"] == location_id].reset_index(
-                drop=True
-            )
-
-            # Extract the feature column and pickup_hour as NumPy arrays
-            values = location_data[feature_col].values
-            times = location_data["pickup_hour"].values
-
-            # Ensure there are enough rows to create at least one window
-            if len(values) <= window_size:
-                raise ValueError("Not enough data to create even one window.")
-
-            # Create the tabular data using a sliding window approach
-            rows = []
-            for i in range(0, len(values) - window_size, step_size):
-                # The first `window_size` values are features
-                features = values[i : i + window_size]
-                # Get the corresponding target timestamp
-                target_time = times[i + window_size]
-                row = np.append(features, [location_id, target_time])
-                rows.append(row)
+    final_df, feature_columns = _sliding_window_frame(
+        df,
+        feature_col=feature_col,
+        window_size=window_size,
+        step_size=step_size,
+        n_jobs=n_jobs,
+    )
 
-            # Convert the list of rows into a DataFrame
-            feature_columns = [
-                f"{feature_col}_t-{window_size - i}" for i in range(window_size)
-            ]
-            all_columns = feature_columns + ["pickup_location_id", "pickup_hour"]
-            transformed_df = pd.DataFrame(rows, columns=all_columns)
+    # Return only the features DataFrame
+    return final_df[feature_columns + ["pickup_location_id", "pickup_hour"]]
 
-            # Append the transformed data to the list
-            transformed_data.append(transformed_df)
 
-        except ValueError as e:
-            print(f"Skipping location_id {location_id}: {str(e)}")
+if __name__ == "__main__":
+    import argparse
 
-    # Combine all transformed data into a single DataFrame
-    if not transformed_data:
-        raise ValueError(
-            "No data could be transformed. Check if input DataFrame is empty or window size is too large."
+    parser = argparse.ArgumentParser(description="Benchmarks of the data preparation")
+    benchmarks = parser.add_subparsers(dest="benchmark", required=True)
+    gap_filling = benchmarks.add_parser(
+        "gap-filling", help="Memory and time of fill_missing_rides_full_range"
+    )
+    gap_filling.add_argument("--months", type=int, nargs="+", default=[1, 6, 12])
+    gap_filling.add_argument("--zones", type=int, default=260)
+    load_scaling = benchmarks.add_parser(
+        "load-scaling", help="Worker scaling of load_and_process_taxi_data"
+    )
+    load_scaling.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    load_scaling.add_argument("--months", type=int, default=8)
+    load_scaling.add_argument("--rides", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    if args.benchmark == "gap-filling":
+        report = gap_filling_benchmark(months=args.months, n_zones=args.zones)
+    elif args.benchmark == "load-scaling":
+        print(f"{os.cpu_count()} CPUs available")
+        report = load_scaling_benchmark(
+            worker_counts=args.workers, n_months=args.months, rides_per_month=args.rides
         )
-
-    final_df = pd.concat(transformed_data, ignore_index=True)
-
-    # Return only the features DataFrame
-    return final_df
+    print(report.to_string(index=False, float_format="%.3f"))
@@ -0,0 +1,261 @@
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import src.config as config
+from src.data_utils import NYC_ZONE_IDS
+from src.feature_store import (
+    FeatureStoreBackend,
+    LocalFeatureStore,
+    _to_utc,
+    get_feature_store_backend,
+)
+
+ONE_DAY = pd.Timedelta(days=1)
+HOURS_PER_DAY = 24
+
+
+class CachedFeatureStore(FeatureStoreBackend):
+    """
+    Read-through disk cache in front of another feature store backend.
+
+    Reads are split into day partitions keyed by (feature group or view, version, day)
+    and stored as `<cache_dir>/<name>_v<version>/<YYYY-MM-DD>.parquet`. A partition is
+    only cached once it ends more than `revalidate_hours` before now and holds a row for
+    every hour of the day and every zone of `zone_ids`; from then on it is treated as
+    immutable and served from disk. Hours after that boundary, and incomplete days (an
+    outage that may still be backfilled, or an insert job that has not finished, possibly
+    written by another machine straight to the store), are always read from the store.
+    Missing partitions are fetched with one query per contiguous run of days; zone
+    filters are pushed down to the store only for the hours that are not cached.
+
+    The cache is bounded by `max_bytes`: after each fill the least recently read
+    partitions are deleted until the cache fits again.
+
+    Writes, the high-water mark and the model registry go straight to `backend`; inserts
+    drop the cached partitions they touch, including those of feature views defined on
+    the feature group.
+
+    Args:
+        backend (FeatureStoreBackend): Store to read through to.
+        cache_dir (Path): Directory holding the cached partitions.
+        max_bytes (int): Disk budget of the cache.
+        revalidate_hours (int): Number of most recent hours that are never cached.
+        event_time (str): Event time column of the cached feature groups and views.
+        zone_ids (Iterable[int]): Zones a complete day holds a row for, every hour.
+    """
+
+    def __init__(
+        self,
+        backend: FeatureStoreBackend,
+        cache_dir: Path = config.FEATURE_CACHE_DIR,
+        max_bytes: int = config.FEATURE_CACHE_MAX_BYTES,
+        revalidate_hours: int = config.FEATURE_CACHE_REVALIDATE_HOURS,
+        event_time: str = "pickup_hour",
+        zone_ids: Iterable[int] = NYC_ZONE_IDS,
+    ):
+        self.backend = backend
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.revalidate_hours = revalidate_hours
+        self.event_time = event_time
+        self.zone_ids = np.unique(np.asarray(list(zone_ids)))
+        self._lock = threading.Lock()
+
+    def _partition_path(self, name, version, day: pd.Timestamp) -> Path:
+        return self.cache_dir / f"{name}_v{version}" / f"{day:%Y-%m-%d}.parquet"
+
+    def _immutable_before(self) -> pd.Timestamp:
+        """Days that end at or before this timestamp are served from the cache."""
+        now = pd.Timestamp.now(tz="UTC")
+        return (now - pd.Timedelta(hours=self.revalidate_hours)).floor("D")
+
+    def _to_utc_column(self, df: pd.DataFrame) -> pd.DataFrame:
+        if df.empty or self.event_time not in df:
+            return df
+        hours = pd.to_datetime(df[self.event_time])
+        hours = hours.dt.tz_localize("UTC") if hours.dt.tz is None else hours.dt.tz_convert("UTC")
+        return df.assign(**{self.event_time: hours})
+
+    def _is_complete(self, day_rows: pd.DataFrame) -> bool:
+        """True if `day_rows` hold every (hour, zone) slot of the day."""
+        in_zones = day_rows["pickup_location_id"].isin(self.zone_ids)
+        slots = day_rows.loc[in_zones, [self.event_time, "pickup_location_id"]]
+        return len(slots.drop_duplicates()) == HOURS_PER_DAY * len(self.zone_ids)
+
+    def _write_partition(self, path: Path, rows: pd.DataFrame) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        rows.to_parquet(tmp_path, engine="pyarrow", index=False)
+        os.replace(tmp_path, path)
+
+    def _read_partition(self, path: Path) -> Optional[pd.DataFrame]:
+        try:
+            rows = pd.read_parquet(path, engine="pyarrow")
+        except FileNotFoundError:
+            # Evicted by another reader
+            return None
+        # Reads refresh the LRU position of the partition
+        os.utime(path)
+        return rows
+
+    def _fill(
+        self, name, version, days: List[pd.Timestamp], fetch: Callable
+    ) -> List[pd.DataFrame]:
+        """
+        Fetches `days` for all zones from the store, one query per contiguous run, and
+        caches the complete ones.
+        """
+        runs: List[Tuple[pd.Timestamp, pd.Timestamp]] = []
+        for day in days:
+            if runs and runs[-1][1] == day:
+                runs[-1] = (runs[-1][0], day + ONE_DAY)
+            else:
+                runs.append((day, day + ONE_DAY))
+
+        frames = []
+        for run_start, run_end in runs:
+            rows = self._to_utc_column(fetch(run_start, run_end, None))
+            if rows.empty:
+                by_day = {}
+            else:
+                by_day = dict(list(rows.groupby(rows[self.event_time].dt.floor("D"))))
+            day = run_start
+            while day < run_end:
+                day_rows = by_day.get(day, rows.iloc[0:0]).reset_index(drop=True)
+                # Incomplete days are not cached, so a later backfill is seen on next read
+                if self._is_complete(day_rows):
+                    self._write_partition(self._partition_path(name, version, day), day_rows)
+                frames.append(day_rows)
+                day += ONE_DAY
+        self._evict()
+        return frames
+
+    def _evict(self) -> None:
+        with self._lock:
+            partitions = []
+            for path in self.cache_dir.glob("*/*.parquet"):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                partitions.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in partitions)
+            for _, size, path in sorted(partitions, key=lambda partition: partition[0]):
+                if total <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+
+    def _read_cached(
+        self, name, version, start, end, location_ids, fetch: Callable
+    ) -> pd.DataFrame:
+        start, end = _to_utc(start), _to_utc(end)
+        boundary = self._immutable_before()
+        if start is None or start >= boundary:
+            return self._to_utc_column(fetch(start, end, location_ids))
+
+        cached_end = boundary if end is None else min(end, boundary)
+        frames, missing = [], []
+        day = start.floor("D")
+        while day < cached_end:
+            rows = None
+            path = self._partition_path(name, version, day)
+            if path.exists():
+                rows = self._read_partition(path)
+            if rows is None:
+                missing.append(day)
+            else:
+                frames.append(rows)
+            day += ONE_DAY
+        if missing:
+            frames.extend(self._fill(name, version, missing, fetch))
+        if end is None or end > boundary:
+            frames.append(self._to_utc_column(fetch(boundary, end, location_ids)))
+
+        non_empty = [frame for frame in frames if not frame.empty]
+        if not non_empty:
+            # Keeps the columns and dtypes the store returned for the empty range
+            return frames[0].iloc[0:0].reset_index(drop=True)
+        df = pd.concat(non_empty, ignore_index=True)
+        mask = df[self.event_time] >= start
+        if end is not None:
+            mask &= df[self.event_time] < end
+        if location_ids is not None:
+            mask &= df["pickup_location_id"].isin(list(location_ids))
+        return df[mask].reset_index(drop=True)
+
+    def read_feature_group(
+        self, name, version, start=None, end=None, location_ids=None
+    ) -> pd.DataFrame:
+        return self._read_cached(
+            name,
+            version,
+            start,
+            end,
+            location_ids,
+            lambda fetch_from, fetch_to, fetch_zones: self.backend.read_feature_group(
+                name, version, start=fetch_from, end=fetch_to, location_ids=fetch_zones
+            ),
+        )
+
+    def read_feature_view_batch(self, name, version, start, end) -> pd.DataFrame:
+        return self._read_cached(
+            name,
+            version,
+            start,
+            end,
+            None,
+            lambda fetch_from, fetch_to, _: self.backend.read_feature_view_batch(
+                name, version, start=fetch_from, end=fetch_to
+            ),
+        )
+
+    def insert_feature_group(
+        self, name, version, df, primary_key, event_time, description=""
+    ) -> None:
+        self.backend.insert_feature_group(
+            name, version, df, primary_key, event_time, description
+        )
+        days = pd.to_datetime(df[event_time])
+        days = days.dt.tz_localize("UTC") if days.dt.tz is None else days.dt.tz_convert("UTC")
+        cached = [(name, version)] + [
+            (view_name, config.FEATURE_VIEW_VERSION)
+            for view_name, feature_group in LocalFeatureStore.FEATURE_VIEWS.items()
+            if feature_group == (name, version)
+        ]
+        for day in days.dt.floor("D").unique():
+            for cached_name, cached_version in cached:
+                self._partition_path(cached_name, cached_version, day).unlink(
+                    missing_ok=True
+                )
+
+    def latest_event_time(self, name, version, since=None) -> Optional[pd.Timestamp]:
+        return self.backend.latest_event_time(name, version, since=since)
+
+    def load_model(self, name, version=None):
+        return self.backend.load_model(name, version)
+
+    def latest_model_version(self, name) -> Optional[int]:
+        return self.backend.latest_model_version(name)
+
+    def load_model_metrics(self, name, version=None):
+        return self.backend.load_model_metrics(name, version)
+
+    def register_model(self, name, model, metrics, features, targets) -> None:
+        self.backend.register_model(name, model, metrics, features, targets)
+
+
+_cached_backend: Optional[CachedFeatureStore] = None
+
+
+def get_cached_feature_store() -> CachedFeatureStore:
+    """Returns the process-wide cache in front of `get_feature_store_backend()`."""
+    global _cached_backend
+    if _cached_backend is None:
+        _cached_backend = CachedFeatureStore(get_feature_store_backend())
+    return _cached_backend
@@ -1,13 +1,15 @@
+import argparse
 import logging
 import os
 import sys
 from datetime import datetime, timedelta, timezone
 
-import hopsworks
 import pandas as pd
 
 import src.config as config
-from src.data_utils import fetch_batch_raw_data, transform_raw_data_into_ts_data
+from src.data_utils import NYC_ZONE_IDS, fetch_batch_ts_data
+from src.feature_store import get_feature_store_backend
+from src.time_series import TimeSeriesTensor
 
 # Configure logging
 logging.basicConfig(
@@ -20,50 +22,107 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-# Step 1: Get the current date and time (timezone-aware)
-current_date = pd.to_datetime(datetime.now(timezone.utc)).ceil("h")
-logger.info(f"Current date and time (UTC): {current_date}")
+def get_fetch_range(current_date, high_water_mark=None, backfill_hours=0):
+    """
+    Returns the [from, to) range of pickup hours the pipeline has to (re)build.
 
-# Step 2: Define the data fetching range
-fetch_data_to = current_date
-fetch_data_from = current_date - timedelta(days=28)
-logger.info(f"Fetching data from {fetch_data_from} to {fetch_data_to}")
+    Without a high-water mark this is the full lookback window. Otherwise only
+    the hours after the high-water mark are fetched, plus `backfill_hours`
+    already-ingested hours to pick up late-arriving records.
+    """
+    fetch_data_to = current_date
+    fetch_data_from = current_date - timedelta(
+        days=config.FEATURE_PIPELINE_LOOKBACK_DAYS
+    )
+    if high_water_mark is not None:
+        if high_water_mark.tzinfo is None:
+            high_water_mark = high_water_mark.tz_localize(current_date.tz)
+        next_hour = high_water_mark + timedelta(hours=1)
+        fetch_data_from = max(
+            fetch_data_from, next_hour - timedelta(hours=backfill_hours)
+        )
+    return fetch_data_from, fetch_data_to
 
-# Step 3: Fetch raw data
-logger.info("Fetching raw data...")
-rides = fetch_batch_raw_data(fetch_data_from, fetch_data_to)
-logger.info(f"Raw data fetched. Number of records: {len(rides)}")
 
-# Step 4: Transform raw data into time-series data
-logger.info("Transforming raw data into time-series data...")
-ts_data = transform_raw_data_into_ts_data(rides)
-logger.info(
-    f"Transformation complete. Number of records in time-series data: {len(ts_data)}"
-)
+def fill_new_hours(ts_data, fetch_data_from, fetch_data_to):
+    """
+    Gap-fills ts_data over exactly [from, to) for every NYC zone.
 
-# Step 5: Connect to the Hopsworks project
-logger.info("Connecting to Hopsworks project...")
-project = hopsworks.login(
-    project=config.HOPSWORKS_PROJECT_NAME, api_key_value=config.HOPSWORKS_API_KEY
-)
-logger.info("Connected to Hopsworks project.")
+    Every zone gets a row for every hour, even when no ride was recorded in the
+    range, so full and incremental runs write the same zones.
+    """
+    start = fetch_data_from.tz_convert(None)
+    end = fetch_data_to.tz_convert(None)
+    return TimeSeriesTensor.from_long(
+        ts_data, zone_ids=NYC_ZONE_IDS, start=start, end=end
+    ).to_long()
 
-# Step 6: Connect to the feature store
-logger.info("Connecting to the feature store...")
-feature_store = project.get_feature_store()
-logger.info("Connected to the feature store.")
 
-# Step 7: Connect to or create the feature group
-logger.info(
-    f"Connecting to the feature group: {config.FEATURE_GROUP_NAME} (version {config.FEATURE_GROUP_VERSION})..."
-)
-feature_group = feature_store.get_feature_group(
-    name=config.FEATURE_GROUP_NAME,
-    version=config.FEATURE_GROUP_VERSION,
-)
-logger.info("Feature group ready.")
+def run(full_refresh=False, backfill_hours=config.FEATURE_PIPELINE_BACKFILL_HOURS):
+    # Step 1: Get the current date and time (timezone-aware)
+    current_date = pd.to_datetime(datetime.now(timezone.utc)).ceil("h")
+    logger.info(f"Current date and time (UTC): {current_date}")
+
+    # Step 2: Connect to the feature store
+    logger.info(f"Connecting to the feature store ({config.FEATURE_STORE_BACKEND})...")
+    feature_store = get_feature_store_backend()
+    logger.info("Connected to the feature store.")
+
+    # Step 3: Define the data fetching range
+    high_water_mark = None
+    if not full_refresh:
+        high_water_mark = feature_store.latest_event_time(
+            config.FEATURE_GROUP_NAME,
+            config.FEATURE_GROUP_VERSION,
+            since=current_date
+            - timedelta(days=config.FEATURE_PIPELINE_LOOKBACK_DAYS),
+        )
+        logger.info(f"High-water mark (last ingested pickup_hour): {high_water_mark}")
+    fetch_data_from, fetch_data_to = get_fetch_range(
+        current_date, high_water_mark, backfill_hours
+    )
+    if fetch_data_from >= fetch_data_to:
+        logger.info("No new hours to ingest.")
+        return
+    logger.info(f"Fetching data from {fetch_data_from} to {fetch_data_to}")
+
+    # Step 4: Fetch hourly ride counts (from the per-month counts cache)
+    logger.info("Fetching hourly ride counts...")
+    ts_data = fetch_batch_ts_data(fetch_data_from, fetch_data_to)
+    logger.info(f"Hourly counts fetched. Number of records: {len(ts_data)}")
+
+    # Step 5: Fill every NYC zone and hour of the range, in full and incremental runs
+    logger.info("Filling missing hours and zones of the range...")
+    ts_data = fill_new_hours(ts_data, fetch_data_from, fetch_data_to)
+    logger.info(
+        f"Transformation complete. Number of records in time-series data: {len(ts_data)}"
+    )
+
+    # Step 6: Insert data into the feature group
+    logger.info("Inserting data into the feature group...")
+    feature_store.insert_feature_group(
+        config.FEATURE_GROUP_NAME,
+        config.FEATURE_GROUP_VERSION,
+        ts_data,
+        primary_key=["pickup_location_id", "pickup_hour"],
+        event_time="pickup_hour",
+    )
+    logger.info("Data insertion completed.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hourly taxi rides feature pipeline")
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Rebuild the whole lookback window instead of only the new hours.",
+    )
+    parser.add_argument(
+        "--backfill-hours",
+        type=int,
+        default=config.FEATURE_PIPELINE_BACKFILL_HOURS,
+        help="Already-ingested hours to re-process for late-arriving records.",
+    )
+    args = parser.parse_args()
 
-# Step 8: Insert data into the feature group
-logger.info("Inserting data into the feature group...")
-feature_group.insert(ts_data, write_options={"wait_for_job": False})
-logger.info("Data insertion completed.")
+    run(full_refresh=args.full, backfill_hours=args.backfill_hours)
@@ -0,0 +1,700 @@
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import joblib
+import pandas as pd
+import pyarrow.parquet as pq
+import requests
+
+import src.config as config
+
+TimeBound = Optional[Union[datetime, str]]
+
+
+def _to_utc(value: TimeBound) -> Optional[pd.Timestamp]:
+    """Converts a time bound to a UTC timestamp; naive values are taken as UTC."""
+    if value is None:
+        return None
+    value = pd.Timestamp(value)
+    return value.tz_localize("UTC") if value.tzinfo is None else value.tz_convert("UTC")
+
+
+class FeatureStoreBackend(ABC):
+    """
+    Storage used by the feature, inference and training pipelines.
+
+    Covers the three things the project keeps in Hopsworks: time-series feature groups
+    (read with a time range, upserted on their primary key), the feature view that
+    serves inference batches, and the model registry.
+
+    All time ranges are half-open, [start, end), on the feature group's event time.
+    """
+
+    @abstractmethod
+    def read_feature_group(
+        self,
+        name: str,
+        version: int,
+        start: TimeBound = None,
+        end: TimeBound = None,
+        location_ids: Optional[Iterable[int]] = None,
+    ) -> pd.DataFrame:
+        """Reads the rows of a feature group within [start, end)."""
+
+    def iter_feature_group(
+        self,
+        name: str,
+        version: int,
+        start: TimeBound,
+        end: TimeBound,
+        location_ids: Optional[Iterable[int]] = None,
+        page: timedelta = timedelta(days=config.FEATURE_STORE_READ_PAGE_DAYS),
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Reads [start, end) as consecutive pages of at most `page` of event time.
+
+        Each page is a separate bounded query, so a long range never turns into one
+        unbounded read. Empty pages are skipped.
+        """
+        start, end = _to_utc(start), _to_utc(end)
+        if location_ids is not None:
+            location_ids = list(location_ids)
+        while start < end:
+            page_end = min(start + page, end)
+            rows = self.read_feature_group(
+                name, version, start=start, end=page_end, location_ids=location_ids
+            )
+            if not rows.empty:
+                yield rows
+            start = page_end
+
+    @abstractmethod
+    def insert_feature_group(
+        self,
+        name: str,
+        version: int,
+        df: pd.DataFrame,
+        primary_key: List[str],
+        event_time: str,
+        description: str = "",
+    ) -> None:
+        """Upserts `df` into a feature group, creating the group if needed."""
+
+    @abstractmethod
+    def read_feature_view_batch(
+        self, name: str, version: int, start: TimeBound, end: TimeBound
+    ) -> pd.DataFrame:
+        """Reads a batch of a feature view within [start, end)."""
+
+    @abstractmethod
+    def latest_event_time(
+        self, name: str, version: int, since: TimeBound = None
+    ) -> Optional[pd.Timestamp]:
+        """Returns the latest event time stored in a feature group after `since`."""
+
+    @abstractmethod
+    def load_model(self, name: str, version: Optional[int] = None):
+        """Loads a registered model; the latest version if `version` is None."""
+
+    @abstractmethod
+    def latest_model_version(self, name: str) -> Optional[int]:
+        """Returns the latest registered version of `name` without fetching the artifact."""
+
+    @abstractmethod
+    def load_model_metrics(
+        self, name: str, version: Optional[int] = None
+    ) -> Optional[Dict[str, float]]:
+        """Returns the training metrics of a registered model, or None if there is none."""
+
+    @abstractmethod
+    def register_model(
+        self,
+        name: str,
+        model,
+        metrics: Dict[str, float],
+        features: pd.DataFrame,
+        targets: pd.Series,
+    ) -> None:
+        """Registers `model` as the next version of `name`."""
+
+
+def _hopsworks_login():
+    import hopsworks
+
+    return hopsworks.login(
+        project=config.HOPSWORKS_PROJECT_NAME,
+        api_key_value=config.HOPSWORKS_API_KEY,
+    )
+
+
+def _is_connection_error(exc: Exception) -> bool:
+    """True for errors that a fresh login can fix: dropped connections and expired auth."""
+    if isinstance(exc, (ConnectionError, TimeoutError, requests.exceptions.ConnectionError)):
+        return True
+    response = getattr(exc, "response", None)
+    return getattr(response, "status_code", None) == 401
+
+
+class HopsworksSession:
+    """
+    Process-wide Hopsworks connection shared by every caller.
+
+    The project is logged into lazily on first use and reused until it is older than
+    `ttl_seconds`; the feature store, model registry, feature group and feature view
+    handles are cached on top of it and dropped together with it. All methods are
+    thread-safe, and concurrent first callers wait for a single login.
+
+    Args:
+        login (Optional[Callable]): Returns a logged-in project. Defaults to
+            `hopsworks.login` with the configured project and API key.
+        ttl_seconds (float): Age after which the next call logs in again.
+        clock (Callable[[], float]): Monotonic clock, in seconds.
+    """
+
+    def __init__(
+        self,
+        login: Optional[Callable] = None,
+        ttl_seconds: float = config.HOPSWORKS_SESSION_TTL_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._login = login or _hopsworks_login
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._lock = threading.RLock()
+        self._project = None
+        self._logged_in_at = None
+        self._handles: Dict[Tuple, object] = {}
+
+    def _ensure_project(self):
+        if self._project is None or self._clock() - self._logged_in_at >= self.ttl_seconds:
+            self._handles = {}
+            self._project = self._login()
+            self._logged_in_at = self._clock()
+        return self._project
+
+    def _handle(self, key: Tuple, create: Callable):
+        with self._lock:
+            self._ensure_project()
+            if key not in self._handles:
+                self._handles[key] = create()
+            return self._handles[key]
+
+    @property
+    def project(self):
+        with self._lock:
+            return self._ensure_project()
+
+    @property
+    def feature_store(self):
+        return self._handle(("feature_store",), lambda: self._project.get_feature_store())
+
+    @property
+    def model_registry(self):
+        return self._handle(
+            ("model_registry",), lambda: self._project.get_model_registry()
+        )
+
+    def feature_group(self, name: str, version: int):
+        return self._handle(
+            ("feature_group", name, version),
+            lambda: self.feature_store.get_feature_group(name=name, version=version),
+        )
+
+    def feature_view(self, name: str, version: int):
+        return self._handle(
+            ("feature_view", name, version),
+            lambda: self.feature_store.get_feature_view(name=name, version=version),
+        )
+
+    def cache_handle(self, key: Tuple, handle) -> None:
+        """Stores a handle created outside the session, e.g. by get_or_create_feature_group."""
+        with self._lock:
+            self._ensure_project()
+            self._handles[key] = handle
+
+    def reset(self) -> None:
+        """Drops the project and every handle; the next call logs in again."""
+        with self._lock:
+            self._project = None
+            self._logged_in_at = None
+            self._handles = {}
+
+    def run(self, operation: Callable[["HopsworksSession"], object]):
+        """
+        Runs `operation(session)`, reconnecting and retrying once on a connection error.
+        """
+        try:
+            return operation(self)
+        except Exception as exc:
+            if not _is_connection_error(exc):
+                raise
+            self.reset()
+            return operation(self)
+
+
+_session: Optional[HopsworksSession] = None
+_session_lock = threading.Lock()
+
+
+def get_hopsworks_session() -> HopsworksSession:
+    """Returns the process-wide Hopsworks session."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = HopsworksSession()
+        return _session
+
+
+class HopsworksFeatureStore(FeatureStoreBackend):
+    """
+    Feature store backend on a Hopsworks project.
+
+    Args:
+        session (Optional[HopsworksSession]): Connection to use. Defaults to the
+            process-wide session, so logins and handles are shared across backends.
+    """
+
+    def __init__(self, session: Optional[HopsworksSession] = None):
+        self.session = session or get_hopsworks_session()
+
+    def get_project(self):
+        return self.session.project
+
+    def get_feature_store(self):
+        return self.session.feature_store
+
+    def get_model_registry(self):
+        return self.session.model_registry
+
+    def read_feature_group(
+        self, name, version, start=None, end=None, location_ids=None
+    ) -> pd.DataFrame:
+        def read(session):
+            fg = session.feature_group(name, version)
+            query = fg.select_all()
+            if start is not None:
+                query = query.filter(fg.pickup_hour >= _to_utc(start))
+            if end is not None:
+                query = query.filter(fg.pickup_hour < _to_utc(end))
+            if location_ids is not None:
+                query = query.filter(fg.pickup_location_id.isin(list(location_ids)))
+            return query.read()
+
+        return self.session.run(read)
+
+    def insert_feature_group(
+        self, name, version, df, primary_key, event_time, description=""
+    ) -> None:
+        def insert(session):
+            fg = session.feature_store.get_or_create_feature_group(
+                name=name,
+                version=version,
+                description=description,
+                primary_key=primary_key,
+                event_time=event_time,
+            )
+            session.cache_handle(("feature_group", name, version), fg)
+            fg.insert(df, write_options={"wait_for_job": False})
+
+        self.session.run(insert)
+
+    def read_feature_view_batch(self, name, version, start, end) -> pd.DataFrame:
+        from hsfs.client.exceptions import RestAPIError
+
+        start, end = _to_utc(start), _to_utc(end)
+
+        def read(session):
+            feature_view = session.feature_view(name, version)
+            # Batch reads are day-granular, so pad the window and trim afterwards
+            return feature_view.get_batch_data(
+                start_time=(start - timedelta(days=1)),
+                end_time=(end + timedelta(days=1)),
+            )
+
+        try:
+            ts_data = self.session.run(read)
+            print("⚙️ Fetched data via Feature View")
+        except RestAPIError as e:
+            if _is_connection_error(e):
+                raise
+            print(f"⚠ Feature View unavailable, using Feature Group fallback: {e}")
+            ts_data = self.read_feature_group(
+                config.FEATURE_GROUP_NAME,
+                config.FEATURE_GROUP_VERSION,
+                start=start,
+                end=end,
+            )
+            print("ℹ Fetched data via Feature Group")
+        return ts_data[(ts_data.pickup_hour >= start) & (ts_data.pickup_hour < end)]
+
+    def _latest_pickup_hour(self, name, version, start) -> Optional[pd.Timestamp]:
+        def read(session):
+            fg = session.feature_group(name, version)
+            query = fg.select(["pickup_hour"])
+            if start is not None:
+                query = query.filter(fg.pickup_hour >= start)
+            return query.read()
+
+        stored_hours = self.session.run(read)
+        if stored_hours.empty:
+            return None
+        return pd.Timestamp(stored_hours["pickup_hour"].max())
+
+    def latest_event_time(
+        self, name, version, since=None, first_window=timedelta(days=1), growth=4
+    ) -> Optional[pd.Timestamp]:
+        """
+        Queries cannot aggregate, so the pickup hours of the last `first_window` are read
+        first and the window only grows (`growth` times per query, down to `since`)
+        while it is empty. An hourly run reads about a day of hours instead of the whole
+        lookback.
+        """
+        since = _to_utc(since)
+        if since is None:
+            return self._latest_pickup_hour(name, version, None)
+
+        now, window = pd.Timestamp.now(tz="UTC"), first_window
+        while True:
+            window_start = max(now - window, since)
+            latest = self._latest_pickup_hour(name, version, window_start)
+            if latest is not None or window_start == since:
+                return latest
+            window *= growth
+
+    def _get_registry_model(self, name, version=None):
+        def get(session):
+            if version:
+                return session.model_registry.get_model(name=name, version=version)
+            models = session.model_registry.get_models(name=name)
+            if not models:
+                return None
+            return max(models, key=lambda model: model.version)
+
+        return self.session.run(get)
+
+    def latest_model_version(self, name) -> Optional[int]:
+        model = self._get_registry_model(name)
+        return None if model is None else model.version
+
+    def load_model(self, name, version=None):
+        registry_model = self._get_registry_model(name, version)
+        return self.session.run(lambda session: registry_model.get_model())
+
+    def load_model_metrics(self, name, version=None):
+        model = self._get_registry_model(name, version)
+        return None if model is None else model.training_metrics
+
+    def register_model(self, name, model, metrics, features, targets) -> None:
+        from hsml.model_schema import ModelSchema
+        from hsml.schema import Schema
+
+        model_path = config.MODELS_DIR / "lgb_model.pkl"
+        joblib.dump(model, model_path)
+
+        input_schema = Schema(features)
+        output_schema = Schema(targets)
+        model_schema = ModelSchema(input_schema=input_schema, output_schema=output_schema)
+
+        def save(session):
+            registry_model = session.model_registry.sklearn.create_model(
+                name=name,
+                metrics=metrics,
+                input_example=features.sample(),
+                model_schema=model_schema,
+            )
+            registry_model.save(str(model_path))
+
+        self.session.run(save)
+
+
+class LocalFeatureStore(FeatureStoreBackend):
+    """
+    Feature store backend on the local disk, for offline runs and benchmarks.
+
+    Feature groups are parquet files partitioned by event day under
+    `<root>/feature_groups/<name>_v<version>/date=<YYYY-MM-DD>.parquet`, so a time-range
+    read only opens the days it covers. Feature views map to the feature group they are
+    defined on (see `FEATURE_VIEWS`). Models are pickled under
+    `<root>/models/<name>/v<version>/` with their metrics next to them.
+    """
+
+    FEATURE_VIEWS = {
+        config.FEATURE_VIEW_NAME: (config.FEATURE_GROUP_NAME, config.FEATURE_GROUP_VERSION),
+    }
+
+    def __init__(self, root: Path = config.LOCAL_FEATURE_STORE_DIR):
+        self.root = Path(root)
+
+    def _feature_group_dir(self, name, version) -> Path:
+        return self.root / "feature_groups" / f"{name}_v{version}"
+
+    def _read_metadata(self, name, version) -> Dict:
+        metadata_path = self._feature_group_dir(name, version) / "_metadata.json"
+        if not metadata_path.exists():
+            raise ValueError(f"Feature group {name} (version {version}) does not exist.")
+        return json.loads(metadata_path.read_text())
+
+    def _partitions(self, name, version, start=None, end=None) -> List[Path]:
+        partitions = sorted(self._feature_group_dir(name, version).glob("date=*.parquet"))
+        first_day = None if start is None else start.floor("D")
+        last_day = None if end is None else (end - pd.Timedelta(1)).floor("D")
+        selected = []
+        for partition in partitions:
+            day = pd.Timestamp(partition.stem.split("=", 1)[1], tz="UTC")
+            if (first_day is None or day >= first_day) and (
+                last_day is None or day <= last_day
+            ):
+                selected.append(partition)
+        return selected
+
+    def read_feature_group(
+        self, name, version, start=None, end=None, location_ids=None
+    ) -> pd.DataFrame:
+        event_time = self._read_metadata(name, version)["event_time"]
+        start, end = _to_utc(start), _to_utc(end)
+
+        filters = []
+        if start is not None:
+            filters.append((event_time, ">=", start))
+        if end is not None:
+            filters.append((event_time, "<", end))
+        if location_ids is not None:
+            filters.append(("pickup_location_id", "in", list(location_ids)))
+
+        frames = [
+            pd.read_parquet(partition, engine="pyarrow", filters=filters or None)
+            for partition in self._partitions(name, version, start, end)
+        ]
+        if not frames:
+            return self._empty_frame(name, version)
+        return pd.concat(frames, ignore_index=True)
+
+    def _empty_frame(self, name, version) -> pd.DataFrame:
+        """Returns a frame without rows but with the columns and dtypes of the feature group."""
+        partitions = self._partitions(name, version)
+        if partitions:
+            return pq.read_schema(partitions[0]).empty_table().to_pandas()
+        schema = self._read_metadata(name, version).get("schema", {})
+        return pd.DataFrame(
+            {column: pd.Series(dtype=dtype) for column, dtype in schema.items()}
+        )
+
+    def insert_feature_group(
+        self, name, version, df, primary_key, event_time, description=""
+    ) -> None:
+        df = df.copy()
+        df[event_time] = pd.to_datetime(df[event_time])
+        if df[event_time].dt.tz is None:
+            df[event_time] = df[event_time].dt.tz_localize("UTC")
+        else:
+            df[event_time] = df[event_time].dt.tz_convert("UTC")
+
+        fg_dir = self._feature_group_dir(name, version)
+        fg_dir.mkdir(parents=True, exist_ok=True)
+        metadata_path = fg_dir / "_metadata.json"
+        if not metadata_path.exists():
+            metadata_path.write_text(
+                json.dumps(
+                    {
+                        "primary_key": primary_key,
+                        "event_time": event_time,
+                        "description": description,
+                        # Columns of empty reads
+                        "schema": {column: str(dtype) for column, dtype in df.dtypes.items()},
+                    }
+                )
+            )
+
+        # Upsert day by day: new rows replace stored rows with the same primary key
+        for day, day_rows in df.groupby(df[event_time].dt.floor("D")):
+            partition = fg_dir / f"date={day:%Y-%m-%d}.parquet"
+            if partition.exists():
+                day_rows = pd.concat(
+                    [pd.read_parquet(partition, engine="pyarrow"), day_rows],
+                    ignore_index=True,
+                )
+            day_rows = (
+                day_rows.drop_duplicates(subset=primary_key, keep="last")
+                .sort_values(primary_key)
+                .reset_index(drop=True)
+            )
+            tmp_path = partition.with_suffix(".parquet.tmp")
+            day_rows.to_parquet(tmp_path, engine="pyarrow", index=False)
+            os.replace(tmp_path, partition)
+
+    def read_feature_view_batch(self, name, version, start, end) -> pd.DataFrame:
+        fg_name, fg_version = self.FEATURE_VIEWS[name]
+        return self.read_feature_group(fg_name, fg_version, start=start, end=end)
+
+    def latest_event_time(self, name, version, since=None) -> Optional[pd.Timestamp]:
+        if not self._feature_group_dir(name, version).exists():
+            return None
+        event_time = self._read_metadata(name, version)["event_time"]
+        since = _to_utc(since)
+        filters = None if since is None else [(event_time, ">=", since)]
+        # Partitions are days, so the newest one with a row after `since` holds the max
+        for partition in reversed(self._partitions(name, version, start=since)):
+            stored = pd.read_parquet(
+                partition, engine="pyarrow", columns=[event_time], filters=filters
+            )
+            if not stored.empty:
+                return pd.Timestamp(stored[event_time].max())
+        return None
+
+    def _model_dir(self, name, version=None) -> Optional[Path]:
+        if version:
+            return self.root / "models" / name / f"v{version}"
+        versions = [
+            int(path.name[1:]) for path in (self.root / "models" / name).glob("v*")
+        ]
+        return self._model_dir(name, max(versions)) if versions else None
+
+    def load_model(self, name, version=None):
+        model_dir = self._model_dir(name, version)
+        if model_dir is None or not model_dir.exists():
+            raise ValueError(f"Model {name} (version {version}) is not registered.")
+        return joblib.load(model_dir / "model.pkl")
+
+    def latest_model_version(self, name) -> Optional[int]:
+        model_dir = self._model_dir(name)
+        return None if model_dir is None else int(model_dir.name[1:])
+
+    def load_model_metrics(self, name, version=None):
+        model_dir = self._model_dir(name, version)
+        if model_dir is None or not model_dir.exists():
+            return None
+        return json.loads((model_dir / "metrics.json").read_text())
+
+    def register_model(self, name, model, metrics, features, targets) -> None:
+        latest_dir = self._model_dir(name)
+        version = 1 if latest_dir is None else int(latest_dir.name[1:]) + 1
+        model_dir = self.root / "models" / name / f"v{version}"
+        model_dir.mkdir(parents=True)
+        joblib.dump(model, model_dir / "model.pkl")
+        (model_dir / "metrics.json").write_text(
+            json.dumps({key: float(value) for key, value in metrics.items()})
+        )
+
+
+_BACKENDS = {
+    "hopsworks": HopsworksFeatureStore,
+    "local": LocalFeatureStore,
+}
+_backend: Optional[FeatureStoreBackend] = None
+
+
+def get_feature_store_backend() -> FeatureStoreBackend:
+    """
+    Returns the process-wide feature store backend selected by
+    `config.FEATURE_STORE_BACKEND` ("hopsworks" or "local").
+    """
+    global _backend
+    if _backend is None:
+        try:
+            _backend = _BACKENDS[config.FEATURE_STORE_BACKEND]()
+        except KeyError:
+            raise ValueError(
+                f"Unknown feature store backend {config.FEATURE_STORE_BACKEND!r}; "
+                f"expected one of {sorted(_BACKENDS)}."
+            ) from None
+    return _backend
+
+
+def pushdown_benchmark(
+    history_days: Iterable[int] = (400, 550, 730),
+    n_zones: int = 262,
+    hours: int = 12,
+    days: int = 30,
+) -> pd.DataFrame:
+    """
+    Times the windowed reads of `src.inference` against reading the whole feature group.
+
+    For every history length, a LocalFeatureStore in a temporary directory holds hourly
+    rides of `n_zones` zones up to now. The windows of `fetch_hourly_rides(hours)` and
+    `fetch_days_data(days)` are read with the bounds pushed down to the store, and by
+    reading the whole group and masking it in pandas; both must return the same rows.
+
+    Returns:
+        pd.DataFrame: history_days and stored_rows, then the rows, full-read seconds and
+        pushdown seconds of each window, and whether the results matched.
+    """
+    from src.time_series import synthetic_ts_data
+
+    def timed(function):
+        started_at = time.perf_counter()
+        result = function()
+        return time.perf_counter() - started_at, result
+
+    now = pd.Timestamp.now(tz="UTC")
+    name, keys = config.FEATURE_GROUP_NAME, ["pickup_location_id", "pickup_hour"]
+    hours_start = now.floor("h") - pd.Timedelta(hours=hours)
+    days_start, days_end = now - pd.Timedelta(days=365 + days), now - pd.Timedelta(days=365)
+
+    rows = []
+    for history in history_days:
+        with tempfile.TemporaryDirectory() as root:
+            store = LocalFeatureStore(Path(root))
+            ts_data = synthetic_ts_data(
+                n_zones, history, start=now.floor("h") - pd.Timedelta(days=history)
+            )
+            store.insert_feature_group(name, 1, ts_data, keys, "pickup_hour")
+
+            def full_read(start, end=None):
+                stored = store.read_feature_group(name, 1)
+                keep = stored["pickup_hour"] >= start
+                if end is not None:
+                    keep &= stored["pickup_hour"] < end
+                return stored[keep]
+
+            reads = {
+                "hourly": (
+                    lambda: full_read(hours_start),
+                    lambda: store.read_feature_group(name, 1, start=hours_start),
+                ),
+                "days": (
+                    lambda: full_read(days_start, days_end),
+                    lambda: pd.concat(
+                        store.iter_feature_group(name, 1, start=days_start, end=days_end),
+                        ignore_index=True,
+                    ),
+                ),
+            }
+            row, identical = {"history_days": history, "stored_rows": len(ts_data)}, True
+            for window, (full, pushdown) in reads.items():
+                full_seconds, expected = timed(full)
+                pushdown_seconds, result = timed(pushdown)
+                identical &= result.sort_values(keys, ignore_index=True).equals(
+                    expected.sort_values(keys, ignore_index=True)
+                )
+                row.update(
+                    {
+                        f"{window}_rows": len(result),
+                        f"{window}_full_seconds": full_seconds,
+                        f"{window}_pushdown_seconds": pushdown_seconds,
+                    }
+                )
+            rows.append({**row, "identical": identical})
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark of time-range pushdown against full feature group reads"
+    )
+    parser.add_argument("--history-days", type=int, nargs="+", default=[400, 550, 730])
+    parser.add_argument("--zones", type=int, default=262)
+    args = parser.parse_args()
+
+    print(
+        pushdown_benchmark(history_days=args.history_days, n_zones=args.zones).to_string(
+            index=False, float_format="%.3f"
+        )
+    )
@@ -1,28 +1,73 @@
+import argparse
+import time
 from datetime import datetime, timedelta, timezone
 
-import hopsworks
 import numpy as np
 import pandas as pd
-from hsfs.feature_store import FeatureStore
 
 import src.config as config
-from src.data_utils import transform_ts_data_info_features
+from src.data_utils import transform_ts_data_info_latest_features
+from src.feature_cache import get_cached_feature_store
+from src.feature_store import HopsworksFeatureStore, get_feature_store_backend
+from src.model_cache import get_model_cache
+from src.pipeline_utils import get_booster_predictor, get_pipeline_horizon
+from src.sharding import map_shards, split_zones
 
 
-def get_hopsworks_project() -> hopsworks.project.Project:
-    return hopsworks.login(
-        project=config.HOPSWORKS_PROJECT_NAME, api_key_value=config.HOPSWORKS_API_KEY
-    )
+def get_hopsworks_project():
+    return HopsworksFeatureStore().get_project()
 
 
-def get_feature_store() -> FeatureStore:
+def get_feature_store():
     project = get_hopsworks_project()
     return project.get_feature_store()
 
 
-def get_model_predictions(model, features: pd.DataFrame) -> pd.DataFrame:
+def _predict(model, features: pd.DataFrame, use_booster: bool) -> np.ndarray:
+    # Score through the LightGBM booster directly when the model allows it
+    predictor = get_booster_predictor(model) if use_booster else None
+    if predictor is not None:
+        return predictor.predict(features)
+    return model.predict(features)
+
+
+# Model of a prediction worker process, set once per worker by its initializer
+_worker_model = {}
+
+
+def _init_prediction_worker(model, use_booster: bool) -> None:
+    _worker_model["model"] = model
+    _worker_model["use_booster"] = use_booster
+    predictor = get_booster_predictor(model) if use_booster else None
+    if predictor is not None:
+        # The pool provides the parallelism; threads per worker would oversubscribe
+        predictor.num_threads = 1
+
+
+def _predict_shard(features: pd.DataFrame) -> np.ndarray:
+    return _predict(_worker_model["model"], features, _worker_model["use_booster"])
+
+
+def get_model_predictions(
+    model, features: pd.DataFrame, use_booster: bool = True, n_jobs: int = 1
+) -> pd.DataFrame:
     # past_rides_columns = [c for c in features.columns if c.startswith('rides_')]
-    predictions = model.predict(features)
+    if n_jobs > 1:
+        # Zone shards are scored in a process pool (the model is sent once per worker)
+        # and their predictions written back to the positions of their rows
+        shards = split_zones(features["pickup_location_id"].to_numpy(), n_jobs)
+        predictions = np.full(len(features), np.nan)
+        shard_predictions = map_shards(
+            _predict_shard,
+            [features.iloc[rows] for rows in shards],
+            n_jobs,
+            initializer=_init_prediction_worker,
+            initargs=(model, use_booster),
+        )
+        for rows, values in zip(shards, shard_predictions):
+            predictions[rows] = values
+    else:
+        predictions = _predict(model, features, use_booster)
     results = pd.DataFrame()
     results["pickup_location_id"] = features["pickup_location_id"].values
     results["predicted_demand"] = predictions.round(0)
@@ -30,83 +75,128 @@ def get_model_predictions(model, features: pd.DataFrame) -> pd.DataFrame:
     return results
 
 
+def get_multi_horizon_predictions(
+    model, features: pd.DataFrame, horizon: int = config.PREDICTION_HORIZON_HOURS
+) -> pd.DataFrame:
+    """
+    Predicts the next `horizon` hours for every row of `features`.
+
+    A direct multi-horizon model (`get_pipeline(horizon=...)`) is scored once. A
+    next-hour model is rolled out recursively: each step predicts all zones in one call,
+    and the predictions are appended to the ride windows used by the next step.
+
+    Returns:
+        pd.DataFrame: pickup_location_id, pickup_hour (the predicted hour), horizon (1 for
+        the first hour of `features`) and predicted_demand, ordered by zone then horizon.
+
+    Raises:
+        ValueError: If a direct model predicts fewer hours than `horizon`.
+    """
+    model_horizon = get_pipeline_horizon(model)
+    if 1 < model_horizon < horizon:
+        raise ValueError(
+            f"The model predicts {model_horizon} hours directly, fewer than the "
+            f"requested horizon of {horizon}."
+        )
+
+    ride_columns = sorted(
+        [c for c in features.columns if c.startswith("rides_t-")],
+        key=lambda c: -int(c.split("-")[1]),
+    )
+    window_size = len(ride_columns)
+    zone_ids = features["pickup_location_id"].to_numpy()
+    pickup_hours = pd.DatetimeIndex(features["pickup_hour"])
+
+    predictor = get_booster_predictor(model)
+    predict = predictor.predict if predictor is not None else model.predict
+
+    first = np.asarray(predict(features))
+    if model_horizon > 1:
+        predictions = first[:, :horizon]
+    else:
+        # Sliding buffer: the window of step h is rides[:, h : h + window_size]
+        rides = np.empty((len(features), window_size + horizon), dtype=np.float32)
+        rides[:, :window_size] = features[ride_columns].to_numpy(np.float32)
+        rides[:, window_size] = np.clip(first, 0, None)
+        for h in range(1, horizon):
+            step_features = pd.DataFrame(
+                rides[:, h : h + window_size], columns=ride_columns
+            )
+            step_features["pickup_location_id"] = zone_ids
+            step_features["pickup_hour"] = pickup_hours + timedelta(hours=h)
+            rides[:, window_size + h] = np.clip(predict(step_features), 0, None)
+        predictions = rides[:, window_size:]
+
+    horizons = np.arange(1, horizon + 1)
+    return pd.DataFrame(
+        {
+            "pickup_location_id": np.repeat(zone_ids, horizon),
+            "pickup_hour": np.repeat(pickup_hours, horizon)
+            + pd.to_timedelta(np.tile(horizons - 1, len(features)), unit="h"),
+            "horizon": np.tile(horizons, len(features)).astype(np.int16),
+            "predicted_demand": predictions.ravel().round(0),
+        }
+    )
+
+
 def load_batch_of_features_from_store(
     current_date: datetime,
 ) -> pd.DataFrame:
-    feature_store = get_feature_store()
-
-    # read time-series data from the feature store
-    fetch_data_to = current_date - timedelta(hours=1)
-    fetch_data_from = current_date - timedelta(days=29)
+    # read the last 28 days of time-series data before the prediction hour, in UTC
+    # whatever the timezone of `current_date` (naive values are taken as UTC)
+    prediction_hour = pd.Timestamp(current_date)
+    if prediction_hour.tzinfo is None:
+        prediction_hour = prediction_hour.tz_localize("UTC")
+    prediction_hour = prediction_hour.tz_convert("UTC").ceil("h")
+    fetch_data_to = prediction_hour
+    fetch_data_from = prediction_hour - timedelta(days=28)
     print(f"Fetching data from {fetch_data_from} to {fetch_data_to}")
     try:
-        feature_view = feature_store.get_feature_view(
-            name=config.FEATURE_VIEW_NAME, version=config.FEATURE_VIEW_VERSION
+        ts_data = get_cached_feature_store().read_feature_view_batch(
+            name=config.FEATURE_VIEW_NAME,
+            version=config.FEATURE_VIEW_VERSION,
+            start=fetch_data_from,
+            end=fetch_data_to,
         )
     except Exception as e:
         print(f"❌ Failed to fetch feature view: {e}")
         raise
 
-
-    ts_data = feature_view.get_batch_data(
-        start_time=(fetch_data_from - timedelta(days=1)),
-        end_time=(fetch_data_to + timedelta(days=1)),
-    )
-    ts_data = ts_data[ts_data.pickup_hour.between(fetch_data_from, fetch_data_to)]
-
-    # Sort data by location and time
-    ts_data.sort_values(by=["pickup_location_id", "pickup_hour"], inplace=True)
-
-    features = transform_ts_data_info_features(
-        ts_data, window_size=24 * 28, step_size=23
+    # One row per zone: the 672 hours right before the prediction hour
+    features = transform_ts_data_info_latest_features(
+        ts_data, window_size=24 * 28, prediction_hour=prediction_hour
     )
 
     return features
 
 
 def load_model_from_registry(version=None):
-    from pathlib import Path
-
-    import joblib
-
     from src.pipeline_utils import (  # Import custom classes/functions
         TemporalFeatureEngineer,
         average_rides_last_4_weeks,
     )
 
-    project = get_hopsworks_project()
-    model_registry = project.get_model_registry()
-
-    if version:
-        model = model_registry.get_model(name=config.MODEL_NAME, version=version)
-    else:
-        models = model_registry.get_models(name=config.MODEL_NAME)
-        model = max(models, key=lambda model: model.version)
-
-    return model.get_model()  # ✅ Avoid .download() in CI/C
+    # Served from the in-process or on-disk model cache once fetched
+    return get_model_cache().get(config.MODEL_NAME, version)
 
 
 def load_metrics_from_registry(version=None):
-
-    project = get_hopsworks_project()
-    model_registry = project.get_model_registry()
-
-    models = model_registry.get_models(name=config.MODEL_NAME)
-    model = max(models, key=lambda model: model.version)
-
-    return model.training_metrics
+    return get_feature_store_backend().load_model_metrics(config.MODEL_NAME, version)
 
 
-def fetch_next_hour_predictions():
+def fetch_next_hour_predictions(location_ids=None):
     # Get current UTC time and round up to next hour
     now = datetime.now(timezone.utc)
     next_hour = (now + timedelta(hours=1)).replace(minute=0, second=0, microsecond=0)
 
-    fs = get_feature_store()
-    fg = fs.get_feature_group(name=config.FEATURE_GROUP_MODEL_PREDICTION, version=1)
-    df = fg.read()
-    # Then filter for next hour in the DataFrame
-    df = df[df["pickup_hour"] == next_hour]
+    # Only the next hour is read from the store
+    df = get_feature_store_backend().read_feature_group(
+        config.FEATURE_GROUP_MODEL_PREDICTION,
+        1,
+        start=next_hour,
+        end=next_hour + timedelta(hours=1),
+        location_ids=location_ids,
+    )
 
     print(f"Current UTC time: {now}")
     print(f"Next hour: {next_hour}")
@@ -114,39 +204,141 @@ def fetch_next_hour_predictions():
     return df
 
 
-def fetch_predictions(hours):
+def fetch_predictions(hours, location_ids=None):
     current_hour = (pd.Timestamp.now(tz="Etc/UTC") - timedelta(hours=hours)).floor("h")
 
-    fs = get_feature_store()
-    fg = fs.get_feature_group(name=config.FEATURE_GROUP_MODEL_PREDICTION, version=1)
-
-    df = fg.filter((fg.pickup_hour >= current_hour)).read()
-
-    return df
+    return get_cached_feature_store().read_feature_group(
+        config.FEATURE_GROUP_MODEL_PREDICTION,
+        1,
+        start=current_hour,
+        location_ids=location_ids,
+    )
 
 
-def fetch_hourly_rides(hours):
+def fetch_hourly_rides(hours, location_ids=None):
     current_hour = (pd.Timestamp.now(tz="Etc/UTC") - timedelta(hours=hours)).floor("h")
 
-    fs = get_feature_store()
-    fg = fs.get_feature_group(name=config.FEATURE_GROUP_NAME, version=1)
-
-    query = fg.select_all()
-    query = query.filter(fg.pickup_hour >= current_hour)
-
-    return query.read()
+    return get_cached_feature_store().read_feature_group(
+        config.FEATURE_GROUP_NAME, 1, start=current_hour, location_ids=location_ids
+    )
 
 
-def fetch_days_data(days):
+def fetch_days_data(days, location_ids=None):
     current_date = pd.to_datetime(datetime.now(timezone.utc))
     fetch_data_from = current_date - timedelta(days=(365 + days))
     fetch_data_to = current_date - timedelta(days=365)
     print(fetch_data_from, fetch_data_to)
-    fs = get_feature_store()
-    fg = fs.get_feature_group(name=config.FEATURE_GROUP_NAME, version=1)
-
-    query = fg.select_all()
-    # query = query.filter((fg.pickup_hour >= fetch_data_from))
-    df = query.read()
-    cond = (df["pickup_hour"] >= fetch_data_from) & (df["pickup_hour"] <= fetch_data_to)
-    return df[cond]
+    # Read the window page by page instead of the whole feature group
+    pages = list(
+        get_feature_store_backend().iter_feature_group(
+            config.FEATURE_GROUP_NAME,
+            1,
+            start=fetch_data_from,
+            end=fetch_data_to,
+            location_ids=location_ids,
+        )
+    )
+    if not pages:
+        return pd.DataFrame(columns=["pickup_hour", "pickup_location_id", "rides"])
+    return pd.concat(pages, ignore_index=True)
+
+
+def fetch_multi_horizon_predictions(
+    hours: int = config.PREDICTION_HORIZON_HOURS, location_ids=None
+):
+    """
+    Returns the freshest forecast of each zone for the next `hours` hours.
+
+    Forecasts issued in consecutive hours overlap, so for every zone and hour only the
+    row with the smallest horizon is kept.
+    """
+    next_hour = pd.Timestamp.now(tz="Etc/UTC").ceil("h")
+    df = get_feature_store_backend().read_feature_group(
+        config.FEATURE_GROUP_MULTI_HORIZON_PREDICTION,
+        1,
+        start=next_hour,
+        end=next_hour + timedelta(hours=hours),
+        location_ids=location_ids,
+    )
+    if df.empty:
+        return df
+    return (
+        df.sort_values("horizon")
+        .drop_duplicates(subset=["pickup_location_id", "pickup_hour"], keep="first")
+        .sort_values(["pickup_location_id", "pickup_hour"])
+        .reset_index(drop=True)
+    )
+
+
+def latency_benchmark(
+    batch_sizes=(1, 262, 2620, 26200),
+    n_estimators: int = 200,
+    num_leaves: int = 256,
+    num_threads: int = config.PREDICTION_NUM_THREADS,
+    repeats: int = 20,
+) -> pd.DataFrame:
+    """
+    Times `get_model_predictions` through the sklearn pipeline and through the booster.
+
+    A pipeline is fitted on features of synthetic ts_data (262 zones), then batches of
+    random feature rows are scored both ways, after one warm-up call each. 262 rows is
+    the hourly batch of one row per zone.
+
+    Returns:
+        pd.DataFrame: batch, mean milliseconds of both paths, speedup, and the largest
+        absolute difference between their unrounded predictions.
+    """
+    from src.data_utils import transform_ts_data_info_features_and_target
+    from src.pipeline_utils import get_pipeline
+    from src.time_series import synthetic_ts_data
+
+    features, targets = transform_ts_data_info_features_and_target(
+        synthetic_ts_data(days=35), window_size=24 * 28, step_size=1
+    )
+    model = get_pipeline(
+        n_estimators=n_estimators, num_leaves=num_leaves, verbose=-1
+    ).fit(features, targets)
+    predictor = get_booster_predictor(model)
+    predictor.num_threads = num_threads
+
+    def mean_ms(function, batch):
+        function(batch)
+        started_at = time.perf_counter()
+        for _ in range(repeats):
+            function(batch)
+        return (time.perf_counter() - started_at) / repeats * 1000
+
+    rng = np.random.default_rng(0)
+    rows = []
+    for batch_size in batch_sizes:
+        batch = features.iloc[rng.integers(0, len(features), batch_size)].reset_index(drop=True)
+        sklearn_ms = mean_ms(lambda b: get_model_predictions(model, b, use_booster=False), batch)
+        booster_ms = mean_ms(lambda b: get_model_predictions(model, b, use_booster=True), batch)
+        rows.append(
+            {
+                "batch": batch_size,
+                "sklearn_ms": sklearn_ms,
+                "booster_ms": booster_ms,
+                "speedup": sklearn_ms / booster_ms,
+                "max_abs_diff": float(
+                    np.abs(predictor.predict(batch) - model.predict(batch)).max()
+                ),
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Latency of get_model_predictions by batch size, pipeline vs booster"
+    )
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 262, 2620, 26200])
+    parser.add_argument("--threads", type=int, default=config.PREDICTION_NUM_THREADS)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    print(
+        latency_benchmark(
+            batch_sizes=args.batch_sizes, num_threads=args.threads, repeats=args.repeats
+        ).to_string(index=False, float_format="%.3f")
+    )
@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+import joblib
+
+import src.config as config
+from src.feature_store import FeatureStoreBackend, get_feature_store_backend
+
+
+def _sha256(file_path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModelCache:
+    """
+    On-disk and in-process cache of registered models, keyed by name and version.
+
+    A model is fetched from the registry once per version and stored as
+    `<cache_dir>/<name>/v<version>/model.pkl` with its sha256 in `model.json`. Later
+    processes load it from disk after verifying the checksum (a corrupted or tampered
+    artifact is dropped and fetched again), and repeated calls within a process return
+    the already unpickled model.
+
+    The version to serve is, in order: the version passed by the caller, the pinned
+    `config.MODEL_VERSION_PIN`, or the latest registered version. The latest version is
+    a metadata-only registry lookup, remembered for `version_check_seconds`.
+
+    Args:
+        backend (Optional[FeatureStoreBackend]): Registry to fetch from. Defaults to
+            `get_feature_store_backend()`, resolved on first use.
+        cache_dir (Path): Directory holding the cached artifacts.
+        version_check_seconds (float): How long a looked-up latest version is reused.
+        clock (Callable[[], float]): Monotonic clock, in seconds.
+    """
+
+    def __init__(
+        self,
+        backend: Optional[FeatureStoreBackend] = None,
+        cache_dir: Path = config.MODEL_CACHE_DIR,
+        version_check_seconds: float = config.MODEL_VERSION_CHECK_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._backend = backend
+        self.cache_dir = Path(cache_dir)
+        self.version_check_seconds = version_check_seconds
+        self._clock = clock
+        self._lock = threading.RLock()
+        self._models: Dict[Tuple[str, int], object] = {}
+        self._latest: Dict[str, Tuple[int, float]] = {}
+
+    @property
+    def backend(self) -> FeatureStoreBackend:
+        if self._backend is None:
+            self._backend = get_feature_store_backend()
+        return self._backend
+
+    def _artifact_dir(self, name: str, version: int) -> Path:
+        return self.cache_dir / name / f"v{version}"
+
+    def resolve_version(self, name: str, version: Optional[int] = None) -> int:
+        """Returns the version `get` would serve for `name`."""
+        if version:
+            return version
+        if config.MODEL_VERSION_PIN:
+            return config.MODEL_VERSION_PIN
+
+        with self._lock:
+            cached = self._latest.get(name)
+            if cached is not None and self._clock() - cached[1] < self.version_check_seconds:
+                return cached[0]
+            latest = self.backend.latest_model_version(name)
+            if latest is None:
+                raise ValueError(f"No version of model {name} is registered.")
+            self._latest[name] = (latest, self._clock())
+            return latest
+
+    def _load_from_disk(self, name: str, version: int):
+        artifact_dir = self._artifact_dir(name, version)
+        manifest_path = artifact_dir / "model.json"
+        model_path = artifact_dir / "model.pkl"
+        if not (manifest_path.exists() and model_path.exists()):
+            return None
+
+        manifest = json.loads(manifest_path.read_text())
+        if _sha256(model_path) != manifest.get("sha256"):
+            print(f"⚠ Checksum mismatch for cached model {name} v{version}, re-fetching")
+            model_path.unlink()
+            manifest_path.unlink()
+            return None
+        return joblib.load(model_path)
+
+    def _store(self, name: str, version: int, model) -> None:
+        artifact_dir = self._artifact_dir(name, version)
+        artifact_dir.mkdir(parents=True, exist_ok=True)
+
+        tmp_path = artifact_dir / f"model.pkl.{os.getpid()}.tmp"
+        joblib.dump(model, tmp_path)
+        manifest = {"name": name, "version": version, "sha256": _sha256(tmp_path)}
+        os.replace(tmp_path, artifact_dir / "model.pkl")
+        # The manifest is written last, so a partial artifact is never trusted
+        (artifact_dir / "model.json").write_text(json.dumps(manifest))
+
+    def get(self, name: str, version: Optional[int] = None):
+        """
+        Returns the model `name` at `version` (see `resolve_version`).
+
+        Args:
+            name (str): Registered model name.
+            version (Optional[int]): Version to load; pinned or latest if None.
+
+        Returns:
+            The unpickled model, shared by every caller in this process.
+        """
+        version = self.resolve_version(name, version)
+        key = (name, version)
+        with self._lock:
+            if key in self._models:
+                return self._models[key]
+
+            model = self._load_from_disk(name, version)
+            if model is None:
+                model = self.backend.load_model(name, version)
+                self._store(name, version, model)
+            self._models[key] = model
+            return model
+
+    def clear(self) -> None:
+        """Drops the in-process models and latest-version lookups (the disk cache stays)."""
+        with self._lock:
+            self._models = {}
+            self._latest = {}
+
+
+_model_cache: Optional[ModelCache] = None
+
+
+def get_model_cache() -> ModelCache:
+    """Returns the process-wide model cache."""
+    global _model_cache
+    if _model_cache is None:
+        _model_cache = ModelCache()
+    return _model_cache
@@ -1,18 +1,33 @@
+import argparse
+import hashlib
+import tracemalloc
+import weakref
+from typing import List, Optional, Tuple
+
 import lightgbm as lgb
+import numpy as np
 import pandas as pd
-from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.base import BaseEstimator, TransformerMixin, clone
+from sklearn.multioutput import MultiOutputRegressor
 from sklearn.pipeline import make_pipeline
+from numpy.lib.stride_tricks import sliding_window_view
 from sklearn.preprocessing import FunctionTransformer
 
+import src.config as config
+from src.time_series import TimeSeriesTensor
+
+
+LAST_4_WEEKS_COLUMNS = [
+    f"rides_t-{7*24}",  # 1 week ago
+    f"rides_t-{14*24}",  # 2 weeks ago
+    f"rides_t-{21*24}",  # 3 weeks ago
+    f"rides_t-{28*24}",  # 4 weeks ago
+]
+
 
 # Function to calculate the average rides over the last 4 weeks
 def average_rides_last_4_weeks(X: pd.DataFrame) -> pd.DataFrame:
-    last_4_weeks_columns = [
-        f"rides_t-{7*24}",  # 1 week ago
-        f"rides_t-{14*24}",  # 2 weeks ago
-        f"rides_t-{21*24}",  # 3 weeks ago
-        f"rides_t-{28*24}",  # 4 weeks ago
-    ]
+    last_4_weeks_columns = LAST_4_WEEKS_COLUMNS
 
     # Ensure the required columns exist in the DataFrame
     for col in last_4_weeks_columns:
@@ -49,13 +64,163 @@ class TemporalFeatureEngineer(BaseEstimator, TransformerMixin):
 add_temporal_features = TemporalFeatureEngineer()
 
 
+# Columns the feature steps of get_pipeline() append to the ride windows, in order
+ENGINEERED_FEATURES = ["average_rides_last_4_weeks", "hour", "day_of_week"]
+
+
+def _fill_engineered_features(matrix, feature_names, pickup_hours) -> None:
+    """Writes the ENGINEERED_FEATURES columns of `matrix` from its ride columns."""
+    positions = {name: i for i, name in enumerate(feature_names)}
+    missing = [col for col in LAST_4_WEEKS_COLUMNS if col not in positions]
+    if missing:
+        raise ValueError(f"Missing required column: {missing[0]}")
+    matrix[:, positions["average_rides_last_4_weeks"]] = matrix[
+        :, [positions[col] for col in LAST_4_WEEKS_COLUMNS]
+    ].mean(axis=1)
+    pickup_hours = pd.DatetimeIndex(pickup_hours)
+    matrix[:, positions["hour"]] = pickup_hours.hour
+    matrix[:, positions["day_of_week"]] = pickup_hours.dayofweek
+
+
+def build_feature_matrix(features: pd.DataFrame) -> Tuple[np.ndarray, List[str]]:
+    """
+    Returns the float32 matrix the regressor of `get_pipeline()` sees for `features`.
+
+    Equal to the output of the pipeline's feature steps, but written column block by
+    column block into one C-contiguous float32 array: the ride columns are cast on
+    assignment, without the DataFrame copies of the sklearn steps or the float64 frame
+    LightGBM would convert the mixed dtypes to.
+
+    Returns:
+        Tuple[np.ndarray, List[str]]: The matrix and its column names.
+    """
+    ride_columns = [col for col in features.columns if col.startswith("rides_t-")]
+    feature_names = ride_columns + ENGINEERED_FEATURES
+    matrix = np.empty((len(features), len(feature_names)), dtype=np.float32)
+    matrix[:, : len(ride_columns)] = features[ride_columns].to_numpy()
+    _fill_engineered_features(matrix, feature_names, features["pickup_hour"])
+    return matrix, feature_names
+
+
+def build_training_matrix(
+    ts_data, window_size: int = 24 * 28, step_size: int = 1, feature_col: str = "rides"
+) -> Tuple[np.ndarray, np.ndarray, pd.DataFrame, List[str]]:
+    """
+    Builds the training matrix of `get_pipeline()` straight from ts_data.
+
+    Same rows, in the same order, as `build_feature_matrix` applied to
+    `transform_ts_data_info_features_and_target(ts_data, ...)` for complete (gap-filled)
+    ts_data, but the windows are copied from a strided view of the (hours x zones) tensor
+    into the float32 matrix directly, so no DataFrame with one column per window hour is
+    ever built.
+
+    Parameters:
+    ----------
+    ts_data : pd.DataFrame | TimeSeriesTensor
+        Hourly ride counts; missing (hour, zone) slots count as 0 rides.
+    window_size, step_size : int
+        As in `transform_ts_data_info_features_and_target`.
+    feature_col : str
+        Column of `ts_data` holding the ride counts.
+
+    Returns:
+    -------
+    tuple
+        (float32 matrix, float32 targets, DataFrame with the pickup_location_id and
+        pickup_hour of every row, matrix column names)
+    """
+    if isinstance(ts_data, TimeSeriesTensor):
+        ts_tensor = ts_data
+    else:
+        ts_tensor = TimeSeriesTensor.from_long(ts_data, rides_col=feature_col)
+    if ts_tensor.n_hours < window_size + 1:
+        raise ValueError(
+            "No data could be transformed. Check if input DataFrame is empty or window size is too large."
+        )
+
+    # (n_windows, n_zones, window_size + 1) view over the int16 tensor
+    windows = sliding_window_view(ts_tensor.values, window_size + 1, axis=0)[::step_size]
+    n_windows, n_zones = windows.shape[0], windows.shape[1]
+
+    ride_columns = [f"{feature_col}_t-{window_size - i}" for i in range(window_size)]
+    feature_names = ride_columns + ENGINEERED_FEATURES
+    matrix = np.empty((n_zones * n_windows, len(feature_names)), dtype=np.float32)
+    targets = np.empty(n_zones * n_windows, dtype=np.float32)
+    # Rows are ordered by zone, then by target hour
+    for zone in range(n_zones):
+        rows = slice(zone * n_windows, (zone + 1) * n_windows)
+        matrix[rows, :window_size] = windows[:, zone, :window_size]
+        targets[rows] = windows[:, zone, window_size]
+
+    target_hours = ts_tensor.hours[window_size : ts_tensor.n_hours : step_size]
+    index = pd.DataFrame(
+        {
+            "pickup_location_id": np.repeat(ts_tensor.zone_ids, n_windows),
+            "pickup_hour": target_hours[np.tile(np.arange(n_windows), n_zones)],
+        }
+    )
+    _fill_engineered_features(matrix, feature_names, index["pickup_hour"])
+    return matrix, targets, index, feature_names
+
+
+def feature_frame(matrix, index, feature_names, rows=slice(None)) -> pd.DataFrame:
+    """
+    Rebuilds rows of the feature table from a `build_training_matrix` result.
+
+    The rows have the columns and dtypes of `transform_ts_data_info_features_and_target`,
+    so any `get_pipeline()` pipeline predicts on them, but only the selected rows are
+    materialised next to the matrix.
+
+    Parameters:
+    ----------
+    matrix, index, feature_names :
+        As returned by `build_training_matrix`.
+    rows : mask, positions or slice
+        Rows to rebuild; all of them by default.
+
+    Returns:
+    -------
+    pd.DataFrame
+        The selected rows, indexed by their position in the matrix.
+    """
+    ride_columns = [name for name in feature_names if name not in ENGINEERED_FEATURES]
+    positions = np.arange(len(index))[rows]
+    frame = pd.DataFrame(
+        matrix[positions, : len(ride_columns)].astype(np.int16),
+        columns=ride_columns,
+        index=positions,
+    )
+    frame["pickup_hour"] = index["pickup_hour"].to_numpy()[positions]
+    frame["pickup_location_id"] = index["pickup_location_id"].to_numpy()[positions]
+    return frame
+
+
+def fit_pipeline_on_matrix(pipeline, features, matrix, targets, feature_names):
+    """
+    Fits a `get_pipeline()` pipeline with its regressor trained on a prebuilt matrix.
+
+    The feature steps are stateless, so they are fitted on one row of `features` while
+    the LGBMRegressor is fitted on the float32 `matrix` (from `build_feature_matrix` or
+    `build_training_matrix`); the fitted pipeline predicts like `pipeline.fit(features,
+    targets)` would, without the feature steps' copies of the training frame.
+    """
+    pipeline[:-1].fit(features.head(1).copy())
+    pipeline[-1].fit(pd.DataFrame(matrix, columns=feature_names, copy=False), targets)
+    return pipeline
+
+
 # Function to return the pipeline
-def get_pipeline(**hyper_params):
+def get_pipeline(horizon=1, **hyper_params):
     """
     Returns a pipeline with optional parameters for LGBMRegressor.
 
     Parameters:
     ----------
+    horizon : int
+        Number of hours to predict. With more than one, the pipeline fits one direct
+        LGBMRegressor per horizon (targets from
+        `transform_ts_data_info_features_and_target(..., horizon=horizon)`) and predicts
+        an array of shape (rows, horizon).
     **hyper_params : dict
         Optional parameters to pass to the LGBMRegressor.
 
@@ -64,9 +229,221 @@ def get_pipeline(**hyper_params):
     pipeline : sklearn.pipeline.Pipeline
         A pipeline with feature engineering and LGBMRegressor.
     """
+    regressor = lgb.LGBMRegressor(**hyper_params)  # Pass optional parameters here
+    if horizon > 1:
+        regressor = MultiOutputRegressor(regressor)
     pipeline = make_pipeline(
         add_feature_average_rides_last_4_weeks,
         add_temporal_features,
-        lgb.LGBMRegressor(**hyper_params),  # Pass optional parameters here
+        regressor,
     )
     return pipeline
+
+
+def get_pipeline_horizon(pipeline) -> int:
+    """
+    Returns the number of hours a fitted `get_pipeline()` pipeline predicts per row: one
+    per fitted regressor of a direct multi-horizon pipeline, 1 for a next-hour pipeline.
+    """
+    regressor = pipeline[-1]
+    if isinstance(regressor, MultiOutputRegressor):
+        return len(regressor.estimators_)
+    return 1
+
+
+def warm_start_pipeline(
+    pipeline, features, targets, n_estimators=config.WARM_START_N_ESTIMATORS
+):
+    """
+    Continues boosting a fitted `get_pipeline()` pipeline on new rows.
+
+    The returned pipeline is a new one: its LGBMRegressor starts from the fitted
+    booster (`init_model`) and adds `n_estimators` trees fitted on `features`, so only
+    these rows are processed instead of the full training window.
+
+    Parameters:
+    ----------
+    pipeline : sklearn.pipeline.Pipeline
+        Fitted single-horizon pipeline from `get_pipeline()`.
+    features, targets :
+        Rows to continue on (see `src.retraining.decayed_sample`).
+    n_estimators : int
+        Number of trees to add.
+
+    Returns:
+    -------
+    pipeline : sklearn.pipeline.Pipeline
+        The warm-started pipeline; the input pipeline is left unchanged.
+    """
+    regressor = pipeline[-1]
+    if not isinstance(regressor, lgb.LGBMRegressor):
+        raise ValueError("Warm starts need a pipeline ending in an LGBMRegressor.")
+
+    warm_pipeline = clone(pipeline)
+    warm_pipeline[-1].set_params(n_estimators=n_estimators)
+    # The feature steps are stateless; fitting them through the slice fits warm_pipeline
+    X = warm_pipeline[:-1].fit_transform(features)
+    warm_pipeline[-1].fit(X, targets, init_model=regressor.booster_)
+    return warm_pipeline
+
+
+class BoosterPredictor:
+    """
+    Scores feature frames with the booster of a fitted `get_pipeline()` pipeline.
+
+    Skips the sklearn steps: the derived features (average_rides_last_4_weeks, hour,
+    day_of_week) are computed with numpy straight into one C-contiguous float32 matrix
+    laid out in the booster's feature order, which `Booster.predict` reads without
+    DataFrame validation or copies. Ride counts, their quarter-step averages and calendar
+    fields are exact in float32, so predictions equal `pipeline.predict`.
+
+    Args:
+        pipeline: Fitted pipeline from `get_pipeline()`.
+        num_threads (int): LightGBM prediction threads; 0 uses LightGBM's default.
+
+    Raises:
+        ValueError: If the pipeline does not end in a fitted LGBMRegressor or uses
+            features this class cannot derive.
+    """
+
+    DERIVED_FEATURES = tuple(ENGINEERED_FEATURES)
+
+    def __init__(self, pipeline, num_threads: int = config.PREDICTION_NUM_THREADS):
+        regressor = pipeline[-1]
+        if not isinstance(regressor, lgb.LGBMRegressor):
+            raise ValueError("The pipeline does not end in an LGBMRegressor.")
+        self.booster = regressor.booster_
+        self.num_threads = num_threads
+        self.feature_names = self.booster.feature_name()
+
+        unknown = [
+            name
+            for name in self.feature_names
+            if name not in self.DERIVED_FEATURES and not name.startswith("rides_t-")
+        ]
+        if unknown:
+            raise ValueError(f"Cannot derive booster features: {unknown}")
+        self.ride_columns = [
+            name for name in self.feature_names if name not in self.DERIVED_FEATURES
+        ]
+        self.ride_positions = [
+            self.feature_names.index(name) for name in self.ride_columns
+        ]
+        # get_pipeline() models keep the ride columns in one run, which numpy copies
+        # far faster as a slice than through a list of positions
+        first = self.ride_positions[0] if self.ride_positions else 0
+        if self.ride_positions == list(range(first, first + len(self.ride_positions))):
+            self.ride_positions = slice(first, first + len(self.ride_positions))
+
+    def build_matrix(self, features: pd.DataFrame) -> np.ndarray:
+        """Returns the (rows x booster features) float32 matrix for `features`."""
+        matrix = np.empty((len(features), len(self.feature_names)), dtype=np.float32)
+        matrix[:, self.ride_positions] = features[self.ride_columns].to_numpy(np.float32)
+
+        positions = {name: i for i, name in enumerate(self.feature_names)}
+        if "average_rides_last_4_weeks" in positions:
+            matrix[:, positions["average_rides_last_4_weeks"]] = (
+                features[LAST_4_WEEKS_COLUMNS].to_numpy(np.float32).mean(axis=1)
+            )
+        if "hour" in positions or "day_of_week" in positions:
+            pickup_hour = pd.DatetimeIndex(features["pickup_hour"])
+            if "hour" in positions:
+                matrix[:, positions["hour"]] = pickup_hour.hour
+            if "day_of_week" in positions:
+                matrix[:, positions["day_of_week"]] = pickup_hour.dayofweek
+        return matrix
+
+    def predict(self, features: pd.DataFrame) -> np.ndarray:
+        return self.booster.predict(
+            self.build_matrix(features), num_threads=self.num_threads
+        )
+
+
+_booster_predictors = weakref.WeakKeyDictionary()
+
+
+def get_booster_predictor(pipeline) -> Optional[BoosterPredictor]:
+    """
+    Returns the (memoised) BoosterPredictor of `pipeline`, or None when the pipeline
+    cannot be scored through its booster.
+    """
+    try:
+        return _booster_predictors[pipeline]
+    except KeyError:
+        pass
+    try:
+        predictor = BoosterPredictor(pipeline)
+    except (ValueError, TypeError, AttributeError):
+        predictor = None
+    _booster_predictors[pipeline] = predictor
+    return predictor
+
+
+def training_memory_benchmark(
+    n_zones: int = 262,
+    days: int = 180,
+    window_size: int = 24 * 28,
+    step_size: int = 23,
+    new_days: int = 7,
+) -> pd.DataFrame:
+    """
+    Peak memory of the training data of `model_training_pipeline`, with and without the
+    feature table.
+
+    "feature table" builds `transform_ts_data_info_features_and_target` next to the
+    float32 matrix and hashes the matrix through `tobytes()`, as the pipeline used to.
+    "matrix only" keeps the matrix and its keys, hashes buffer views and rebuilds the
+    feature rows of the last `new_days` days, as a registered model needs them. Peaks
+    are traced with tracemalloc (numpy and pandas buffers included) on synthetic ts_data.
+
+    Returns:
+        pd.DataFrame: variant, rows and peak_mib.
+    """
+    from src.data_utils import transform_ts_data_info_features_and_target
+    from src.time_series import synthetic_ts_data
+
+    ts_tensor = TimeSeriesTensor.from_long(synthetic_ts_data(n_zones, days))
+
+    def with_feature_table():
+        features, _ = transform_ts_data_info_features_and_target(
+            ts_tensor, window_size=window_size, step_size=step_size
+        )
+        matrix, targets, _, _ = build_training_matrix(ts_tensor, window_size, step_size)
+        hashlib.sha256(matrix.tobytes()).update(targets.tobytes())
+        return features, matrix
+
+    def matrix_only():
+        matrix, targets, keys, feature_names = build_training_matrix(
+            ts_tensor, window_size, step_size
+        )
+        hashlib.sha256(memoryview(matrix).cast("B")).update(memoryview(targets).cast("B"))
+        since = keys["pickup_hour"].max() - pd.Timedelta(days=new_days)
+        new_features = feature_frame(
+            matrix, keys, feature_names, (keys["pickup_hour"] > since).to_numpy()
+        )
+        return new_features, matrix
+
+    rows = []
+    for variant, build in [("feature table", with_feature_table), ("matrix only", matrix_only)]:
+        tracemalloc.start()
+        _, matrix = build()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        rows.append({"variant": variant, "rows": len(matrix), "peak_mib": peak / 2**20})
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Peak memory of the training data with and without the feature table"
+    )
+    parser.add_argument("--zones", type=int, default=262)
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--step-size", type=int, default=23)
+    args = parser.parse_args()
+
+    print(
+        training_memory_benchmark(
+            n_zones=args.zones, days=args.days, step_size=args.step_size
+        ).to_string(index=False, float_format="%.1f")
+    )
@@ -93,7 +93,9 @@ def plot_aggregated_time_series(
 
     return fig
 
-def plot_prediction(features: pd.DataFrame, prediction: int):
+def plot_prediction(
+    features: pd.DataFrame, prediction: int, forecast: Optional[pd.DataFrame] = None
+):
     # Identify time series columns (e.g., historical ride counts)
     time_series_columns = [
         col for col in features.columns if col.startswith("rides_t-")
@@ -142,4 +144,15 @@ def plot_prediction(features: pd.DataFrame, prediction: int):
         name="Prediction",
     )
 
+    # Add the multi-horizon forecast of the zone (from `fetch_multi_horizon_predictions`)
+    if forecast is not None and not forecast.empty:
+        fig.add_scatter(
+            x=forecast["pickup_hour"],
+            y=forecast["predicted_demand"],
+            line_color="orange",
+            line_dash="dash",
+            mode="lines+markers",
+            name="Forecast",
+        )
+
     return fig
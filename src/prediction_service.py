@@ -0,0 +1,415 @@
+import argparse
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+import requests
+
+import src.config as config
+from src.inference import (
+    get_model_predictions,
+    load_batch_of_features_from_store,
+    load_model_from_registry,
+)
+
+logger = logging.getLogger(__name__)
+
+WINDOW_SIZE = 24 * 28
+FEATURE_COLUMNS = [f"rides_t-{WINDOW_SIZE - i}" for i in range(WINDOW_SIZE)]
+
+
+class LatencyMetrics:
+    """Request latencies (a sliding window of the most recent ones) and throughput."""
+
+    def __init__(self, window: int = 10_000):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self._started_at = time.monotonic()
+        self.requests = 0
+        self.rows = 0
+        self.batches = 0
+        self.batched_rows = 0
+
+    def record_request(self, latency_seconds: float, rows: int) -> None:
+        with self._lock:
+            self._latencies.append(latency_seconds)
+            self.requests += 1
+            self.rows += rows
+
+    def record_batch(self, rows: int) -> None:
+        with self._lock:
+            self.batches += 1
+            self.batched_rows += rows
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            latencies = np.array(self._latencies) * 1000
+            elapsed = time.monotonic() - self._started_at
+            return {
+                "requests": self.requests,
+                "rows": self.rows,
+                "batches": self.batches,
+                "mean_batch_rows": self.batched_rows / self.batches if self.batches else 0.0,
+                "p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+                "p99_ms": float(np.percentile(latencies, 99)) if len(latencies) else 0.0,
+                "requests_per_second": self.requests / elapsed if elapsed else 0.0,
+            }
+
+
+class MicroBatcher:
+    """
+    Merges feature rows submitted by concurrent callers into single predict calls.
+
+    A worker thread waits for the first pending request, then keeps collecting requests
+    for up to `max_wait_ms` or until `max_batch_rows` rows are queued, and scores them all
+    with one call to `predict_fn`. Each caller gets back the predictions of its own rows.
+
+    Args:
+        predict_fn (Callable): Scores a features DataFrame, returning one value per row.
+        max_batch_rows (int): Row count at which a batch is scored without waiting.
+        max_wait_ms (float): How long the first request of a batch waits for others.
+        metrics (Optional[LatencyMetrics]): Receives the size of every batch.
+    """
+
+    def __init__(
+        self,
+        predict_fn: Callable[[pd.DataFrame], np.ndarray],
+        max_batch_rows: int = config.PREDICTION_BATCH_MAX_ROWS,
+        max_wait_ms: float = config.PREDICTION_BATCH_MAX_WAIT_MS,
+        metrics: Optional[LatencyMetrics] = None,
+    ):
+        self.predict_fn = predict_fn
+        self.max_batch_rows = max_batch_rows
+        self.max_wait_seconds = max_wait_ms / 1000
+        self.metrics = metrics
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def submit(self, features: pd.DataFrame) -> Future:
+        """Queues `features` for scoring; the future resolves to their predictions."""
+        future = Future()
+        self._queue.put((features, future))
+        return future
+
+    def predict(self, features: pd.DataFrame) -> np.ndarray:
+        return self.submit(features).result()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            rows = len(batch[0][0])
+            deadline = time.monotonic() + self.max_wait_seconds
+            while rows < self.max_batch_rows:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+                rows += len(batch[-1][0])
+            self._score(batch)
+
+    def _score(self, batch) -> None:
+        try:
+            features = pd.concat([features for features, _ in batch], ignore_index=True)
+            predictions = np.asarray(self.predict_fn(features))
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        if self.metrics is not None:
+            self.metrics.record_batch(len(features))
+        offset = 0
+        for request_features, future in batch:
+            future.set_result(predictions[offset : offset + len(request_features)])
+            offset += len(request_features)
+
+
+class PredictionService:
+    """
+    Keeps the model and the latest 672-hour window of every zone in memory.
+
+    The windows are rebuilt from the feature store once per hour, the first time a
+    request arrives for a new prediction hour; the model is refreshed at the same time
+    (cheap when the registered version did not change, see `ModelCache`). Predictions go
+    through a `MicroBatcher`, so concurrent requests share `predict` calls.
+
+    Args:
+        load_features (Callable): Returns the latest feature rows for a prediction hour.
+        load_model (Callable): Returns the model to serve.
+        batcher_options: Passed on to `MicroBatcher`.
+    """
+
+    def __init__(
+        self,
+        load_features: Callable[[pd.Timestamp], pd.DataFrame] = load_batch_of_features_from_store,
+        load_model: Callable[[], object] = load_model_from_registry,
+        **batcher_options,
+    ):
+        self._load_features = load_features
+        self._load_model = load_model
+        self._lock = threading.Lock()
+        self.prediction_hour = None
+        self.features = None
+        self.model = None
+        self.metrics = LatencyMetrics()
+        self.batcher = MicroBatcher(self._predict, metrics=self.metrics, **batcher_options)
+
+    def _predict(self, features: pd.DataFrame) -> np.ndarray:
+        return get_model_predictions(self.model, features)["predicted_demand"].to_numpy()
+
+    def refresh(self, now: Optional[pd.Timestamp] = None) -> None:
+        """Reloads the windows and the model when the prediction hour has moved on."""
+        now = pd.Timestamp.now(tz="Etc/UTC") if now is None else now
+        prediction_hour = now.ceil("h")
+        if prediction_hour == self.prediction_hour:
+            return
+        with self._lock:
+            if prediction_hour == self.prediction_hour:
+                return
+            logger.info(f"Loading windows and model for {prediction_hour}")
+            features = self._load_features(prediction_hour)
+            self.model = self._load_model()
+            self.features = features.set_index("pickup_location_id", drop=False)
+            self.prediction_hour = prediction_hour
+
+    def zone_features(self, zone_ids: Optional[List[int]] = None) -> pd.DataFrame:
+        """Returns the latest windows of `zone_ids` (all zones if None)."""
+        self.refresh()
+        if zone_ids is None:
+            return self.features.reset_index(drop=True)
+        unknown = sorted(set(zone_ids) - set(self.features.index))
+        if unknown:
+            raise KeyError(f"Unknown zones: {unknown}")
+        return self.features.loc[zone_ids].reset_index(drop=True)
+
+    def what_if_features(self, rows: List[Dict]) -> pd.DataFrame:
+        """
+        Builds feature rows from request payloads.
+
+        Each row needs 'pickup_location_id', 'pickup_hour' and 'rides': the 672 hourly
+        counts before 'pickup_hour', oldest first.
+        """
+        rides = np.array([row["rides"] for row in rows], dtype=np.float32)
+        if rides.ndim != 2 or rides.shape[1] != WINDOW_SIZE:
+            raise ValueError(f"'rides' must hold {WINDOW_SIZE} hourly counts per row.")
+        features = pd.DataFrame(rides, columns=FEATURE_COLUMNS)
+        features["pickup_location_id"] = [row["pickup_location_id"] for row in rows]
+        features["pickup_hour"] = pd.to_datetime([row["pickup_hour"] for row in rows])
+        return features
+
+    def predict(self, features: pd.DataFrame) -> pd.DataFrame:
+        started_at = time.monotonic()
+        self.refresh()
+        predictions = self.batcher.predict(features)
+        self.metrics.record_request(time.monotonic() - started_at, len(features))
+        return pd.DataFrame(
+            {
+                "pickup_location_id": features["pickup_location_id"].to_numpy(),
+                "pickup_hour": pd.DatetimeIndex(features["pickup_hour"]).astype(str),
+                "predicted_demand": predictions,
+            }
+        )
+
+
+class PredictionRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP API of a PredictionService:
+
+    - GET  /predict[?zone=<id>&zone=<id>...]  latest-window predictions (all zones by default)
+    - POST /predict {"zones": [...]}          same, for a list of zones
+    - POST /predict {"rows": [...]}           what-if predictions for custom windows
+    - GET  /metrics                           p50/p99 latency, throughput and batch sizes
+    - GET  /health
+    """
+
+    service: PredictionService = None
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+    def _send_json(self, status: int, payload) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status: int, e: Exception) -> None:
+        if status >= 500:
+            # Store, refresh or model failures: answer rather than drop the connection
+            logger.exception("Failed to handle %s %s", self.command, self.path)
+            message = f"Internal error ({type(e).__name__}): {e}"
+        else:
+            message = str(e.args[0]) if e.args else repr(e)
+        self._send_json(status, {"error": message})
+
+    def _send_predictions(self, features: pd.DataFrame) -> None:
+        predictions = self.service.predict(features)
+        self._send_json(200, {"predictions": predictions.to_dict(orient="records")})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        try:
+            if url.path == "/predict":
+                zones = parse_qs(url.query).get("zone")
+                zone_ids = None if zones is None else [int(zone) for zone in zones]
+                self._send_predictions(self.service.zone_features(zone_ids))
+            elif url.path == "/metrics":
+                self._send_json(200, self.service.metrics.snapshot())
+            elif url.path == "/health":
+                self._send_json(200, {"status": "ok"})
+            else:
+                self._send_json(404, {"error": f"Unknown path {url.path}"})
+        except (KeyError, ValueError) as e:
+            self._send_error(400, e)
+        except Exception as e:
+            self._send_error(500, e)
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/predict":
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            if not isinstance(payload, dict):
+                raise ValueError("The request body must be a JSON object.")
+            if "rows" in payload:
+                features = self.service.what_if_features(payload["rows"])
+            else:
+                features = self.service.zone_features(payload.get("zones"))
+            self._send_predictions(features)
+        except (KeyError, ValueError, TypeError) as e:
+            self._send_error(400, e)
+        except Exception as e:
+            self._send_error(500, e)
+
+
+class PredictionServer(ThreadingHTTPServer):
+    # The default backlog of 5 makes bursts of concurrent clients wait on SYN retries
+    request_queue_size = 128
+    daemon_threads = True
+
+
+def serve(
+    service: PredictionService,
+    host: str = "127.0.0.1",
+    port: int = config.PREDICTION_SERVICE_PORT,
+) -> PredictionServer:
+    """Returns a threaded HTTP server for `service`; call `serve_forever()` to run it."""
+    handler = type(
+        "BoundPredictionRequestHandler", (PredictionRequestHandler,), {"service": service}
+    )
+    return PredictionServer((host, port), handler)
+
+
+def load_test(
+    url: str,
+    n_requests: int = 1000,
+    concurrency: int = 16,
+    zones_per_request: int = 1,
+    zone_ids: Optional[List[int]] = None,
+) -> Dict[str, float]:
+    """
+    Sends `n_requests` GET /predict requests from `concurrency` threads.
+
+    Every request asks for `zones_per_request` random zones (out of `zone_ids`, by
+    default the zones the service returns). Returns client-side latency percentiles and
+    throughput, plus the service's own /metrics.
+    """
+    if zone_ids is None:
+        predictions = requests.get(f"{url}/predict", timeout=60).json()["predictions"]
+        zone_ids = [row["pickup_location_id"] for row in predictions]
+    rng = np.random.default_rng(0)
+    queries = [
+        rng.choice(zone_ids, size=zones_per_request, replace=False)
+        for _ in range(n_requests)
+    ]
+    local = threading.local()
+
+    def send(zones) -> float:
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        started_at = time.perf_counter()
+        response = local.session.get(
+            f"{url}/predict", params={"zone": [int(zone) for zone in zones]}, timeout=60
+        )
+        response.raise_for_status()
+        return time.perf_counter() - started_at
+
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = np.array(list(executor.map(send, queries))) * 1000
+    elapsed = time.perf_counter() - started_at
+
+    return {
+        "requests": n_requests,
+        "concurrency": concurrency,
+        "zones_per_request": zones_per_request,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "requests_per_second": n_requests / elapsed,
+        "server": requests.get(f"{url}/metrics", timeout=60).json(),
+    }
+
+
+if __name__ == "__main__":
+    # Configure logging
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        handlers=[
+            logging.StreamHandler(sys.stdout),
+        ],
+    )
+
+    parser = argparse.ArgumentParser(description="Taxi demand prediction service")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="Run the prediction service.")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=config.PREDICTION_SERVICE_PORT)
+
+    load_test_parser = subparsers.add_parser(
+        "load-test", help="Send concurrent requests to a running service."
+    )
+    load_test_parser.add_argument(
+        "--url", default=f"http://127.0.0.1:{config.PREDICTION_SERVICE_PORT}"
+    )
+    load_test_parser.add_argument("--requests", type=int, default=1000)
+    load_test_parser.add_argument("--concurrency", type=int, default=16)
+    load_test_parser.add_argument("--zones-per-request", type=int, default=1)
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        service = PredictionService()
+        service.refresh()
+        server = serve(service, args.host, args.port)
+        logger.info(f"Serving predictions on http://{args.host}:{args.port}")
+        server.serve_forever()
+    else:
+        print(
+            json.dumps(
+                load_test(
+                    args.url,
+                    n_requests=args.requests,
+                    concurrency=args.concurrency,
+                    zones_per_request=args.zones_per_request,
+                ),
+                indent=2,
+            )
+        )
@@ -0,0 +1,135 @@
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import mean_absolute_error
+
+import src.config as config
+
+
+def trained_until(features: pd.DataFrame) -> float:
+    """Returns the end of the hours covered by `features`, as epoch seconds (for metrics)."""
+    return (pd.to_datetime(features["pickup_hour"]).max() + pd.Timedelta(hours=1)).timestamp()
+
+
+def rows_since(features: pd.DataFrame, seconds: float) -> np.ndarray:
+    """Returns a mask of the rows whose pickup_hour is at or after `seconds` (epoch)."""
+    pickup_hours = pd.to_datetime(features["pickup_hour"])
+    since = pd.Timestamp(seconds, unit="s", tz="UTC")
+    if pickup_hours.dt.tz is None:
+        since = since.tz_localize(None)
+    return (pickup_hours >= since).to_numpy()
+
+
+def holdout_split(
+    features: pd.DataFrame, new_rows: np.ndarray, holdout_days: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Holds the last `holdout_days` days of `new_rows` out of a warm start.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Masks of the new rows to continue boosting on and
+        of the held-out rows that check the warm-started model.
+    """
+    if not new_rows.any():
+        return new_rows.copy(), np.zeros_like(new_rows)
+    pickup_hours = pd.to_datetime(features["pickup_hour"])
+    end = pickup_hours[new_rows].max() + pd.Timedelta(hours=1)
+    cutoff = end - pd.Timedelta(days=holdout_days)
+    holdout_rows = new_rows & (pickup_hours >= cutoff).to_numpy()
+    return new_rows & ~holdout_rows, holdout_rows
+
+
+def decayed_sample(
+    features: pd.DataFrame,
+    targets: pd.Series,
+    new_rows: np.ndarray,
+    half_life_days: Optional[float] = None,
+    seed: int = 42,
+) -> Tuple[pd.DataFrame, pd.Series]:
+    """
+    Selects the rows a warm start continues boosting on.
+
+    All `new_rows` are kept. With `half_life_days`, older rows are kept too, each with
+    probability 0.5 ** (age / half_life_days), the age being counted back from the first
+    new hour, so recent history still anchors the added trees.
+
+    Returns:
+        Tuple[pd.DataFrame, pd.Series]: The selected features and targets.
+    """
+    keep = new_rows.copy()
+    if half_life_days and new_rows.any():
+        pickup_hours = pd.to_datetime(features["pickup_hour"])
+        first_new_hour = pickup_hours[new_rows].min()
+        age_days = (first_new_hour - pickup_hours).dt.total_seconds().to_numpy() / 86400
+        rng = np.random.default_rng(seed)
+        keep |= rng.random(len(features)) < 0.5 ** (np.clip(age_days, 0, None) / half_life_days)
+    return features[keep], targets[keep]
+
+
+def choose_training_mode(
+    metric: Optional[Dict],
+    recent_mae: Optional[float],
+    max_drift: float = config.WARM_START_MAX_DRIFT,
+    max_warm_starts: int = config.WARM_START_MAX_CHAIN,
+) -> Tuple[str, str]:
+    """
+    Decides between continuing the registered model ("warm") and a full retrain ("full").
+
+    A warm start is only taken when the registered model's MAE on the hours it has not
+    seen yet is within `max_drift` (relative) of its backtest MAE, and fewer than
+    `max_warm_starts` warm starts were chained since the last full retrain.
+
+    Args:
+        metric (Optional[Dict]): Metrics of the registered model.
+        recent_mae (Optional[float]): Its MAE on the new hours (see `score_new_rows`).
+        max_drift (float): Largest tolerated relative increase of the MAE.
+        max_warm_starts (int): Consecutive warm starts before a full retrain.
+
+    Returns:
+        Tuple[str, str]: The mode and a human-readable reason.
+    """
+    if metric is None:
+        return "full", "no model is registered"
+    if "trained_until" not in metric:
+        return "full", "the registered model does not record its training window"
+    if recent_mae is None:
+        return "full", "there are no new hours since the registered model was trained"
+    if metric.get("warm_starts", 0) >= max_warm_starts:
+        return "full", f"{max_warm_starts} warm starts were chained since the last full retrain"
+
+    drift = recent_mae / metric["test_mae"] - 1
+    if drift > max_drift:
+        return "full", f"the MAE drifted by {drift:+.1%} (limit {max_drift:.0%})"
+    return "warm", f"the MAE drifted by {drift:+.1%} (limit {max_drift:.0%})"
+
+
+def score_new_rows(
+    pipeline, features: pd.DataFrame, targets: pd.Series, new_rows: Optional[np.ndarray] = None
+):
+    """Returns the MAE of `pipeline` on `new_rows` (all rows if None), or None if there are none."""
+    if new_rows is None:
+        new_rows = np.ones(len(features), dtype=bool)
+    if not new_rows.any():
+        return None
+    return float(mean_absolute_error(targets[new_rows], pipeline.predict(features[new_rows])))
+
+
+def warm_start_helped(
+    warm_pipeline,
+    registered,
+    features: pd.DataFrame,
+    targets: pd.Series,
+    holdout_rows: Optional[np.ndarray] = None,
+) -> Tuple[bool, float, float]:
+    """
+    Checks a warm-started model against the model it continued, on held-out new rows.
+
+    Returns:
+        Tuple[bool, float, float]: Whether the warm start is at least as good, and the
+        MAE of both models on `holdout_rows` (see `holdout_split`; all rows of `features`
+        if None).
+    """
+    warm_mae = score_new_rows(warm_pipeline, features, targets, holdout_rows)
+    registered_mae = score_new_rows(registered, features, targets, holdout_rows)
+    return warm_mae <= registered_mae, warm_mae, registered_mae
@@ -0,0 +1,154 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+def split_zones(location_ids: np.ndarray, n_shards: int) -> List[np.ndarray]:
+    """
+    Splits rows into at most `n_shards` shards of whole zones.
+
+    Zones are taken in order of first appearance and cut into contiguous runs of about
+    the same number of zones, so concatenating per-shard results that keep their zone
+    order gives the zone order of an unsharded run. Rows without a location are dropped.
+
+    Args:
+        location_ids (np.ndarray): pickup_location_id of every row.
+        n_shards (int): Maximum number of shards.
+
+    Returns:
+        List[np.ndarray]: Ascending row positions of each non-empty shard.
+    """
+    codes, zone_ids = pd.factorize(location_ids, sort=False)
+    zone_shards = np.array_split(np.arange(len(zone_ids)), max(min(n_shards, len(zone_ids)), 1))
+    shard_of_zone = np.empty(len(zone_ids), dtype=np.int64)
+    for shard, zones in enumerate(zone_shards):
+        shard_of_zone[zones] = shard
+
+    valid = codes >= 0
+    shard_of_row = np.full(len(codes), -1)
+    shard_of_row[valid] = shard_of_zone[codes[valid]]
+    # One stable sort instead of one scan of the rows per shard
+    order = np.argsort(shard_of_row, kind="stable")
+    bounds = np.searchsorted(shard_of_row[order], np.arange(len(zone_shards) + 1))
+    return [
+        order[start:end] for start, end in zip(bounds[:-1], bounds[1:]) if end > start
+    ]
+
+
+def map_shards(
+    function: Callable,
+    shards: Sequence,
+    n_jobs: int,
+    initializer: Optional[Callable] = None,
+    initargs: tuple = (),
+) -> List:
+    """
+    Applies `function` to every shard in a pool of up to `n_jobs` processes.
+
+    Results come back in shard order. `initializer(*initargs)` runs once per worker,
+    which is where large shared inputs such as a model should be passed.
+    """
+    with ProcessPoolExecutor(
+        max_workers=max(min(n_jobs, len(shards)), 1),
+        initializer=initializer,
+        initargs=initargs,
+    ) as executor:
+        return list(executor.map(function, shards))
+
+
+def scaling_benchmark(
+    max_jobs: Optional[int] = None,
+    n_zones: int = 262,
+    days: int = 180,
+    window_size: int = 24 * 28,
+    step_size: int = 1,
+    n_estimators: int = 100,
+    repeats: int = 3,
+) -> pd.DataFrame:
+    """
+    Times zone-sharded feature building and scoring for n_jobs = 1, 2, 4, ... max_jobs.
+
+    Runs on synthetic ts_data of `n_zones` zones over `days` days and a model fitted on
+    a sample of it. Every sharded result is checked against the n_jobs=1 result.
+
+    Returns:
+        pd.DataFrame: n_jobs, seconds and speedup of `transform_ts_data_info_features`
+        and `get_model_predictions` (best of `repeats`), and whether results matched.
+    """
+    from src.data_utils import transform_ts_data_info_features_and_target
+    from src.inference import get_model_predictions
+    from src.pipeline_utils import get_pipeline
+    from src.time_series import synthetic_ts_data
+
+    max_jobs = max_jobs or os.cpu_count()
+    rng = np.random.default_rng(0)
+    ts_data = synthetic_ts_data(n_zones, days)
+    features, targets = transform_ts_data_info_features_and_target(
+        ts_data, window_size=window_size, step_size=step_size
+    )
+    sample = rng.choice(len(features), size=min(len(features), 20000), replace=False)
+    model = get_pipeline(n_estimators=n_estimators, verbose=-1).fit(
+        features.iloc[sample], targets.iloc[sample]
+    )
+
+    def best_of(function):
+        timings = []
+        for _ in range(repeats):
+            started_at = time.perf_counter()
+            result = function()
+            timings.append(time.perf_counter() - started_at)
+        return min(timings), result
+
+    n_jobs_values = sorted({1, max_jobs} | {2**i for i in range(max_jobs.bit_length()) if 2**i <= max_jobs})
+    rows = []
+    for n_jobs in n_jobs_values:
+        features_seconds, sharded_features = best_of(
+            lambda: transform_ts_data_info_features_and_target(
+                ts_data, window_size=window_size, step_size=step_size, n_jobs=n_jobs
+            )[0]
+        )
+        predict_seconds, predictions = best_of(
+            lambda: get_model_predictions(model, features, n_jobs=n_jobs)
+        )
+        if n_jobs == 1:
+            reference_features, reference_predictions = sharded_features, predictions
+        rows.append(
+            {
+                "n_jobs": n_jobs,
+                "features_seconds": features_seconds,
+                "predict_seconds": predict_seconds,
+                "identical": sharded_features.equals(reference_features)
+                and predictions.equals(reference_predictions),
+            }
+        )
+
+    report = pd.DataFrame(rows)
+    report["features_speedup"] = report["features_seconds"].iloc[0] / report["features_seconds"]
+    report["predict_speedup"] = report["predict_seconds"].iloc[0] / report["predict_seconds"]
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Scaling benchmark of zone-sharded feature building and scoring"
+    )
+    parser.add_argument("--max-jobs", type=int, default=os.cpu_count())
+    parser.add_argument("--zones", type=int, default=262)
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--step-size", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs available")
+    print(
+        scaling_benchmark(
+            max_jobs=args.max_jobs,
+            n_zones=args.zones,
+            days=args.days,
+            step_size=args.step_size,
+        ).to_string(index=False, float_format="%.3f")
+    )
@@ -0,0 +1,270 @@
+from typing import Iterable, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+# Yellow taxi zone IDs as published in the NYC TLC taxi zone lookup
+ALL_ZONE_IDS = np.arange(1, 266, dtype=np.int16)
+
+ONE_HOUR = pd.Timedelta(hours=1)
+
+
+class TimeSeriesTensor:
+    """
+    Dense hourly ride counts for a set of taxi zones.
+
+    Counts are stored in a single int16 array of shape (hours x zones). Row `i` holds the
+    hour `start + i hours` and column `j` holds the zone `zone_ids[j]`, so slicing by hour
+    range or zone is an index computation rather than a filter over a long DataFrame.
+
+    Attributes:
+        values (np.ndarray): int16 ride counts of shape (n_hours, n_zones).
+        start (pd.Timestamp): Timestamp of the first row.
+        zone_ids (np.ndarray): Sorted int16 zone IDs, one per column.
+    """
+
+    def __init__(
+        self,
+        values: np.ndarray,
+        start: Union[pd.Timestamp, str],
+        zone_ids: Iterable[int],
+    ):
+        zone_ids = np.asarray(zone_ids, dtype=np.int16)
+        if values.ndim != 2 or values.shape[1] != len(zone_ids):
+            raise ValueError(
+                f"values must have shape (hours, {len(zone_ids)}), got {values.shape}."
+            )
+        if np.any(np.diff(zone_ids) <= 0):
+            raise ValueError("zone_ids must be sorted and unique.")
+
+        self.values = values
+        self.start = pd.Timestamp(start)
+        self.zone_ids = zone_ids
+        self._zone_positions = {zone_id: i for i, zone_id in enumerate(zone_ids.tolist())}
+
+    def __repr__(self) -> str:
+        return (
+            f"TimeSeriesTensor(start={self.start}, hours={self.n_hours}, "
+            f"zones={self.n_zones})"
+        )
+
+    @property
+    def n_hours(self) -> int:
+        return self.values.shape[0]
+
+    @property
+    def n_zones(self) -> int:
+        return self.values.shape[1]
+
+    @property
+    def end(self) -> pd.Timestamp:
+        """Exclusive end of the covered range (one hour after the last row)."""
+        return self.start + self.n_hours * ONE_HOUR
+
+    @property
+    def hours(self) -> pd.DatetimeIndex:
+        return pd.date_range(start=self.start, periods=self.n_hours, freq="h")
+
+    def hour_index(self, hour: Union[pd.Timestamp, str]) -> int:
+        """Returns the row position of `hour`, which need not lie inside the tensor."""
+        offset = pd.Timestamp(hour) - self.start
+        if offset % ONE_HOUR != pd.Timedelta(0):
+            raise ValueError(f"{hour} is not aligned to the hourly grid of {self.start}.")
+        return offset // ONE_HOUR
+
+    def zone_index(self, zone_id: int) -> int:
+        try:
+            return self._zone_positions[int(zone_id)]
+        except KeyError:
+            raise KeyError(f"Zone {zone_id} is not part of this tensor.") from None
+
+    def slice_hours(
+        self,
+        start: Optional[Union[pd.Timestamp, str]] = None,
+        end: Optional[Union[pd.Timestamp, str]] = None,
+    ) -> "TimeSeriesTensor":
+        """
+        Returns the rows in [start, end) as a view that shares memory with this tensor.
+
+        Bounds outside the covered range are clipped.
+        """
+        first = 0 if start is None else min(max(self.hour_index(start), 0), self.n_hours)
+        last = (
+            self.n_hours
+            if end is None
+            else min(max(self.hour_index(end), first), self.n_hours)
+        )
+        return TimeSeriesTensor(
+            self.values[first:last], self.start + first * ONE_HOUR, self.zone_ids
+        )
+
+    def window(self, end: Union[pd.Timestamp, str], window_size: int) -> np.ndarray:
+        """
+        Returns the `window_size` hours before `end` for every zone.
+
+        Hours outside the covered range are zero-filled.
+
+        Returns:
+            np.ndarray: Array of shape (n_zones, window_size), oldest hour first.
+        """
+        last = self.hour_index(end)
+        first = last - window_size
+        window = np.zeros((window_size, self.n_zones), dtype=self.values.dtype)
+        covered_first, covered_last = max(first, 0), min(last, self.n_hours)
+        if covered_first < covered_last:
+            window[covered_first - first : covered_last - first] = self.values[
+                covered_first:covered_last
+            ]
+        return window.T
+
+    def zone(self, zone_id: int) -> np.ndarray:
+        """Returns the hourly counts of one zone as a (strided) view."""
+        return self.values[:, self.zone_index(zone_id)]
+
+    def select_zones(self, zone_ids: Iterable[int]) -> "TimeSeriesTensor":
+        """Returns a tensor restricted to `zone_ids`; zones are kept in sorted order."""
+        zone_ids = np.unique(np.asarray(list(zone_ids), dtype=np.int16))
+        columns = [self.zone_index(zone_id) for zone_id in zone_ids]
+        return TimeSeriesTensor(self.values[:, columns], self.start, zone_ids)
+
+    @classmethod
+    def from_long(
+        cls,
+        df: pd.DataFrame,
+        hour_col: str = "pickup_hour",
+        location_col: str = "pickup_location_id",
+        rides_col: str = "rides",
+        zone_ids: Optional[Iterable[int]] = None,
+        start: Optional[Union[pd.Timestamp, str]] = None,
+        end: Optional[Union[pd.Timestamp, str]] = None,
+    ) -> "TimeSeriesTensor":
+        """
+        Builds a tensor from long-format ts_data (one row per hour and location).
+
+        Missing (hour, location) slots are filled with 0 rides. The input does not need
+        to be sorted.
+
+        Args:
+            df (pd.DataFrame): DataFrame with hour, location and rides columns.
+            hour_col (str): Name of the column containing hourly timestamps.
+            location_col (str): Name of the column containing location IDs.
+            rides_col (str): Name of the column containing ride counts.
+            zone_ids (Optional[Iterable[int]]): Zones to keep as columns, in sorted order.
+                Defaults to the locations present in `df`; rows for other locations are
+                dropped.
+            start (Optional[pd.Timestamp]): First hour. Defaults to the earliest hour in `df`.
+            end (Optional[pd.Timestamp]): Exclusive last hour. Defaults to one hour after
+                the latest hour in `df`.
+
+        Returns:
+            TimeSeriesTensor: Dense tensor covering [start, end).
+        """
+        hours = pd.to_datetime(df[hour_col])
+        if zone_ids is None:
+            zone_ids = np.unique(df[location_col].to_numpy())
+        zone_ids = np.unique(np.asarray(list(zone_ids), dtype=np.int16))
+
+        if start is None:
+            start = hours.min()
+        if end is None:
+            end = hours.max() + ONE_HOUR
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        if pd.isna(start) or pd.isna(end):
+            raise ValueError("Cannot infer the hour range of empty data; pass start and end.")
+        n_hours = max((end - start) // ONE_HOUR, 0)
+
+        hour_idx, hour_remainder = np.divmod(
+            (hours - start).to_numpy(), np.timedelta64(1, "h")
+        )
+        zone_idx = pd.Index(zone_ids).get_indexer(df[location_col])
+        keep = (
+            (hour_remainder == np.timedelta64(0, "h"))
+            & (hour_idx >= 0)
+            & (hour_idx < n_hours)
+            & (zone_idx >= 0)
+        )
+
+        values = np.zeros((n_hours, len(zone_ids)), dtype=np.int16)
+        values[hour_idx[keep], zone_idx[keep]] = df[rides_col].to_numpy()[keep]
+        return cls(values, start, zone_ids)
+
+    @classmethod
+    def from_rides(
+        cls,
+        rides: pd.DataFrame,
+        zone_ids: Optional[Iterable[int]] = None,
+        start: Optional[Union[pd.Timestamp, str]] = None,
+        end: Optional[Union[pd.Timestamp, str]] = None,
+    ) -> "TimeSeriesTensor":
+        """
+        Aggregates individual rides into hourly counts per zone.
+
+        Args:
+            rides (pd.DataFrame): Rides with 'pickup_datetime' and 'pickup_location_id'.
+            zone_ids (Optional[Iterable[int]]): Zones to keep as columns, in sorted order.
+                Defaults to the locations present in `rides`.
+            start (Optional[pd.Timestamp]): First hour. Defaults to the earliest pickup hour.
+            end (Optional[pd.Timestamp]): Exclusive last hour. Defaults to one hour after the
+                latest pickup hour.
+
+        Returns:
+            TimeSeriesTensor: Dense tensor of ride counts, without modifying `rides`.
+        """
+        pickup_hours = rides["pickup_datetime"].dt.floor("h")
+        if zone_ids is None:
+            zone_ids = np.unique(rides["pickup_location_id"].to_numpy())
+        zone_ids = np.unique(np.asarray(list(zone_ids), dtype=np.int16))
+
+        if start is None:
+            start = pickup_hours.min()
+        if end is None:
+            end = pickup_hours.max() + ONE_HOUR
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        if pd.isna(start) or pd.isna(end):
+            raise ValueError("Cannot infer the hour range of empty data; pass start and end.")
+        n_hours = max((end - start) // ONE_HOUR, 0)
+
+        hour_idx = (pickup_hours - start).to_numpy() // np.timedelta64(1, "h")
+        zone_idx = pd.Index(zone_ids).get_indexer(rides["pickup_location_id"])
+        keep = (hour_idx >= 0) & (hour_idx < n_hours) & (zone_idx >= 0)
+
+        counts = np.bincount(
+            hour_idx[keep] * len(zone_ids) + zone_idx[keep],
+            minlength=n_hours * len(zone_ids),
+        )
+        values = counts.reshape(n_hours, len(zone_ids)).astype(np.int16)
+        return cls(values, start, zone_ids)
+
+    def to_long(self) -> pd.DataFrame:
+        """
+        Converts the tensor to long-format ts_data.
+
+        Returns:
+            pd.DataFrame: Columns pickup_hour, pickup_location_id (int16) and rides (int16),
+            sorted by location and hour like `transform_raw_data_into_ts_data`.
+        """
+        return pd.DataFrame(
+            {
+                "pickup_hour": self.hours[np.tile(np.arange(self.n_hours), self.n_zones)],
+                "pickup_location_id": np.repeat(self.zone_ids, self.n_hours),
+                "rides": self.values.T.ravel(),
+            }
+        )
+
+
+def synthetic_ts_data(
+    n_zones: int = 262,
+    days: int = 180,
+    seed: int = 0,
+    start: Union[pd.Timestamp, str] = "2025-01-01",
+) -> pd.DataFrame:
+    """
+    Poisson hourly rides of the first `n_zones` zones over `days` days, for benchmarks.
+
+    Every zone gets its own mean of 1 to 60 rides per hour. Rows are in the ts_data
+    layout of `TimeSeriesTensor.to_long`.
+    """
+    rng = np.random.default_rng(seed)
+    mean_rides = rng.integers(1, 60, n_zones)
+    values = rng.poisson(mean_rides, (24 * days, n_zones)).astype(np.int16)
+    return TimeSeriesTensor(values, start, ALL_ZONE_IDS[:n_zones]).to_long()
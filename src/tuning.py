@@ -0,0 +1,473 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from itertools import repeat
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import lightgbm as lgb
+import numpy as np
+import pandas as pd
+from sklearn.metrics import mean_absolute_error
+
+import src.config as config
+from src.data_utils import split_time_series_data
+from src.pipeline_utils import build_feature_matrix
+
+logger = logging.getLogger(__name__)
+
+# Neighbourhood of the parameters found in notebooks/20_hyperparameter_tuning.ipynb
+SEARCH_SPACE = {
+    "learning_rate": [0.02, 0.05, 0.1],
+    "num_leaves": [31, 64, 128, 256],
+    "max_depth": [-1, 10, 30],
+    "feature_fraction": [0.6, 0.8, 1.0],
+    "bagging_fraction": [0.7, 0.9, 1.0],
+    "bagging_freq": [1],
+    "min_child_samples": [20, 50, 100],
+    "reg_alpha": [0.0, 0.1, 1.0],
+    "reg_lambda": [0.0, 0.1, 1.0],
+}
+
+
+def sample_candidates(
+    space: Dict[str, List], n_candidates: int, seed: int = 42
+) -> List[Dict]:
+    """Draws `n_candidates` distinct parameter sets uniformly from `space`."""
+    rng = np.random.default_rng(seed)
+    n_combinations = int(np.prod([len(values) for values in space.values()]))
+    candidates, seen = [], set()
+    while len(candidates) < min(n_candidates, n_combinations):
+        params = {name: values[rng.integers(len(values))] for name, values in space.items()}
+        key = tuple(sorted(params.items()))
+        if key not in seen:
+            seen.add(key)
+            candidates.append(params)
+    return candidates
+
+
+def time_series_folds(
+    pickup_hours: pd.Series, n_folds: int = 3, test_days: int = 7
+) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Builds expanding-window folds over the rows of a feature table.
+
+    The last `n_folds * test_days` days are cut into consecutive test periods; each fold
+    trains on every row before its test period (see `split_time_series_data`).
+
+    Returns:
+        List[Tuple[np.ndarray, np.ndarray]]: (train_rows, test_rows) positions per fold.
+    """
+    rows = pd.DataFrame(
+        {"pickup_hour": pd.to_datetime(pickup_hours).to_numpy(), "row": np.arange(len(pickup_hours))}
+    )
+    test_period = timedelta(days=test_days)
+    end = rows["pickup_hour"].max() + timedelta(hours=1)
+
+    folds = []
+    for fold in range(n_folds, 0, -1):
+        cutoff = end - fold * test_period
+        _, train_rows, rest, rest_rows = split_time_series_data(rows, cutoff, "row")
+        test_rows = rest_rows[rest["pickup_hour"] < cutoff + test_period]
+        if len(train_rows) == 0 or len(test_rows) == 0:
+            raise ValueError(f"Fold with cutoff {cutoff} has no training or test rows.")
+        folds.append((train_rows.to_numpy(), test_rows.to_numpy()))
+    return folds
+
+
+def validation_split(
+    pickup_hours: pd.Series, train_rows: np.ndarray, validation_days: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Splits the last `validation_days` days off a fold's training rows.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (fit_rows, validation_rows) positions.
+    """
+    hours = pd.to_datetime(pickup_hours).to_numpy()[train_rows]
+    cutoff = hours.max() + np.timedelta64(1, "h") - np.timedelta64(validation_days, "D")
+    fit_rows, validation_rows = train_rows[hours < cutoff], train_rows[hours >= cutoff]
+    if len(fit_rows) == 0:
+        raise ValueError(f"No training rows are left before the validation cutoff {cutoff}.")
+    return fit_rows, validation_rows
+
+
+# Dataset-level parameters of the cached LightGBM Dataset; pre-filtering is off so every
+# trial can use its own min_child_samples on the same bins
+DATASET_PARAMS = {"feature_pre_filter": False, "verbose": -1}
+
+
+def booster_params(params: Dict) -> Tuple[Dict, int]:
+    """Maps LGBMRegressor keyword arguments onto `lgb.train` parameters and rounds."""
+    params = {name: value for name, value in params.items() if value is not None}
+    n_estimators = params.pop("n_estimators", 100)
+    # sklearn-only arguments, and the binning sample size fixed by the cached Dataset
+    for name in ("importance_type", "class_weight", "subsample_for_bin"):
+        params.pop(name, None)
+    renames = {"boosting_type": "boosting", "random_state": "seed", "n_jobs": "num_threads"}
+    params = {renames.get(name, name): value for name, value in params.items()}
+    params.setdefault("objective", "regression")
+    params.setdefault("verbose", -1)
+    return params, n_estimators
+
+
+def _save_atomically(path: Path, save: Callable[[Path], None]) -> None:
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    save(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _save_npy(path: Path, array: np.ndarray) -> None:
+    # Through a file object, as np.save would append .npy to the temporary name
+    with open(path, "wb") as f:
+        np.save(f, array)
+
+
+def cache_training_matrix(
+    matrix: np.ndarray,
+    targets: np.ndarray,
+    feature_names: List[str],
+    cache_dir: Path = config.TRAINING_MATRIX_DIR,
+) -> Dict:
+    """
+    Saves a float32 training matrix for repeated fits.
+
+    The matrix and targets are saved as `.npy` files that workers open as read-only
+    memmaps, so they are shared through the page cache instead of being pickled to every
+    process. The matrix is also binned once into a LightGBM Dataset saved in LightGBM's
+    binary format; fits load the bins and train on row subsets of it instead of binning
+    every column again. File names hash the content, so re-running on the same data
+    reuses the files.
+
+    Returns:
+        Dict: 'matrix_path', 'targets_path', 'dataset_path' and 'feature_names'.
+    """
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    targets = np.ascontiguousarray(targets, dtype=np.float32)
+    # Hashed through buffer views; tobytes() would copy the whole matrix once more
+    digest = hashlib.sha256(memoryview(matrix).cast("B"))
+    digest.update(memoryview(targets).cast("B"))
+    key = digest.hexdigest()[:16]
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    paths = {
+        "matrix_path": cache_dir / f"matrix_{key}.npy",
+        "targets_path": cache_dir / f"targets_{key}.npy",
+        "dataset_path": cache_dir / f"dataset_{key}.bin",
+    }
+    if not paths["matrix_path"].exists():
+        _save_atomically(paths["matrix_path"], lambda path: _save_npy(path, matrix))
+    if not paths["targets_path"].exists():
+        _save_atomically(paths["targets_path"], lambda path: _save_npy(path, targets))
+    if not paths["dataset_path"].exists():
+        dataset = lgb.Dataset(
+            matrix, label=targets, feature_name=feature_names, params=DATASET_PARAMS
+        )
+        _save_atomically(paths["dataset_path"], lambda path: dataset.save_binary(str(path)))
+    return {**paths, "feature_names": feature_names}
+
+
+def prune_training_matrices(
+    training_matrix: Dict, cache_dir: Path = config.TRAINING_MATRIX_DIR
+) -> List[Path]:
+    """
+    Deletes the cached matrix, targets and Dataset files of other data than `training_matrix`.
+
+    Every run on new data adds files under a new content hash; call this once a run no
+    longer needs the files of earlier ones.
+
+    Returns:
+        List[Path]: The deleted files.
+    """
+    keep = {
+        Path(training_matrix[name]).name
+        for name in ("matrix_path", "targets_path", "dataset_path")
+    }
+    stale = [
+        path
+        for pattern in ("matrix_*.npy", "targets_*.npy", "dataset_*.bin")
+        for path in Path(cache_dir).glob(pattern)
+        if path.name not in keep
+    ]
+    for path in stale:
+        path.unlink(missing_ok=True)
+    return stale
+
+
+def cache_feature_matrix(
+    features: pd.DataFrame, targets: pd.Series, cache_dir: Path = config.TRAINING_MATRIX_DIR
+) -> Dict:
+    """Caches the matrix of a feature table (see `build_feature_matrix`, `cache_training_matrix`)."""
+    matrix, feature_names = build_feature_matrix(features)
+    return cache_training_matrix(matrix, np.asarray(targets), feature_names, cache_dir)
+
+
+# Per-process memmaps and Datasets, opened once by every worker
+_shared = {}
+
+
+def open_feature_matrix(training_matrix: Dict) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns the read-only memmaps of a cached matrix and its targets."""
+    matrix_path = training_matrix["matrix_path"]
+    if matrix_path not in _shared:
+        _shared[matrix_path] = (
+            np.load(matrix_path, mmap_mode="r"),
+            np.load(training_matrix["targets_path"], mmap_mode="r"),
+        )
+    return _shared[matrix_path]
+
+
+def open_training_dataset(training_matrix: Dict) -> lgb.Dataset:
+    """Returns the LightGBM Dataset of a cached matrix, loaded from its binary file."""
+    dataset_path = training_matrix["dataset_path"]
+    if dataset_path not in _shared:
+        _shared[dataset_path] = lgb.Dataset(str(dataset_path), params=DATASET_PARAMS).construct()
+    return _shared[dataset_path]
+
+
+def fit_booster(
+    training_matrix: Dict,
+    params: Dict,
+    train_rows: np.ndarray,
+    valid_rows: Optional[np.ndarray] = None,
+    early_stopping_rounds: Optional[int] = None,
+) -> lgb.Booster:
+    """
+    Trains a booster with LGBMRegressor parameters on rows of the cached Dataset.
+
+    The rows reuse the bins of the whole cached matrix rather than bins found on the
+    training rows alone, so results can differ marginally from `LGBMRegressor.fit`.
+    With `early_stopping_rounds`, training stops once the MAE on `valid_rows` has not
+    improved for that many trees.
+    """
+    dataset = open_training_dataset(training_matrix)
+    train_params, n_estimators = booster_params(params)
+    valid_sets, callbacks = [], []
+    if early_stopping_rounds:
+        train_params["metric"] = "l1"
+        valid_sets = [dataset.subset(valid_rows)]
+        callbacks = [lgb.early_stopping(early_stopping_rounds, verbose=False)]
+    return lgb.train(
+        train_params,
+        dataset.subset(train_rows),
+        num_boost_round=n_estimators,
+        valid_sets=valid_sets,
+        callbacks=callbacks,
+    )
+
+
+def _evaluate_trial(
+    task: Tuple[int, Dict, int, int],
+    training_matrix: Dict,
+    folds: List[Tuple[np.ndarray, Optional[np.ndarray], np.ndarray]],
+    early_stopping_rounds: Optional[int],
+) -> Tuple[int, int, float, int]:
+    """Fits one candidate on one fold; returns (candidate, fold, MAE, trees used)."""
+    candidate, params, fold, n_estimators = task
+    matrix, target_values = open_feature_matrix(training_matrix)
+    train_rows, validation_rows, test_rows = folds[fold]
+
+    booster = fit_booster(
+        training_matrix,
+        {**params, "n_estimators": n_estimators},
+        train_rows,
+        validation_rows,
+        early_stopping_rounds,
+    )
+    # Predicts with the best iteration when early stopping kicked in
+    predictions = booster.predict(matrix[test_rows])
+    trees = booster.best_iteration or n_estimators
+    return candidate, fold, mean_absolute_error(target_values[test_rows], predictions), trees
+
+
+def tune_hyperparameters(
+    features: pd.DataFrame,
+    targets: pd.Series,
+    space: Dict[str, List] = SEARCH_SPACE,
+    n_candidates: int = 27,
+    n_folds: int = 3,
+    test_days: int = 7,
+    validation_days: int = 7,
+    min_estimators: int = 50,
+    max_estimators: int = 450,
+    reduction_factor: int = 3,
+    early_stopping_rounds: Optional[int] = None,
+    n_jobs: int = 1,
+    time_budget_seconds: Optional[float] = None,
+    seed: int = 42,
+    cache_dir: Path = config.TRAINING_MATRIX_DIR,
+    training_matrix: Optional[Dict] = None,
+) -> Dict:
+    """
+    Searches LightGBM hyperparameters with successive halving over time-series folds.
+
+    All candidates are first scored with `min_estimators` trees; only the best
+    1/`reduction_factor` move on to the next rung with `reduction_factor` times more
+    trees, up to `max_estimators`. A candidate's score is its MAE averaged over the
+    folds of `time_series_folds`. Every (candidate, fold) fit of a rung is an independent
+    task; with n_jobs > 1 they run in a process pool reading the shared memmapped matrix.
+
+    Args:
+        features (pd.DataFrame): Feature table from `transform_ts_data_info_features_and_target`;
+            with `training_matrix`, its pickup_location_id and pickup_hour columns suffice
+            (the index frame of `build_training_matrix`).
+        targets (pd.Series): Targets of `features`.
+        space (Dict[str, List]): Values to sample for each LGBMRegressor parameter.
+        n_candidates (int): Number of parameter sets in the first rung.
+        n_folds (int): Number of time-series folds.
+        test_days (int): Length of each fold's test period.
+        validation_days (int): With early stopping, length of the validation period cut
+            from the end of each fold's training period.
+        min_estimators (int): Trees per fit in the first rung.
+        max_estimators (int): Trees per fit in the last rung.
+        reduction_factor (int): Candidates kept per rung, and growth of the tree budget.
+        early_stopping_rounds (Optional[int]): Stop a fit once the MAE on the fold's
+            validation period has not improved for this many trees. The validation rows
+            are not trained on, and the test rows stay unseen until scoring.
+        n_jobs (int): Number of worker processes.
+        time_budget_seconds (Optional[float]): Do not start another rung after this.
+        seed (int): Seed of the candidate sampling.
+        cache_dir (Path): Directory of the memmapped matrix.
+        training_matrix (Optional[Dict]): Matrix of `features` already cached with
+            `cache_training_matrix`; built from `features` if None.
+
+    Returns:
+        Dict: 'best_params' (including n_estimators), 'best_mae' and 'trials', one entry
+        per (candidate, rung) with its parameters, trees and mean MAE.
+    """
+    started_at = time.monotonic()
+    folds = [
+        (train_rows, None, test_rows)
+        for train_rows, test_rows in time_series_folds(
+            features["pickup_hour"], n_folds=n_folds, test_days=test_days
+        )
+    ]
+    if early_stopping_rounds:
+        # Trees are chosen on a slice before the test period, so the ranking is not
+        # selected on the rows it is scored on
+        folds = [
+            (*validation_split(features["pickup_hour"], train_rows, validation_days), test_rows)
+            for train_rows, _, test_rows in folds
+        ]
+    if training_matrix is None:
+        training_matrix = cache_feature_matrix(features, targets, cache_dir)
+    candidates = dict(enumerate(sample_candidates(space, n_candidates, seed)))
+    logger.info(
+        f"Tuning {len(candidates)} candidates on {len(folds)} folds with {n_jobs} workers"
+    )
+
+    executor = ProcessPoolExecutor(max_workers=n_jobs) if n_jobs > 1 else None
+    trials = []
+    n_estimators = min_estimators
+    try:
+        while True:
+            tasks = [
+                (candidate, params, fold, n_estimators)
+                for candidate, params in candidates.items()
+                for fold in range(len(folds))
+            ]
+            evaluate_args = (
+                tasks,
+                repeat(training_matrix),
+                repeat(folds),
+                repeat(early_stopping_rounds),
+            )
+            results = (
+                executor.map(_evaluate_trial, *evaluate_args, chunksize=1)
+                if executor is not None
+                else map(_evaluate_trial, *evaluate_args)
+            )
+
+            fold_maes, fold_trees = {}, {}
+            for candidate, _, mae, trees in results:
+                fold_maes.setdefault(candidate, []).append(mae)
+                fold_trees.setdefault(candidate, []).append(trees)
+            rung = []
+            for candidate, maes in fold_maes.items():
+                trial = {
+                    "candidate": candidate,
+                    "params": candidates[candidate],
+                    "n_estimators": int(np.max(fold_trees[candidate])),
+                    "mae": float(np.mean(maes)),
+                }
+                trials.append(trial)
+                rung.append(trial)
+            rung.sort(key=lambda trial: trial["mae"])
+            logger.info(
+                f"Rung with {n_estimators} trees: best MAE {rung[0]['mae']:.4f} "
+                f"({time.monotonic() - started_at:.0f}s elapsed)"
+            )
+
+            n_kept = max(len(rung) // reduction_factor, 1)
+            out_of_time = (
+                time_budget_seconds is not None
+                and time.monotonic() - started_at > time_budget_seconds
+            )
+            if n_estimators >= max_estimators or len(rung) == 1 or out_of_time:
+                best = rung[0]
+                break
+            candidates = {trial["candidate"]: trial["params"] for trial in rung[:n_kept]}
+            n_estimators = min(n_estimators * reduction_factor, max_estimators)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return {
+        "best_params": {**best["params"], "n_estimators": best["n_estimators"]},
+        "best_mae": best["mae"],
+        "trials": trials,
+    }
+
+
+def log_tuning_to_mlflow(
+    result: Dict,
+    pipeline,
+    input_example: pd.DataFrame,
+    experiment_name: str = "NYC_Taxi_LightGBM_Hyperparameter_Tuning",
+    results_path: Optional[Path] = None,
+):
+    """
+    Logs the pipeline fitted with the best parameters through `log_model_to_mlflow`.
+
+    Every trial of the search is logged as a run nested under that run, with its
+    parameters, trees and cross-validated MAE. The trials are also written as JSON to
+    `results_path` (defaults to TRANSFORMED_DATA_DIR/tuning/trials.json) and attached to
+    the parent run.
+    """
+    import mlflow
+
+    from src.experiment_utils import log_model_to_mlflow
+
+    results_path = results_path or config.TRANSFORMED_DATA_DIR / "tuning" / "trials.json"
+    results_path.parent.mkdir(parents=True, exist_ok=True)
+    results_path.write_text(json.dumps(result, indent=2))
+
+    model_info = log_model_to_mlflow(
+        pipeline,
+        input_example.copy(),
+        experiment_name,
+        metric_name="cv_mae",
+        model_name="taxi_demand_lgbm_tuned",
+        params=result["best_params"],
+        score=result["best_mae"],
+    )
+    with mlflow.start_run(run_id=model_info.run_id):
+        mlflow.log_artifact(str(results_path))
+        for trial in result["trials"]:
+            with mlflow.start_run(
+                run_name=f"candidate_{trial['candidate']}_{trial['n_estimators']}_trees",
+                nested=True,
+            ):
+                mlflow.log_params(
+                    {
+                        **trial["params"],
+                        "candidate": trial["candidate"],
+                        "n_estimators": trial["n_estimators"],
+                    }
+                )
+                mlflow.log_metric("cv_mae", trial["mae"])
+    return model_info
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+
+@pytest.fixture
+def ts_data() -> pd.DataFrame:
+    """Hourly rides of a few zones over five weeks, like the ts_data feature group."""
+    rng = np.random.default_rng(0)
+    hours = pd.date_range("2025-01-01", periods=24 * 35, freq="h")
+    zones = np.array([4, 43, 132, 161], dtype=np.int16)
+    return pd.DataFrame(
+        {
+            "pickup_hour": np.repeat(hours, len(zones)),
+            "pickup_location_id": np.tile(zones, len(hours)),
+            "rides": rng.poisson(20, len(hours) * len(zones)).astype(np.int16),
+        }
+    )
+
+
+@pytest.fixture
+def seasonal_ts_data() -> pd.DataFrame:
+    """Hourly rides with a daily cycle per zone over seven weeks, so models can tell apart."""
+    rng = np.random.default_rng(0)
+    hours = pd.date_range("2025-01-01", periods=24 * 49, freq="h")
+    zones = np.array([4, 43, 132, 161], dtype=np.int16)
+    daily_cycle = 1 + np.sin(2 * np.pi * hours.hour.to_numpy() / 24)
+    mean_rides = np.outer(daily_cycle, [5, 20, 40, 80]).ravel()
+    return pd.DataFrame(
+        {
+            "pickup_hour": np.repeat(hours, len(zones)),
+            "pickup_location_id": np.tile(zones, len(hours)),
+            "rides": rng.poisson(mean_rides).astype(np.int16),
+        }
+    )
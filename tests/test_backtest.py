@@ -0,0 +1,98 @@
+import pandas as pd
+import pytest
+
+from src.backtest import backtest, compare_on_unseen_rows, registration_decision
+from src.data_utils import transform_ts_data_info_features_and_target
+from src.pipeline_utils import build_training_matrix, feature_frame, get_pipeline
+from src.retraining import rows_since, trained_until
+from src.tuning import cache_training_matrix
+
+WEAK_PARAMS = {"n_estimators": 2, "learning_rate": 0.01, "verbose": -1}
+STRONG_PARAMS = {"n_estimators": 100, "num_leaves": 15, "verbose": -1}
+
+
+@pytest.fixture
+def feature_table(seasonal_ts_data):
+    return transform_ts_data_info_features_and_target(
+        seasonal_ts_data, window_size=24 * 28, step_size=1
+    )
+
+
+def fit_registered(features, targets, params, last_hour):
+    """Fits the "registered" model on the rows up to `last_hour`; returns it and its metrics."""
+    seen = pd.to_datetime(features["pickup_hour"]) <= last_hour
+    registered = get_pipeline(**params).fit(features[seen], targets[seen])
+    return registered, {"test_mae": 1.0, "trained_until": trained_until(features[seen])}
+
+
+@pytest.mark.parametrize(
+    "candidate,registered_params,expected",
+    [(WEAK_PARAMS, STRONG_PARAMS, False), (STRONG_PARAMS, WEAK_PARAMS, True)],
+)
+def test_registration_follows_unseen_rows(
+    tmp_path, feature_table, candidate, registered_params, expected
+):
+    features, targets = feature_table
+    last_week = pd.to_datetime(features["pickup_hour"]).max() - pd.Timedelta(days=7)
+    registered, metric = fit_registered(features, targets, registered_params, last_week)
+
+    report = backtest(features, targets, {"new": candidate}, n_weeks=1, cache_dir=tmp_path)
+    comparison = compare_on_unseen_rows(
+        report["new"]["predictions"], registered, features, metric["trained_until"]
+    )
+    register, _ = registration_decision(report["new"]["mae"], metric, comparison)
+
+    # The unseen rows are exactly the backtest week
+    assert comparison["rows"] == len(report["new"]["predictions"])
+    assert comparison["new_mae"] == pytest.approx(report["new"]["mae"])
+    assert register is expected
+
+
+def test_compare_on_unseen_rows_skips_rows_the_registered_model_saw(tmp_path, feature_table):
+    features, targets = feature_table
+    last_hour = pd.to_datetime(features["pickup_hour"]).max() - pd.Timedelta(days=2)
+    registered, metric = fit_registered(features, targets, WEAK_PARAMS, last_hour)
+
+    report = backtest(features, targets, {"new": WEAK_PARAMS}, n_weeks=1, cache_dir=tmp_path)
+    comparison = compare_on_unseen_rows(
+        report["new"]["predictions"], registered, features, metric["trained_until"]
+    )
+
+    assert comparison["rows"] == 2 * 24 * 4
+
+
+def test_matrix_and_keys_compare_like_the_feature_table(tmp_path, seasonal_ts_data, feature_table):
+    features, targets = feature_table
+    last_week = pd.to_datetime(features["pickup_hour"]).max() - pd.Timedelta(days=7)
+    registered, metric = fit_registered(features, targets, WEAK_PARAMS, last_week)
+    since = metric["trained_until"]
+
+    report = backtest(features, targets, {"new": STRONG_PARAMS}, n_weeks=1, cache_dir=tmp_path)
+    expected = compare_on_unseen_rows(report["new"]["predictions"], registered, features, since)
+
+    # As in the training pipeline: no feature table, only the matrix and its keys
+    matrix, matrix_targets, keys, feature_names = build_training_matrix(
+        seasonal_ts_data, window_size=24 * 28, step_size=1
+    )
+    training_matrix = cache_training_matrix(matrix, matrix_targets, feature_names, tmp_path)
+    report = backtest(
+        keys,
+        pd.Series(matrix_targets),
+        {"new": STRONG_PARAMS},
+        n_weeks=1,
+        training_matrix=training_matrix,
+    )
+    comparison = compare_on_unseen_rows(
+        report["new"]["predictions"],
+        registered,
+        feature_frame(matrix, keys, feature_names, rows_since(keys, since)),
+        since,
+    )
+
+    assert comparison == pytest.approx(expected)
+
+
+def test_registration_without_unseen_rows_uses_the_recorded_mae():
+    assert registration_decision(2.0, None, None)[0]
+    assert registration_decision(2.0, {"test_mae": 2.5}, None)[0]
+    assert not registration_decision(2.0, {"test_mae": 2.0}, None)[0]
@@ -0,0 +1,369 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import data_utils
+from src.data_utils import (
+    transform_ts_data_info_features_and_target,
+    transform_ts_data_info_features_and_target_loop,
+)
+
+
+@pytest.mark.parametrize("window_size,step_size", [(12, 1), (24, 5), (24 * 28, 23)])
+def test_vectorized_windows_match_loop_reference(ts_data, window_size, step_size):
+    features, targets = transform_ts_data_info_features_and_target(
+        ts_data, window_size=window_size, step_size=step_size
+    )
+    expected_features, expected_targets = transform_ts_data_info_features_and_target_loop(
+        ts_data, window_size=window_size, step_size=step_size
+    )
+
+    assert list(features.columns) == list(expected_features.columns)
+    assert len(features) == len(expected_features)
+    ride_columns = [c for c in features.columns if c.startswith("rides_t-")]
+    np.testing.assert_array_equal(
+        features[ride_columns].to_numpy(np.int64),
+        expected_features[ride_columns].to_numpy(np.int64),
+    )
+    np.testing.assert_array_equal(
+        features["pickup_location_id"].to_numpy(np.int64),
+        expected_features["pickup_location_id"].to_numpy(np.int64),
+    )
+    pd.testing.assert_index_equal(
+        pd.DatetimeIndex(features["pickup_hour"]),
+        pd.DatetimeIndex(expected_features["pickup_hour"]),
+    )
+    np.testing.assert_array_equal(
+        targets.to_numpy(np.int64), expected_targets.to_numpy(np.int64)
+    )
+
+
+def test_vectorized_windows_keep_rides_dtype(ts_data):
+    features, targets = transform_ts_data_info_features_and_target(ts_data, window_size=12)
+
+    assert features["rides_t-1"].dtype == np.int16
+    assert targets.dtype == np.int16
+
+
+def _monthly_counts_from(ts_data):
+    """Stands in for the per-month counts cache, answering from `ts_data` a year back."""
+
+    def load_monthly_hourly_counts(year, month, pickup_from=None, pickup_to=None):
+        hours = ts_data["pickup_hour"]
+        in_range = (hours >= pickup_from) & (hours < pickup_to) & (ts_data["rides"] > 0)
+        return ts_data[in_range].reset_index(drop=True)
+
+    return load_monthly_hourly_counts
+
+
+def test_fetch_batch_ts_data_fills_the_requested_range(monkeypatch, ts_data):
+    ts_data = ts_data.copy()
+    ts_data.loc[ts_data["pickup_hour"] >= "2025-01-10 12:00", "rides"] = 0
+    monkeypatch.setattr(
+        data_utils, "load_monthly_hourly_counts", _monthly_counts_from(ts_data)
+    )
+
+    batch = data_utils.fetch_batch_ts_data("2025-12-31 06:00", "2026-01-09 18:00")
+
+    assert batch["pickup_hour"].min() == pd.Timestamp("2025-12-31 06:00")
+    assert batch["pickup_hour"].max() == pd.Timestamp("2026-01-09 17:00")
+    assert len(batch) == 4 * (9 * 24 + 12)
+    assert batch.loc[batch["pickup_hour"] >= "2026-01-09 12:00", "rides"].eq(0).all()
+
+
+def test_fetch_batch_ts_data_without_rides_is_empty(monkeypatch, ts_data):
+    monkeypatch.setattr(
+        data_utils, "load_monthly_hourly_counts", _monthly_counts_from(ts_data.iloc[0:0])
+    )
+
+    batch = data_utils.fetch_batch_ts_data("2026-01-09 12:00", "2026-01-09 14:00")
+
+    assert batch.empty
+    assert list(batch.columns) == ["pickup_hour", "pickup_location_id", "rides"]
+
+
+def test_latest_features_of_an_empty_read():
+    empty = pd.DataFrame(
+        {
+            "pickup_hour": pd.Series(dtype="datetime64[ns, UTC]"),
+            "pickup_location_id": pd.Series(dtype="int16"),
+            "rides": pd.Series(dtype="int16"),
+        }
+    )
+
+    features = data_utils.transform_ts_data_info_latest_features(
+        empty, window_size=24, prediction_hour=pd.Timestamp("2025-01-02", tz="UTC")
+    )
+
+    assert features.empty
+    assert list(features.columns[-2:]) == ["pickup_location_id", "pickup_hour"]
+    assert len(features.columns) == 26
+
+
+def _exact_quantile(values, q):
+    return np.sort(values)[int(q * (len(values) - 1))]
+
+
+@pytest.mark.parametrize("relative_accuracy", [0.01, 0.001])
+def test_quantile_sketch_is_within_its_relative_accuracy(relative_accuracy):
+    rng = np.random.default_rng(0)
+    values = np.concatenate(
+        [rng.lognormal(3, 1.5, 50_000), -rng.lognormal(1, 1, 5_000), np.zeros(100)]
+    )
+    sketch = data_utils.QuantileSketch(relative_accuracy).add(values)
+
+    for q in [0.0, 0.01, 0.05, 0.1, 0.5, 0.9, 0.99, 0.999, 1.0]:
+        exact = _exact_quantile(values, q)
+        assert abs(sketch.quantile(q) - exact) <= relative_accuracy * abs(exact)
+
+
+def test_quantile_sketch_ignores_nans_and_is_nan_when_empty():
+    assert np.isnan(data_utils.QuantileSketch().quantile(0.5))
+
+    sketch = data_utils.QuantileSketch().add(np.array([np.nan, 10.0, np.nan]))
+    assert sketch.count == 1
+    assert sketch.quantile(0.5) == pytest.approx(10.0, rel=data_utils.TOTAL_AMOUNT_RELATIVE_ACCURACY)
+
+
+def test_merged_sketches_match_one_sketch_of_all_values():
+    rng = np.random.default_rng(1)
+    chunks = [rng.normal(20, 15, 10_000) for _ in range(4)]
+
+    merged = data_utils.QuantileSketch()
+    for chunk in chunks:
+        merged.merge(data_utils.QuantileSketch().add(chunk))
+    whole = data_utils.QuantileSketch().add(np.concatenate(chunks))
+
+    assert merged.count == whole.count
+    for q in [0.001, 0.25, 0.5, 0.75, 0.999]:
+        assert merged.quantile(q) == whole.quantile(q)
+
+    with pytest.raises(ValueError):
+        merged.merge(data_utils.QuantileSketch(relative_accuracy=0.01))
+
+
+def _reference_filter(rides, start_date, end_date, total_amount_cap):
+    """The pandas filter `_valid_rides_mask` replaced."""
+    duration = rides["tpep_dropoff_datetime"] - rides["tpep_pickup_datetime"]
+    return (
+        (duration > pd.Timedelta(0))
+        & (duration <= data_utils.MAX_TRIP_DURATION)
+        & (rides["total_amount"] > 0)
+        & (rides["total_amount"] <= total_amount_cap)
+        & ~rides["PULocationID"].isin(data_utils.NON_NYC_LOCATION_IDS)
+        & (rides["tpep_pickup_datetime"] >= start_date)
+        & (rides["tpep_pickup_datetime"] < end_date)
+    )
+
+
+@pytest.fixture
+def raw_rides():
+    rng = np.random.default_rng(2)
+    n = 20_000
+    pickup = pd.Timestamp("2025-01-31") + pd.to_timedelta(
+        rng.integers(-2 * 24 * 60, 2 * 24 * 60, n), unit="min"
+    )
+    # Durations from negative to well over MAX_TRIP_DURATION, amounts with negatives,
+    # NaNs and outliers, and the non-NYC zones
+    duration = pd.to_timedelta(rng.integers(-30, 7 * 60, n), unit="min")
+    total_amount = rng.lognormal(3, 1, n) * rng.choice([-1, 1], n, p=[0.05, 0.95])
+    total_amount[rng.random(n) < 0.01] = np.nan
+    return pd.DataFrame(
+        {
+            "tpep_pickup_datetime": pickup,
+            "tpep_dropoff_datetime": pickup + duration,
+            "PULocationID": rng.integers(1, 266, n).astype(np.int32),
+            "total_amount": total_amount,
+        },
+        index=np.arange(n) * 3,
+    )
+
+
+@pytest.mark.parametrize("chunk_size", [1000, 1 << 18])
+def test_valid_rides_mask_matches_the_pandas_filter(raw_rides, chunk_size):
+    start_date, end_date = pd.Timestamp("2025-01-01"), pd.Timestamp("2025-02-01")
+    cap = 100.0
+
+    mask = data_utils._valid_rides_mask(
+        raw_rides["tpep_pickup_datetime"].to_numpy(),
+        raw_rides["tpep_dropoff_datetime"].to_numpy(),
+        raw_rides["total_amount"].to_numpy(),
+        raw_rides["PULocationID"].to_numpy(),
+        start_date,
+        end_date,
+        cap,
+        chunk_size=chunk_size,
+    )
+
+    expected = _reference_filter(raw_rides, start_date, end_date, cap).to_numpy()
+    np.testing.assert_array_equal(mask, expected)
+    assert 0 < mask.sum() < len(mask)
+
+
+def test_filter_nyc_taxi_data_matches_the_pandas_filter(raw_rides):
+    columns = list(raw_rides.columns)
+    cap = 100.0
+
+    filtered = data_utils.filter_nyc_taxi_data(raw_rides, 2025, 1, total_amount_cap=cap)
+
+    keep = _reference_filter(raw_rides, pd.Timestamp("2025-01-01"), pd.Timestamp("2025-02-01"), cap)
+    expected = raw_rides.loc[keep, ["tpep_pickup_datetime", "PULocationID"]].rename(
+        columns={
+            "tpep_pickup_datetime": "pickup_datetime",
+            "PULocationID": "pickup_location_id",
+        }
+    )
+    pd.testing.assert_frame_equal(filtered, expected)
+    # The caller's frame is left untouched
+    assert list(raw_rides.columns) == columns
+
+
+def test_filter_nyc_taxi_data_default_cap_is_close_to_the_exact_quantile(raw_rides):
+    amounts = raw_rides["total_amount"].dropna().to_numpy()
+    exact = _exact_quantile(amounts, data_utils.TOTAL_AMOUNT_QUANTILE)
+    tolerance = data_utils.TOTAL_AMOUNT_RELATIVE_ACCURACY * exact
+
+    filtered = data_utils.filter_nyc_taxi_data(raw_rides, 2025, 1)
+
+    # Only rides with amounts within the sketch's error of the exact cap can differ
+    start_date, end_date = pd.Timestamp("2025-01-01"), pd.Timestamp("2025-02-01")
+    lower = _reference_filter(raw_rides, start_date, end_date, exact - tolerance)
+    upper = _reference_filter(raw_rides, start_date, end_date, exact + tolerance)
+    assert lower.sum() <= len(filtered) <= upper.sum()
+
+
+@pytest.mark.parametrize("tz", [None, "UTC"])
+def test_gap_filling_matches_the_merge_reference(ts_data, tz):
+    rng = np.random.default_rng(3)
+    sparse = ts_data[rng.random(len(ts_data)) >= 0.3].reset_index(drop=True)
+    sparse["pickup_hour"] = sparse["pickup_hour"].dt.tz_localize(tz)
+    args = ("pickup_hour", "pickup_location_id", "rides")
+
+    filled = data_utils.fill_missing_rides_full_range(sparse.copy(), *args)
+
+    pd.testing.assert_frame_equal(
+        filled, data_utils.fill_missing_rides_full_range_merge(sparse.copy(), *args)
+    )
+    assert len(filled) == ts_data["pickup_hour"].nunique() * ts_data["pickup_location_id"].nunique()
+
+
+def test_process_pool_load_matches_the_serial_load(monkeypatch, tmp_path):
+    monkeypatch.setattr(data_utils, "RAW_DATA_DIR", tmp_path)
+    rng = np.random.default_rng(4)
+    for month in (1, 2, 3):
+        pickup = pd.Timestamp(2025, month, 1) + pd.to_timedelta(
+            rng.integers(0, 28 * 24 * 3600, 5000), unit="s"
+        )
+        pd.DataFrame(
+            {
+                "tpep_pickup_datetime": pickup,
+                "tpep_dropoff_datetime": pickup
+                + pd.to_timedelta(rng.integers(60, 3600, 5000), unit="s"),
+                "PULocationID": rng.integers(1, 266, 5000).astype(np.int32),
+                "total_amount": rng.lognormal(3, 0.5, 5000),
+            }
+        ).to_parquet(tmp_path / f"rides_2025_{month:02}.parquet")
+
+    serial = data_utils.load_and_process_taxi_data(2025, [1, 2, 3], use_cache=False)
+    pooled = data_utils.load_and_process_taxi_data(2025, [1, 2, 3], use_cache=False, n_jobs=2)
+
+    pd.testing.assert_frame_equal(pooled, serial)
+    # Months are combined in month order
+    assert pooled["pickup_datetime"].dt.month.is_monotonic_increasing
+
+
+def _raw_rides(rng, n_rides=5000):
+    """Processed rides of January 2025, as `filter_nyc_taxi_data` returns them."""
+    return pd.DataFrame(
+        {
+            "pickup_datetime": pd.Timestamp(2025, 1, 1)
+            + pd.to_timedelta(rng.integers(0, 31 * 24 * 3600, n_rides), unit="s"),
+            "pickup_location_id": rng.integers(1, 40, n_rides).astype(np.int32),
+        }
+    )
+
+
+def test_streaming_transform_matches_the_transform_of_all_batches():
+    rides = _raw_rides(np.random.default_rng(5))
+    # Row batches rather than months, so the same hours show up in several batches
+    batches = [rides.iloc[rows].copy() for rows in np.array_split(np.arange(len(rides)), 4)]
+
+    streamed = data_utils.transform_raw_data_into_ts_data_streaming(iter(batches))
+
+    pd.testing.assert_frame_equal(
+        streamed, data_utils.transform_raw_data_into_ts_data(rides.copy())
+    )
+
+
+def test_streaming_transform_of_no_batches():
+    with pytest.raises(ValueError, match="No ride batches"):
+        data_utils.transform_raw_data_into_ts_data_streaming(iter([]))
+
+
+def test_streaming_transform_of_monthly_batches_matches_the_full_load(monkeypatch, tmp_path):
+    monkeypatch.setattr(data_utils, "RAW_DATA_DIR", tmp_path)
+    rng = np.random.default_rng(6)
+    for month in (1, 2):
+        pickup = pd.Timestamp(2025, month, 1) + pd.to_timedelta(
+            rng.integers(0, 28 * 24 * 3600, 2000), unit="s"
+        )
+        pd.DataFrame(
+            {
+                "tpep_pickup_datetime": pickup,
+                "tpep_dropoff_datetime": pickup
+                + pd.to_timedelta(rng.integers(60, 3600, 2000), unit="s"),
+                "PULocationID": rng.integers(1, 40, 2000).astype(np.int32),
+                "total_amount": rng.lognormal(3, 0.5, 2000),
+            }
+        ).to_parquet(tmp_path / f"rides_2025_{month:02}.parquet")
+
+    streamed = data_utils.transform_raw_data_into_ts_data_streaming(
+        data_utils.iter_taxi_data(2025, [1, 2], use_cache=False)
+    )
+    loaded = data_utils.load_and_process_taxi_data(2025, [1, 2], use_cache=False)
+
+    pd.testing.assert_frame_equal(streamed, data_utils.transform_raw_data_into_ts_data(loaded))
+    assert streamed["rides"].sum() == len(loaded) > 0
+
+
+@pytest.mark.parametrize("tz", [None, "UTC"])
+def test_latest_features_match_the_last_step_1_window(ts_data, tz):
+    ts_data["pickup_hour"] = ts_data["pickup_hour"].dt.tz_localize(tz)
+    last_hour = ts_data["pickup_hour"].max()
+    windows = data_utils.transform_ts_data_info_features(ts_data, window_size=24 * 28)
+    expected = windows.groupby("pickup_location_id").tail(1).reset_index(drop=True)
+
+    latest = data_utils.transform_ts_data_info_latest_features(
+        ts_data, window_size=24 * 28, prediction_hour=last_hour
+    )
+
+    pd.testing.assert_frame_equal(latest[expected.columns], expected, check_dtype=False)
+    assert latest["rides_t-1"].dtype == np.int16
+
+
+def test_latest_features_default_to_the_hour_after_the_data(ts_data):
+    latest = data_utils.transform_ts_data_info_latest_features(ts_data, window_size=24)
+
+    assert (latest["pickup_hour"] == ts_data["pickup_hour"].max() + pd.Timedelta(hours=1)).all()
+    last_day = ts_data.sort_values("pickup_hour").groupby("pickup_location_id").tail(24)
+    expected = [group["rides"].to_numpy() for _, group in last_day.groupby("pickup_location_id")]
+    np.testing.assert_array_equal(latest.filter(like="rides_t-").to_numpy(), np.stack(expected))
+
+
+@pytest.mark.parametrize(
+    "short_history,expected_zones", [("pad", [4, 43, 132, 161]), ("skip", [4, 43, 161])]
+)
+def test_latest_features_of_a_zone_with_short_history(ts_data, short_history, expected_zones):
+    last_hour = ts_data["pickup_hour"].max()
+    late_zone = (ts_data["pickup_location_id"] == 132) & (
+        ts_data["pickup_hour"] < last_hour - pd.Timedelta(hours=12)
+    )
+    ts_data = ts_data[~late_zone]
+
+    latest = data_utils.transform_ts_data_info_latest_features(
+        ts_data, window_size=24, prediction_hour=last_hour, short_history=short_history
+    )
+
+    assert latest["pickup_location_id"].tolist() == expected_zones
+    if short_history == "pad":
+        assert (latest.loc[2, "rides_t-24":"rides_t-13"] == 0).all()
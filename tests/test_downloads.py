@@ -0,0 +1,137 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+import pytest
+import requests
+
+from src import data_utils
+
+
+@pytest.fixture(scope="module")
+def parquet_bytes(tmp_path_factory):
+    path = tmp_path_factory.mktemp("parquet") / "rides.parquet"
+    rng = np.random.default_rng(0)
+    pd.DataFrame({"total_amount": rng.random(20_000), "PULocationID": rng.integers(1, 266, 20_000)}).to_parquet(path)
+    return path.read_bytes()
+
+
+@pytest.fixture
+def server(parquet_bytes):
+    """
+    Local HTTP server of a parquet file. Paths containing "dropped" close the connection
+    half way through the first response, "truncated" serve a complete response of half
+    the file, and "missing" answer 404; `aliases` maps other paths to one of these.
+    Range requests are honoured.
+    """
+    requests_seen, aliases = [], {}
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            requests_seen.append((self.path, self.headers.get("Range")))
+            kind = aliases.get(self.path, self.path)
+            if "missing" in kind:
+                self.send_error(404)
+                return
+            body = parquet_bytes[: len(parquet_bytes) // 2] if "truncated" in kind else parquet_bytes
+            offset = 0
+            if self.headers.get("Range"):
+                offset = int(self.headers["Range"].split("=")[1].rstrip("-"))
+                self.send_response(206)
+                self.send_header(
+                    "Content-Range", f"bytes {offset}-{len(body) - 1}/{len(body)}"
+                )
+            else:
+                self.send_response(200)
+            self.send_header("Content-Length", str(len(body) - offset))
+            self.end_headers()
+            first_attempt = sum(path == self.path for path, _ in requests_seen) == 1
+            if "dropped" in kind and first_attempt:
+                self.wfile.write(body[: len(body) // 2])
+                self.close_connection = True
+                return
+            self.wfile.write(body[offset:])
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    httpd.requests_seen, httpd.aliases = requests_seen, aliases
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(data_utils.time, "sleep", lambda seconds: None)
+
+
+def test_complete_download(tmp_path, server, parquet_bytes):
+    path = data_utils._download_file(
+        requests.Session(), f"{server.url}/ok.parquet", tmp_path / "ok.parquet"
+    )
+
+    assert path.read_bytes() == parquet_bytes
+    assert not (tmp_path / "ok.parquet.part").exists()
+
+
+def test_dropped_connection_resumes_with_a_range_request(tmp_path, server, parquet_bytes):
+    path = data_utils._download_file(
+        requests.Session(),
+        f"{server.url}/dropped.parquet",
+        tmp_path / "dropped.parquet",
+        chunk_size=1 << 12,
+    )
+
+    assert path.read_bytes() == parquet_bytes
+    (_, first_range), (_, second_range) = server.requests_seen
+    assert first_range is None
+    # Only whole chunks reach the .part file, so the resume starts at a chunk boundary
+    resumed_from = int(second_range.split("=")[1].rstrip("-"))
+    assert 0 < resumed_from <= len(parquet_bytes) // 2
+
+
+def test_truncated_file_fails_the_footer_check(tmp_path, server):
+    path = tmp_path / "truncated.parquet"
+
+    with pytest.raises(IOError, match="Corrupt download"):
+        data_utils._download_file(
+            requests.Session(), f"{server.url}/truncated.parquet", path, max_retries=2
+        )
+
+    assert len(server.requests_seen) == 2
+    assert not path.exists()
+    assert not path.with_name(path.name + ".part").exists()
+
+
+def test_missing_file_is_not_retried(tmp_path, server):
+    path = tmp_path / "missing.parquet"
+
+    with pytest.raises(Exception, match="is not available"):
+        data_utils._download_file(requests.Session(), f"{server.url}/missing.parquet", path)
+
+    assert len(server.requests_seen) == 1
+    assert not path.exists()
+
+
+def test_bulk_fetch_finishes_other_months_before_failing(
+    monkeypatch, tmp_path, server, parquet_bytes
+):
+    monkeypatch.setattr(data_utils, "RAW_DATA_DIR", tmp_path)
+    monkeypatch.setattr(
+        data_utils, "RAW_TRIP_DATA_URL", server.url + "/{year}-{month:02}.parquet"
+    )
+    server.aliases.update(
+        {"/2025-01.parquet": "ok", "/2025-02.parquet": "dropped", "/2025-03.parquet": "missing"}
+    )
+
+    with pytest.raises(Exception, match=r"\(2025, 3\)"):
+        data_utils.fetch_raw_trip_data_bulk([(2025, 1), (2025, 2), (2025, 3)])
+
+    assert (tmp_path / "rides_2025_01.parquet").read_bytes() == parquet_bytes
+    assert (tmp_path / "rides_2025_02.parquet").read_bytes() == parquet_bytes
+    assert not (tmp_path / "rides_2025_03.parquet").exists()
@@ -0,0 +1,168 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.feature_cache import CachedFeatureStore
+from src.feature_store import LocalFeatureStore
+
+NAME, VERSION = "rides_feature_group", 1
+ZONES = [4, 43]
+
+
+class RecordingStore(LocalFeatureStore):
+    """Local store that records the reads reaching it."""
+
+    def __init__(self, root):
+        super().__init__(root)
+        self.reads = []
+
+    def read_feature_group(self, name, version, start=None, end=None, location_ids=None):
+        self.reads.append((start, end, location_ids))
+        return super().read_feature_group(name, version, start, end, location_ids)
+
+
+def hourly_rows(start, hours, zones=ZONES):
+    pickup_hours = pd.date_range(start, periods=hours, freq="h", tz="UTC")
+    return pd.DataFrame(
+        {
+            "pickup_hour": np.repeat(pickup_hours, len(zones)),
+            "pickup_location_id": np.tile(np.array(zones, dtype=np.int16), hours),
+            "rides": np.arange(hours * len(zones), dtype=np.int16) % 50,
+        }
+    )
+
+
+def insert(store, rows):
+    store.insert_feature_group(
+        NAME,
+        VERSION,
+        rows,
+        primary_key=["pickup_location_id", "pickup_hour"],
+        event_time="pickup_hour",
+    )
+
+
+@pytest.fixture
+def days_ago():
+    today = pd.Timestamp.now(tz="UTC").floor("D")
+    return lambda days: today - pd.Timedelta(days=days)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return RecordingStore(tmp_path / "store")
+
+
+@pytest.fixture
+def cache(tmp_path, store):
+    return CachedFeatureStore(store, cache_dir=tmp_path / "cache", zone_ids=ZONES)
+
+
+def cached_days(cache):
+    return sorted(path.stem for path in cache.cache_dir.glob("*/*.parquet"))
+
+
+def test_complete_days_are_served_from_disk(store, cache, days_ago):
+    insert(store, hourly_rows(days_ago(10), 3 * 24))
+
+    first = cache.read_feature_group(NAME, VERSION, start=days_ago(10), end=days_ago(7))
+    reads = len(store.reads)
+    second = cache.read_feature_group(NAME, VERSION, start=days_ago(10), end=days_ago(7))
+
+    assert len(first) == 3 * 24 * len(ZONES)
+    assert len(cached_days(cache)) == 3
+    assert len(store.reads) == reads
+    pd.testing.assert_frame_equal(first, second)
+
+
+@pytest.mark.parametrize(
+    "partial",
+    [
+        lambda rows: rows[rows["pickup_hour"].dt.hour < 20],  # an outage
+        lambda rows: rows[rows["pickup_location_id"] == ZONES[0]],  # an unfinished insert
+    ],
+)
+def test_incomplete_days_are_not_cached_and_backfills_show_up(
+    store, cache, days_ago, partial
+):
+    complete = hourly_rows(days_ago(10), 24)
+    insert(store, partial(complete))
+
+    before = cache.read_feature_group(NAME, VERSION, start=days_ago(10), end=days_ago(9))
+    # Backfilled straight into the store, bypassing the cache's invalidation
+    insert(store, complete)
+    after = cache.read_feature_group(NAME, VERSION, start=days_ago(10), end=days_ago(9))
+
+    assert len(before) < len(complete)
+    assert len(after) == len(complete)
+    assert len(cached_days(cache)) == 1
+
+
+def test_recent_hours_are_always_read_from_the_store(store, cache):
+    now = pd.Timestamp.now(tz="UTC").floor("h")
+    insert(store, hourly_rows(now - pd.Timedelta(hours=cache.revalidate_hours), 3))
+
+    rows = cache.read_feature_group(NAME, VERSION, start=now - pd.Timedelta(hours=6))
+
+    assert len(rows) == 3 * len(ZONES)
+    assert cached_days(cache) == []
+
+
+def test_zone_filters_reach_the_store_for_uncached_hours(store, cache, days_ago):
+    insert(store, hourly_rows(days_ago(2), 3 * 24))
+    store.reads.clear()
+
+    rows = cache.read_feature_group(NAME, VERSION, start=days_ago(2), location_ids=[43])
+
+    assert set(rows["pickup_location_id"]) == {43}
+    # Days that get cached are read for all zones, the rest with the zone filter
+    assert store.reads[-1][2] == [43]
+    assert all(location_ids is None for _, _, location_ids in store.reads[:-1])
+
+
+def test_inserts_through_the_cache_drop_touched_partitions(store, cache, days_ago):
+    insert(store, hourly_rows(days_ago(10), 24))
+    cache.read_feature_group(NAME, VERSION, start=days_ago(10), end=days_ago(9))
+
+    update = hourly_rows(days_ago(10), 1).assign(rides=np.int16(999))
+    cache.insert_feature_group(
+        NAME,
+        VERSION,
+        update,
+        primary_key=["pickup_location_id", "pickup_hour"],
+        event_time="pickup_hour",
+    )
+    rows = cache.read_feature_group(NAME, VERSION, start=days_ago(10), end=days_ago(9))
+
+    assert (rows.loc[rows["pickup_hour"] == days_ago(10), "rides"] == 999).all()
+
+
+def test_least_recently_read_partitions_are_evicted(tmp_path, store, days_ago):
+    insert(store, hourly_rows(days_ago(10), 4 * 24))
+    sizing = CachedFeatureStore(store, cache_dir=tmp_path / "sizing", zone_ids=ZONES)
+    sizing.read_feature_group(NAME, VERSION, start=days_ago(10), end=days_ago(9))
+    partition_bytes = next(sizing.cache_dir.glob("*/*.parquet")).stat().st_size
+    cache = CachedFeatureStore(
+        store,
+        cache_dir=tmp_path / "cache",
+        zone_ids=ZONES,
+        max_bytes=int(2.5 * partition_bytes),
+    )
+
+    cache.read_feature_group(NAME, VERSION, start=days_ago(10), end=days_ago(8))
+    for day in (10, 9):
+        os.utime(cache._partition_path(NAME, VERSION, days_ago(day)), (1, 1))
+    # Reading a day again makes it the most recently read one
+    cache.read_feature_group(NAME, VERSION, start=days_ago(10), end=days_ago(9))
+    cache.read_feature_group(NAME, VERSION, start=days_ago(8), end=days_ago(7))
+
+    assert cached_days(cache) == sorted(f"{days_ago(day):%Y-%m-%d}" for day in (10, 8))
+
+
+def test_complete_days_cover_every_nyc_zone_by_default(tmp_path, store):
+    cache = CachedFeatureStore(store, cache_dir=tmp_path / "cache")
+
+    assert len(cache.zone_ids) == 262
+    assert not {1, 264, 265} & set(cache.zone_ids)
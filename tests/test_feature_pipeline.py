@@ -0,0 +1,19 @@
+import pandas as pd
+
+from src.data_utils import NYC_ZONE_IDS
+from src.feature_pipeline import fill_new_hours
+
+
+def test_every_nyc_zone_gets_every_hour(ts_data):
+    start = pd.Timestamp("2025-01-02", tz="UTC")
+    end = start + pd.Timedelta(days=2)
+
+    filled = fill_new_hours(ts_data, start, end)
+
+    assert len(filled) == 48 * len(NYC_ZONE_IDS)
+    assert filled["pickup_location_id"].unique().tolist() == NYC_ZONE_IDS.tolist()
+    assert filled["pickup_hour"].min() == start.tz_convert(None)
+    assert filled["pickup_hour"].max() == end.tz_convert(None) - pd.Timedelta(hours=1)
+    observed = filled.merge(ts_data, on=["pickup_hour", "pickup_location_id"])
+    assert (observed["rides_x"] == observed["rides_y"]).all()
+    assert filled.loc[~filled["pickup_location_id"].isin([4, 43, 132, 161]), "rides"].eq(0).all()
@@ -0,0 +1,200 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from src.feature_store import HopsworksFeatureStore, HopsworksSession
+
+
+class FakeModel:
+    def __init__(self, version):
+        self.version = version
+
+
+class FakeRegistry:
+    def get_models(self, name):
+        return [FakeModel(1), FakeModel(2)]
+
+
+class FakeProject:
+    """Stands in for a logged-in Hopsworks project, with a registry of two versions."""
+
+    def __init__(self):
+        self.feature_store_requests = 0
+
+    def get_feature_store(self):
+        self.feature_store_requests += 1
+        return object()
+
+    def get_model_registry(self):
+        return FakeRegistry()
+
+
+class CountingLogin:
+    """Login test double that counts how often it is called."""
+
+    def __init__(self, delay=0.0):
+        self.calls = 0
+        self.delay = delay
+        self.projects = []
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        self.projects.append(FakeProject())
+        return self.projects[-1]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_one_login_is_reused_across_calls_and_backends():
+    login = CountingLogin()
+    session = HopsworksSession(login=login, ttl_seconds=3600)
+    first, second = HopsworksFeatureStore(session), HopsworksFeatureStore(session)
+
+    for backend in (first, second, first):
+        assert backend.latest_model_version("taxi_demand_predictor_next_hour") == 2
+        backend.get_feature_store()
+        backend.get_project()
+
+    assert login.calls == 1
+    # Handles are cached on top of the session too
+    assert login.projects[0].feature_store_requests == 1
+
+
+def test_login_again_once_the_session_expires():
+    login, clock = CountingLogin(), FakeClock()
+    session = HopsworksSession(login=login, ttl_seconds=60, clock=clock)
+
+    session.project
+    clock.now = 59
+    session.project
+    assert login.calls == 1
+
+    clock.now = 60
+    assert session.project is login.projects[1]
+    assert login.calls == 2
+
+
+def test_concurrent_first_callers_share_one_login():
+    login = CountingLogin(delay=0.05)
+    session = HopsworksSession(login=login)
+    projects = []
+
+    threads = [
+        threading.Thread(target=lambda: projects.append(session.project)) for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert login.calls == 1
+    assert all(project is login.projects[0] for project in projects)
+
+
+def test_run_reconnects_once_on_a_connection_error():
+    login = CountingLogin()
+    session = HopsworksSession(login=login)
+    attempts = []
+
+    def operation(session):
+        attempts.append(session.project)
+        if len(attempts) == 1:
+            raise ConnectionError("connection reset")
+        return "ok"
+
+    assert session.run(operation) == "ok"
+    assert login.calls == 2
+    assert attempts == login.projects
+
+
+def test_run_does_not_retry_other_errors():
+    login = CountingLogin()
+    session = HopsworksSession(login=login)
+
+    def operation(session):
+        session.project
+        raise KeyError("missing")
+
+    with pytest.raises(KeyError):
+        session.run(operation)
+    assert login.calls == 1
+
+
+class FakeColumn:
+    def __ge__(self, value):
+        return value
+
+
+class FakeFeatureGroup:
+    """Feature group of pickup hours whose queries record the lower bound they read from."""
+
+    pickup_hour = FakeColumn()
+
+    def __init__(self, pickup_hours):
+        self.pickup_hours = pd.Series(pickup_hours)
+        self.reads = []
+
+    def select(self, columns):
+        return FakeQuery(self)
+
+
+class FakeQuery:
+    def __init__(self, fg, start=None):
+        self.fg, self.start = fg, start
+
+    def filter(self, start):
+        return FakeQuery(self.fg, start)
+
+    def read(self):
+        self.fg.reads.append(self.start)
+        hours = self.fg.pickup_hours
+        if self.start is not None:
+            hours = hours[hours >= self.start]
+        return pd.DataFrame({"pickup_hour": hours})
+
+
+class FakeSession:
+    def __init__(self, fg):
+        self.fg = fg
+
+    def feature_group(self, name, version):
+        return self.fg
+
+    def run(self, operation):
+        return operation(self)
+
+
+def store_with_hours(last_hour_age):
+    now = pd.Timestamp.now(tz="UTC").floor("h")
+    fg = FakeFeatureGroup(pd.date_range(end=now - last_hour_age, periods=24 * 60, freq="h"))
+    return HopsworksFeatureStore(session=FakeSession(fg)), fg, now - last_hour_age
+
+
+def test_latest_event_time_reads_a_recent_window_first():
+    store, fg, last_hour = store_with_hours(pd.Timedelta(hours=1))
+    since = pd.Timestamp.now(tz="UTC") - pd.Timedelta(days=28)
+
+    assert store.latest_event_time("rides", 1, since=since) == last_hour
+    assert len(fg.reads) == 1 and fg.reads[0] > since
+
+
+def test_latest_event_time_widens_the_window_down_to_since():
+    store, fg, last_hour = store_with_hours(pd.Timedelta(days=10))
+    since = pd.Timestamp.now(tz="UTC") - pd.Timedelta(days=28)
+
+    assert store.latest_event_time("rides", 1, since=since) == last_hour
+    # 1 and 4 days are empty, 16 days reach the last hour
+    assert len(fg.reads) == 3
+
+    fg.reads.clear()
+    assert store.latest_event_time("rides", 1, since=last_hour + pd.Timedelta(hours=1)) is None
+    assert fg.reads[-1] == last_hour + pd.Timedelta(hours=1)
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data_utils import transform_ts_data_info_features_and_target
+from src.inference import get_model_predictions, get_multi_horizon_predictions
+from src.pipeline_utils import get_pipeline
+
+PARAMS = {"n_estimators": 20, "num_leaves": 15, "verbose": -1}
+
+
+@pytest.fixture
+def latest_features(ts_data):
+    """The last window of every zone, as the inference pipeline scores them."""
+    features, _ = transform_ts_data_info_features_and_target(
+        ts_data, window_size=24 * 28, step_size=1
+    )
+    return features.groupby("pickup_location_id").tail(1).reset_index(drop=True)
+
+
+def fit(ts_data, horizon):
+    features, targets = transform_ts_data_info_features_and_target(
+        ts_data, window_size=24 * 28, step_size=1, horizon=horizon
+    )
+    return get_pipeline(horizon=horizon, **PARAMS).fit(features, targets)
+
+
+def test_recursive_rollout_feeds_predictions_back(ts_data, latest_features):
+    model = fit(ts_data, horizon=1)
+
+    forecast = get_multi_horizon_predictions(model, latest_features, horizon=3)
+
+    assert len(forecast) == 3 * len(latest_features)
+    first = forecast[forecast["horizon"] == 1].reset_index(drop=True)
+    pd.testing.assert_series_equal(
+        first["predicted_demand"],
+        get_model_predictions(model, latest_features)["predicted_demand"],
+        check_dtype=False,
+    )
+    np.testing.assert_array_equal(
+        first["pickup_hour"].to_numpy(), latest_features["pickup_hour"].to_numpy()
+    )
+
+    # The second hour is predicted from the window shifted by one, ending in the first
+    # (unrounded) prediction
+    ride_columns = [c for c in latest_features.columns if c.startswith("rides_t-")]
+    shifted = pd.DataFrame(
+        np.column_stack(
+            [
+                latest_features[ride_columns[1:]].to_numpy(np.float32),
+                np.clip(model.predict(latest_features), 0, None).astype(np.float32),
+            ]
+        ),
+        columns=ride_columns,
+    )
+    shifted["pickup_location_id"] = latest_features["pickup_location_id"]
+    shifted["pickup_hour"] = latest_features["pickup_hour"] + pd.Timedelta(hours=1)
+    second = forecast[forecast["horizon"] == 2]
+    np.testing.assert_allclose(
+        second["predicted_demand"].to_numpy(), model.predict(shifted).round(0)
+    )
+    np.testing.assert_array_equal(
+        second["pickup_hour"].to_numpy(), shifted["pickup_hour"].to_numpy()
+    )
+
+
+def test_direct_model_is_scored_once(ts_data, latest_features):
+    model = fit(ts_data, horizon=3)
+
+    forecast = get_multi_horizon_predictions(model, latest_features, horizon=2)
+
+    expected = model.predict(latest_features)[:, :2].round(0)
+    np.testing.assert_array_equal(
+        forecast["predicted_demand"].to_numpy(), expected.ravel()
+    )
+    assert forecast["horizon"].tolist() == [1, 2] * len(latest_features)
+
+
+def test_direct_model_shorter_than_the_horizon_is_rejected(ts_data, latest_features):
+    model = fit(ts_data, horizon=2)
+
+    with pytest.raises(ValueError, match="predicts 2 hours directly"):
+        get_multi_horizon_predictions(model, latest_features, horizon=3)
@@ -0,0 +1,152 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.feature_cache import CachedFeatureStore
+from src.feature_store import LocalFeatureStore
+from src.pipeline_utils import get_pipeline
+
+NAME, VERSION = "rides_feature_group", 1
+PRIMARY_KEY = ["pickup_location_id", "pickup_hour"]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return LocalFeatureStore(tmp_path / "store")
+
+
+@pytest.fixture
+def rows():
+    pickup_hours = pd.date_range("2025-03-01 20:00", periods=8, freq="h")
+    return pd.DataFrame(
+        {
+            "pickup_hour": np.repeat(pickup_hours, 2),
+            "pickup_location_id": np.tile(np.array([4, 43], dtype=np.int16), 8),
+            "rides": np.arange(16, dtype=np.int16),
+        }
+    )
+
+
+def insert(store, rows):
+    store.insert_feature_group(NAME, VERSION, rows, PRIMARY_KEY, event_time="pickup_hour")
+
+
+def test_insert_and_read_round_trip(store, rows):
+    insert(store, rows)
+
+    stored = store.read_feature_group(NAME, VERSION)
+
+    # Event times come back in UTC; naive inputs are taken as UTC
+    expected = rows.assign(pickup_hour=rows["pickup_hour"].dt.tz_localize("UTC"))
+    pd.testing.assert_frame_equal(
+        stored.sort_values(PRIMARY_KEY).reset_index(drop=True),
+        expected.sort_values(PRIMARY_KEY).reset_index(drop=True),
+        check_dtype=False,
+    )
+    assert stored["rides"].dtype == np.int16
+    # Two day partitions
+    assert len(list(store._feature_group_dir(NAME, VERSION).glob("date=*.parquet"))) == 2
+
+
+def test_inserts_upsert_on_the_primary_key(store, rows):
+    insert(store, rows)
+    insert(store, rows.iloc[:2].assign(rides=np.int16(100)))
+
+    stored = store.read_feature_group(NAME, VERSION)
+
+    assert len(stored) == len(rows)
+    first_hour = stored["pickup_hour"] == pd.Timestamp("2025-03-01 20:00", tz="UTC")
+    assert (stored.loc[first_hour, "rides"] == 100).all()
+
+
+def test_reads_filter_on_time_and_zones(store, rows):
+    insert(store, rows)
+
+    stored = store.read_feature_group(
+        NAME,
+        VERSION,
+        start="2025-03-01 23:00",
+        end=pd.Timestamp("2025-03-01 21:00", tz="America/New_York"),
+        location_ids=[43],
+    )
+
+    assert list(stored["pickup_location_id"]) == [43, 43, 43]
+    assert stored["pickup_hour"].min() == pd.Timestamp("2025-03-01 23:00", tz="UTC")
+    assert stored["pickup_hour"].max() == pd.Timestamp("2025-03-02 01:00", tz="UTC")
+
+
+@pytest.mark.parametrize(
+    "start,end",
+    [
+        ("2025-03-01 21:30", "2025-03-01 21:45"),  # inside a stored day
+        ("2025-06-01", "2025-06-02"),  # no stored day
+    ],
+)
+def test_empty_reads_keep_the_schema(store, rows, start, end):
+    insert(store, rows)
+
+    stored = store.read_feature_group(NAME, VERSION, start=start, end=end)
+
+    assert stored.empty
+    assert list(stored.columns) == list(rows.columns)
+    assert str(stored["pickup_hour"].dtype).startswith("datetime64")
+    assert stored["pickup_location_id"].dtype == np.int16
+
+
+def test_cached_empty_reads_keep_the_schema(tmp_path, store, rows):
+    insert(store, rows)
+    cache = CachedFeatureStore(store, cache_dir=tmp_path / "cache", zone_ids=[4, 43])
+
+    stored = cache.read_feature_group(NAME, VERSION, start="2025-06-01", end="2025-06-03")
+
+    assert stored.empty
+    assert list(stored.columns) == list(rows.columns)
+
+
+def test_feature_views_read_their_feature_group(store, rows):
+    store.insert_feature_group(
+        "time_series_hourly_feature_group", 1, rows, PRIMARY_KEY, event_time="pickup_hour"
+    )
+
+    batch = store.read_feature_view_batch(
+        "time_series_hourly_feature_view", 1, "2025-03-01 22:00", "2025-03-02 00:00"
+    )
+
+    assert len(batch) == 4
+
+
+def test_latest_event_time(store, rows):
+    assert store.latest_event_time(NAME, VERSION) is None
+
+    insert(store, rows)
+
+    assert store.latest_event_time(NAME, VERSION) == pd.Timestamp("2025-03-02 03:00", tz="UTC")
+    assert store.latest_event_time(NAME, VERSION, since="2025-03-03") is None
+
+
+def test_register_and_load_models(store, rows):
+    features = pd.DataFrame({f"rides_t-{i}": np.arange(50.0) for i in range(672, 0, -1)})
+    features["pickup_hour"] = pd.date_range("2025-03-01", periods=50, freq="h")
+    features["pickup_location_id"] = 4
+    targets = pd.Series(np.arange(50.0))
+    first = get_pipeline(n_estimators=5, verbose=-1).fit(features, targets)
+    second = get_pipeline(n_estimators=10, verbose=-1).fit(features, targets)
+
+    assert store.latest_model_version("model") is None
+    assert store.load_model_metrics("model") is None
+    store.register_model("model", first, {"test_mae": 2.0}, features, targets)
+    store.register_model(
+        "model", second, {"test_mae": 1.0, "warm_starts": 1}, features, targets
+    )
+
+    assert store.latest_model_version("model") == 2
+    assert store.load_model_metrics("model") == {"test_mae": 1.0, "warm_starts": 1.0}
+    assert store.load_model_metrics("model", version=1) == {"test_mae": 2.0}
+    np.testing.assert_array_equal(
+        store.load_model("model", version=1).predict(features), first.predict(features)
+    )
+    np.testing.assert_array_equal(
+        store.load_model("model").predict(features), second.predict(features)
+    )
+    with pytest.raises(ValueError):
+        store.load_model("model", version=3)
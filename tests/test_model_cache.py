@@ -0,0 +1,125 @@
+import json
+
+import pytest
+
+import src.config as config
+from src.model_cache import ModelCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingRegistry:
+    """Registry test double that serves a dict per version and counts its requests."""
+
+    def __init__(self, latest=2):
+        self.latest = latest
+        self.loads = []
+        self.version_lookups = 0
+
+    def latest_model_version(self, name):
+        self.version_lookups += 1
+        return self.latest
+
+    def load_model(self, name, version):
+        self.loads.append(version)
+        return {"name": name, "version": version}
+
+
+@pytest.fixture(autouse=True)
+def no_pin(monkeypatch):
+    monkeypatch.setattr(config, "MODEL_VERSION_PIN", None)
+
+
+@pytest.fixture
+def registry():
+    return CountingRegistry()
+
+
+def test_miss_fetches_once_and_writes_the_manifest(tmp_path, registry):
+    cache = ModelCache(registry, cache_dir=tmp_path)
+
+    model = cache.get("taxi_demand", 1)
+
+    assert model == {"name": "taxi_demand", "version": 1}
+    assert cache.get("taxi_demand", 1) is model
+    assert registry.loads == [1]
+    manifest = json.loads((tmp_path / "taxi_demand" / "v1" / "model.json").read_text())
+    assert manifest["name"] == "taxi_demand"
+    assert manifest["version"] == 1
+    assert len(manifest["sha256"]) == 64
+
+
+def test_hit_in_a_new_process_reads_the_disk_cache(tmp_path, registry):
+    ModelCache(registry, cache_dir=tmp_path).get("taxi_demand", 1)
+
+    model = ModelCache(registry, cache_dir=tmp_path).get("taxi_demand", 1)
+
+    assert model == {"name": "taxi_demand", "version": 1}
+    assert registry.loads == [1]
+
+
+def test_corrupted_artifact_is_fetched_again(tmp_path, registry, capsys):
+    ModelCache(registry, cache_dir=tmp_path).get("taxi_demand", 1)
+    model_path = tmp_path / "taxi_demand" / "v1" / "model.pkl"
+    model_path.write_bytes(model_path.read_bytes()[:-1] + b"\x00")
+
+    model = ModelCache(registry, cache_dir=tmp_path).get("taxi_demand", 1)
+
+    assert model == {"name": "taxi_demand", "version": 1}
+    assert registry.loads == [1, 1]
+    assert "Checksum mismatch" in capsys.readouterr().out
+    # The re-fetched artifact is trusted again
+    ModelCache(registry, cache_dir=tmp_path).get("taxi_demand", 1)
+    assert registry.loads == [1, 1]
+
+
+def test_artifact_without_a_manifest_is_not_trusted(tmp_path, registry):
+    ModelCache(registry, cache_dir=tmp_path).get("taxi_demand", 1)
+    (tmp_path / "taxi_demand" / "v1" / "model.json").unlink()
+
+    ModelCache(registry, cache_dir=tmp_path).get("taxi_demand", 1)
+
+    assert registry.loads == [1, 1]
+
+
+def test_versions_are_cached_separately(tmp_path, registry):
+    cache = ModelCache(registry, cache_dir=tmp_path)
+
+    assert cache.get("taxi_demand", 1)["version"] == 1
+    assert cache.get("taxi_demand", 2)["version"] == 2
+    assert registry.loads == [1, 2]
+
+
+def test_latest_version_is_looked_up_again_after_the_check_interval(tmp_path, registry):
+    clock = FakeClock()
+    cache = ModelCache(registry, cache_dir=tmp_path, version_check_seconds=60, clock=clock)
+
+    assert cache.get("taxi_demand")["version"] == 2
+    registry.latest = 3
+    clock.now = 59
+    assert cache.get("taxi_demand")["version"] == 2
+    clock.now = 60
+    assert cache.get("taxi_demand")["version"] == 3
+    assert registry.version_lookups == 2
+
+
+def test_pinned_version_skips_the_registry_lookup(tmp_path, registry, monkeypatch):
+    monkeypatch.setattr(config, "MODEL_VERSION_PIN", 1)
+    cache = ModelCache(registry, cache_dir=tmp_path)
+
+    assert cache.get("taxi_demand")["version"] == 1
+    assert cache.get("taxi_demand", 2)["version"] == 2
+    assert registry.version_lookups == 0
+
+
+def test_no_registered_version(tmp_path):
+    cache = ModelCache(CountingRegistry(latest=None), cache_dir=tmp_path)
+
+    with pytest.raises(ValueError, match="No version of model taxi_demand"):
+        cache.get("taxi_demand")
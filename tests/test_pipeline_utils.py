@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data_utils import transform_ts_data_info_features_and_target
+from src.inference import get_model_predictions
+from src.pipeline_utils import (
+    BoosterPredictor,
+    build_training_matrix,
+    feature_frame,
+    get_booster_predictor,
+    get_pipeline,
+)
+
+
+@pytest.fixture
+def fitted(ts_data):
+    features, targets = transform_ts_data_info_features_and_target(
+        ts_data, window_size=24 * 28, step_size=1
+    )
+    pipeline = get_pipeline(n_estimators=20, num_leaves=15, verbose=-1)
+    pipeline.fit(features, targets)
+    return pipeline, features
+
+
+def test_booster_predictions_match_pipeline(fitted):
+    pipeline, features = fitted
+
+    np.testing.assert_array_equal(
+        BoosterPredictor(pipeline).predict(features), pipeline.predict(features)
+    )
+
+
+def test_model_predictions_through_booster_match_pipeline(fitted):
+    pipeline, features = fitted
+
+    through_booster = get_model_predictions(pipeline, features, use_booster=True)
+    through_pipeline = get_model_predictions(pipeline, features, use_booster=False)
+
+    assert get_booster_predictor(pipeline) is not None
+    assert through_booster.equals(through_pipeline)
+
+
+def test_feature_frame_rebuilds_rows_of_the_feature_table(ts_data):
+    features, _ = transform_ts_data_info_features_and_target(
+        ts_data, window_size=24 * 28, step_size=23
+    )
+    matrix, _, index, feature_names = build_training_matrix(
+        ts_data, window_size=24 * 28, step_size=23
+    )
+
+    pd.testing.assert_frame_equal(feature_frame(matrix, index, feature_names), features)
+
+    rows = (features["pickup_location_id"] == 43).to_numpy()
+    pd.testing.assert_frame_equal(
+        feature_frame(matrix, index, feature_names, rows), features[rows]
+    )
@@ -0,0 +1,122 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+import requests
+
+from src.prediction_service import FEATURE_COLUMNS, WINDOW_SIZE, PredictionService, serve
+
+ZONES = [4, 43, 132]
+
+
+class LastHourModel:
+    """Predicts the rides of the last hour of the window."""
+
+    def predict(self, features):
+        return features["rides_t-1"].to_numpy(np.float64)
+
+
+class FailingModel:
+    def predict(self, features):
+        raise RuntimeError("booster crashed")
+
+
+def latest_features(prediction_hour):
+    features = pd.DataFrame(
+        np.arange(len(ZONES))[:, None] + np.zeros((1, WINDOW_SIZE)), columns=FEATURE_COLUMNS
+    )
+    features["pickup_location_id"] = ZONES
+    features["pickup_hour"] = prediction_hour
+    return features
+
+
+def unreachable_store(prediction_hour):
+    raise ConnectionError("feature store unreachable")
+
+
+@pytest.fixture
+def start_server():
+    servers = []
+
+    def start(load_features=latest_features, model=LastHourModel()):
+        service = PredictionService(load_features=load_features, load_model=lambda: model)
+        server = serve(service, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_predicts_all_and_selected_zones(start_server):
+    url = start_server()
+
+    everything = requests.get(f"{url}/predict", timeout=10)
+    selected = requests.post(f"{url}/predict", json={"zones": [43]}, timeout=10)
+
+    assert everything.status_code == 200
+    assert [row["predicted_demand"] for row in everything.json()["predictions"]] == [0, 1, 2]
+    assert selected.status_code == 200
+    assert selected.json()["predictions"][0]["pickup_location_id"] == 43
+
+
+def test_what_if_rows(start_server):
+    url = start_server()
+    row = {
+        "pickup_location_id": 4,
+        "pickup_hour": "2025-01-01 10:00",
+        "rides": [7] * WINDOW_SIZE,
+    }
+
+    response = requests.post(f"{url}/predict", json={"rows": [row]}, timeout=10)
+
+    assert response.status_code == 200
+    assert response.json()["predictions"][0]["predicted_demand"] == 7
+
+
+@pytest.mark.parametrize(
+    "method,path,body,expected",
+    [
+        ("GET", "/predict?zone=999", None, 400),
+        ("GET", "/predict?zone=abc", None, 400),
+        ("POST", "/predict", "[43]", 400),
+        ("POST", "/predict", "{not json", 400),
+        ("POST", "/predict", '{"zones": 43}', 400),
+        ("POST", "/predict", '{"rows": [{"rides": [1, 2]}]}', 400),
+        ("GET", "/unknown", None, 404),
+        ("POST", "/unknown", "{}", 404),
+    ],
+)
+def test_client_errors(start_server, method, path, body, expected):
+    url = start_server()
+
+    response = requests.request(method, f"{url}{path}", data=body, timeout=10)
+
+    assert response.status_code == expected
+    assert "error" in response.json()
+
+
+@pytest.mark.parametrize(
+    "load_features,model",
+    [(unreachable_store, LastHourModel()), (latest_features, FailingModel())],
+)
+@pytest.mark.parametrize("method", ["GET", "POST"])
+def test_server_errors_are_500_json(start_server, load_features, model, method):
+    url = start_server(load_features, model)
+
+    response = requests.request(method, f"{url}/predict", data="{}", timeout=10)
+
+    assert response.status_code == 500
+    assert "Internal error" in response.json()["error"]
+
+
+def test_health_and_metrics(start_server):
+    url = start_server()
+    requests.get(f"{url}/predict", timeout=10)
+
+    assert requests.get(f"{url}/health", timeout=10).json() == {"status": "ok"}
+    assert requests.get(f"{url}/metrics", timeout=10).json()["requests"] == 1
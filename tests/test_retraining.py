@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data_utils import transform_ts_data_info_features_and_target
+from src.pipeline_utils import get_pipeline, warm_start_pipeline
+from src.retraining import (
+    choose_training_mode,
+    decayed_sample,
+    holdout_split,
+    rows_since,
+    score_new_rows,
+    trained_until,
+    warm_start_helped,
+)
+
+
+@pytest.fixture
+def feature_table(seasonal_ts_data):
+    return transform_ts_data_info_features_and_target(
+        seasonal_ts_data, window_size=24 * 28, step_size=1
+    )
+
+
+def last_days(features, days):
+    pickup_hours = pd.to_datetime(features["pickup_hour"])
+    return (pickup_hours > pickup_hours.max() - pd.Timedelta(days=days)).to_numpy()
+
+
+@pytest.mark.parametrize(
+    "metric,recent_mae,expected",
+    [
+        (None, 1.0, "full"),
+        ({"test_mae": 1.0}, 1.0, "full"),
+        ({"test_mae": 1.0, "trained_until": 0}, None, "full"),
+        ({"test_mae": 1.0, "trained_until": 0, "warm_starts": 4}, 1.0, "full"),
+        ({"test_mae": 1.0, "trained_until": 0}, 1.2, "full"),
+        ({"test_mae": 1.0, "trained_until": 0}, 1.05, "warm"),
+        ({"test_mae": 1.0, "trained_until": 0, "warm_starts": 3}, 0.9, "warm"),
+    ],
+)
+def test_choose_training_mode(metric, recent_mae, expected):
+    mode, reason = choose_training_mode(metric, recent_mae, max_drift=0.1, max_warm_starts=4)
+
+    assert mode == expected
+    assert reason
+
+
+def test_rows_since_matches_trained_until(feature_table):
+    features, _ = feature_table
+    seen = ~last_days(features, 3)
+
+    assert np.array_equal(rows_since(features, trained_until(features[seen])), ~seen)
+    # Timezone-aware pickup hours compare in UTC as well
+    aware = features.assign(pickup_hour=features["pickup_hour"].dt.tz_localize("UTC"))
+    assert np.array_equal(rows_since(aware, trained_until(features[seen])), ~seen)
+
+
+def test_decayed_sample_keeps_new_rows_and_fewer_old_ones(feature_table):
+    features, targets = feature_table
+    new_rows = last_days(features, 3)
+
+    only_new, only_new_targets = decayed_sample(features, targets, new_rows)
+    sampled, _ = decayed_sample(features, targets, new_rows, half_life_days=2)
+
+    assert only_new.index.equals(features.index[new_rows])
+    assert only_new_targets.index.equals(only_new.index)
+    assert set(features.index[new_rows]) <= set(sampled.index)
+    old_hours = pd.to_datetime(sampled.loc[~new_rows[sampled.index], "pickup_hour"])
+    first_new_hour = pd.to_datetime(features["pickup_hour"][new_rows]).min()
+    recent = (old_hours > first_new_hour - pd.Timedelta(days=2)).sum()
+    older = (old_hours <= first_new_hour - pd.Timedelta(days=10)).sum()
+    assert recent > 0
+    # Rows 10+ days older than the new ones are kept with probability below 3%
+    assert older < 0.1 * (~new_rows).sum()
+
+
+def test_score_new_rows(feature_table):
+    features, targets = feature_table
+    pipeline = get_pipeline(n_estimators=10, verbose=-1).fit(features, targets)
+    new_rows = last_days(features, 3)
+
+    assert score_new_rows(pipeline, features, targets, np.zeros(len(features), bool)) is None
+    expected = np.abs(pipeline.predict(features[new_rows]) - targets[new_rows]).mean()
+    assert score_new_rows(pipeline, features, targets, new_rows) == pytest.approx(expected)
+
+
+def test_holdout_split_holds_out_the_last_new_days(feature_table):
+    features, _ = feature_table
+    new_rows = last_days(features, 5)
+
+    fit_rows, holdout_rows = holdout_split(features, new_rows, holdout_days=2)
+
+    assert np.array_equal(holdout_rows, last_days(features, 2))
+    assert np.array_equal(fit_rows | holdout_rows, new_rows)
+    assert not (fit_rows & holdout_rows).any()
+
+
+def test_a_warm_start_that_hurts_is_detected(feature_table):
+    features, targets = feature_table
+    new_rows = last_days(features, 5)
+    registered = get_pipeline(n_estimators=50, num_leaves=15, verbose=-1).fit(
+        features[~new_rows], targets[~new_rows]
+    )
+    fit_rows, holdout_rows = holdout_split(features, new_rows, holdout_days=2)
+
+    # Continuing on shuffled targets can only make the model worse
+    shuffled = pd.Series(
+        np.random.default_rng(0).permutation(targets[fit_rows].to_numpy()) * 3,
+        index=targets[fit_rows].index,
+    )
+    hurt = warm_start_pipeline(registered, features[fit_rows], shuffled, n_estimators=50)
+    helped, hurt_mae, registered_mae = warm_start_helped(
+        hurt, registered, features, targets, holdout_rows
+    )
+
+    assert not helped
+    assert hurt_mae > registered_mae
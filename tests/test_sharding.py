@@ -0,0 +1,91 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data_utils import transform_ts_data_info_features_and_target
+from src.inference import get_model_predictions
+from src.pipeline_utils import get_pipeline
+from src.sharding import map_shards, split_zones
+from src.time_series import TimeSeriesTensor
+
+
+@pytest.mark.parametrize("n_shards", [1, 2, 3, 5, 10])
+def test_split_zones_covers_every_row_with_whole_zones(n_shards):
+    rng = np.random.default_rng(0)
+    location_ids = rng.choice([7, 3, 11, 5, 2], size=200)
+
+    shards = split_zones(location_ids, n_shards)
+
+    assert len(shards) == min(n_shards, 5)
+    np.testing.assert_array_equal(np.sort(np.concatenate(shards)), np.arange(200))
+    for rows in shards:
+        assert (np.diff(rows) > 0).all()
+    zones_of_shards = [set(location_ids[rows]) for rows in shards]
+    assert sum(len(zones) for zones in zones_of_shards) == 5
+
+
+def test_split_zones_keeps_the_order_of_first_appearance():
+    location_ids = np.array([7, 7, 3, 11, 3, 5, 2, 7, 2, 5])
+
+    shards = split_zones(location_ids, 3)
+
+    assert [list(dict.fromkeys(location_ids[rows])) for rows in shards] == [[7, 3], [11, 5], [2]]
+
+
+def test_split_zones_drops_rows_without_a_location():
+    location_ids = np.array([4.0, np.nan, 43.0, 4.0, np.nan])
+
+    shards = split_zones(location_ids, 2)
+
+    np.testing.assert_array_equal(np.concatenate(shards), [0, 3, 2])
+
+
+def test_split_zones_of_no_rows():
+    assert split_zones(np.array([], dtype=np.int16), 4) == []
+
+
+_worker_offset = {}
+
+
+def _init_worker(offset):
+    _worker_offset["offset"] = offset
+
+
+def _add_offset(shard):
+    return [value + _worker_offset["offset"] for value in shard], os.getpid()
+
+
+def test_map_shards_returns_results_in_shard_order():
+    shards = [[i] * (5 - i) for i in range(5)]
+
+    results = map_shards(_add_offset, shards, n_jobs=2, initializer=_init_worker, initargs=(10,))
+
+    assert [values for values, _ in results] == [[i + 10] * (5 - i) for i in range(5)]
+    assert os.getpid() not in {pid for _, pid in results}
+
+
+@pytest.mark.parametrize("as_tensor", [False, True])
+def test_sharded_feature_table_is_identical(ts_data, as_tensor):
+    data = TimeSeriesTensor.from_long(ts_data) if as_tensor else ts_data
+
+    features, targets = transform_ts_data_info_features_and_target(data, window_size=24 * 7)
+    sharded_features, sharded_targets = transform_ts_data_info_features_and_target(
+        data, window_size=24 * 7, n_jobs=3
+    )
+
+    pd.testing.assert_frame_equal(sharded_features, features)
+    pd.testing.assert_series_equal(sharded_targets, targets)
+
+
+def test_sharded_predictions_go_back_to_their_rows(ts_data):
+    features, targets = transform_ts_data_info_features_and_target(ts_data, window_size=24 * 28)
+    model = get_pipeline(n_estimators=20, num_leaves=15, verbose=-1).fit(features, targets)
+    # Interleave the zones, so shards are not contiguous runs of rows
+    shuffled = features.sample(frac=1, random_state=0).reset_index(drop=True)
+
+    pd.testing.assert_frame_equal(
+        get_model_predictions(model, shuffled, n_jobs=3),
+        get_model_predictions(model, shuffled),
+    )
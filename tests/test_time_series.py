@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.time_series import TimeSeriesTensor
+
+
+def test_long_round_trip(ts_data):
+    shuffled = ts_data.sample(frac=1, random_state=0)
+
+    tensor = TimeSeriesTensor.from_long(shuffled)
+
+    assert tensor.values.shape == (24 * 35, 4)
+    assert tensor.values.dtype == np.int16
+    assert tensor.zone_ids.tolist() == [4, 43, 132, 161]
+    expected = ts_data.sort_values(["pickup_location_id", "pickup_hour"], ignore_index=True)
+    pd.testing.assert_frame_equal(tensor.to_long(), expected)
+
+
+def test_from_long_fills_gaps_and_drops_other_zones(ts_data):
+    sparse = ts_data.iloc[::3]
+    start, end = pd.Timestamp("2024-12-31 23:00"), pd.Timestamp("2025-01-02")
+
+    tensor = TimeSeriesTensor.from_long(sparse, zone_ids=[4, 43, 7], start=start, end=end)
+
+    assert tensor.zone_ids.tolist() == [4, 7, 43]
+    assert tensor.start == start and tensor.end == end
+    long = tensor.to_long().merge(sparse, on=["pickup_hour", "pickup_location_id"], how="left")
+    observed = long["rides_y"].notna()
+    assert (long.loc[observed, "rides_x"] == long.loc[observed, "rides_y"]).all()
+    assert (long.loc[~observed, "rides_x"] == 0).all()
+    assert observed.sum() == len(
+        sparse[sparse["pickup_location_id"].isin([4, 43]) & (sparse["pickup_hour"] < end)]
+    )
+
+
+def test_from_long_of_empty_data_needs_a_range(ts_data):
+    with pytest.raises(ValueError):
+        TimeSeriesTensor.from_long(ts_data.iloc[:0])
+
+    tensor = TimeSeriesTensor.from_long(
+        ts_data.iloc[:0], zone_ids=[4], start="2025-01-01", end="2025-01-02"
+    )
+    assert tensor.values.shape == (24, 1) and not tensor.values.any()
+
+
+def test_from_rides_counts_rides_per_hour_and_zone():
+    rides = pd.DataFrame(
+        {
+            "pickup_datetime": pd.to_datetime(
+                ["2025-01-01 00:10", "2025-01-01 00:50", "2025-01-01 02:00", "2025-01-01 00:30"]
+            ),
+            "pickup_location_id": [4, 4, 4, 43],
+        }
+    )
+
+    tensor = TimeSeriesTensor.from_rides(rides)
+
+    np.testing.assert_array_equal(tensor.values, [[2, 1], [0, 0], [1, 0]])
+    assert tensor.start == pd.Timestamp("2025-01-01")
+
+
+def test_slice_hours_is_a_clipped_view(ts_data):
+    tensor = TimeSeriesTensor.from_long(ts_data)
+
+    day = tensor.slice_hours("2025-01-02", "2025-01-03")
+    clipped = tensor.slice_hours("2024-12-01", "2025-01-01 05:00")
+
+    assert day.n_hours == 24 and day.start == pd.Timestamp("2025-01-02")
+    assert np.shares_memory(day.values, tensor.values)
+    np.testing.assert_array_equal(day.values, tensor.values[24:48])
+    assert clipped.start == tensor.start and clipped.n_hours == 5
+    assert tensor.slice_hours("2026-01-01").n_hours == 0
+
+
+def test_window_zero_fills_outside_the_range(ts_data):
+    tensor = TimeSeriesTensor.from_long(ts_data)
+
+    window = tensor.window("2025-01-01 03:00", 5)
+    assert window.shape == (4, 5)
+    np.testing.assert_array_equal(window[:, :2], 0)
+    np.testing.assert_array_equal(window[:, 2:], tensor.values[:3].T)
+
+    after = tensor.window(tensor.end + pd.Timedelta(hours=1), 3)
+    np.testing.assert_array_equal(after[:, :2], tensor.values[-2:].T)
+    np.testing.assert_array_equal(after[:, 2], 0)
+
+
+def test_zone_access_and_selection(ts_data):
+    tensor = TimeSeriesTensor.from_long(ts_data)
+
+    selected = tensor.select_zones([161, 4])
+
+    assert selected.zone_ids.tolist() == [4, 161]
+    np.testing.assert_array_equal(selected.zone(161), tensor.zone(161))
+    np.testing.assert_array_equal(
+        tensor.zone(43),
+        ts_data.loc[ts_data["pickup_location_id"] == 43, "rides"].to_numpy(),
+    )
+    with pytest.raises(KeyError):
+        tensor.zone(5)
+
+
+def test_hours_must_be_on_the_grid(ts_data):
+    tensor = TimeSeriesTensor.from_long(ts_data)
+
+    assert tensor.hour_index("2025-01-02") == 24
+    with pytest.raises(ValueError):
+        tensor.hour_index("2025-01-02 00:30")
+    with pytest.raises(ValueError):
+        TimeSeriesTensor(np.zeros((3, 2), dtype=np.int16), "2025-01-01", [43, 4])
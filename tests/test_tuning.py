@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import tuning
+from src.data_utils import transform_ts_data_info_features_and_target
+
+
+@pytest.fixture
+def feature_table(ts_data):
+    return transform_ts_data_info_features_and_target(ts_data, window_size=24 * 28, step_size=1)
+
+
+def test_validation_split_takes_the_end_of_the_training_period(feature_table):
+    features, _ = feature_table
+    pickup_hours = pd.to_datetime(features["pickup_hour"])
+    (train_rows, test_rows), = tuning.time_series_folds(
+        features["pickup_hour"], n_folds=1, test_days=2
+    )
+
+    fit_rows, validation_rows = tuning.validation_split(
+        features["pickup_hour"], train_rows, validation_days=3
+    )
+
+    assert np.array_equal(np.sort(np.concatenate([fit_rows, validation_rows])), train_rows)
+    assert pickup_hours[fit_rows].max() < pickup_hours[validation_rows].min()
+    assert pickup_hours[validation_rows].max() < pickup_hours[test_rows].min()
+    assert pickup_hours[validation_rows].nunique() == 3 * 24
+
+
+def test_early_stopping_does_not_watch_the_test_rows(monkeypatch, tmp_path, feature_table):
+    features, targets = feature_table
+    folds = tuning.time_series_folds(features["pickup_hour"], n_folds=2, test_days=2)
+    test_rows_of = {tuple(train_rows): test_rows for train_rows, test_rows in folds}
+    fits = []
+    fit_booster = tuning.fit_booster
+
+    def recording_fit_booster(training_matrix, params, train_rows, valid_rows, *args):
+        fits.append((train_rows, valid_rows))
+        return fit_booster(training_matrix, params, train_rows, valid_rows, *args)
+
+    monkeypatch.setattr(tuning, "fit_booster", recording_fit_booster)
+    result = tuning.tune_hyperparameters(
+        features,
+        targets,
+        n_candidates=3,
+        n_folds=2,
+        test_days=2,
+        validation_days=1,
+        min_estimators=5,
+        max_estimators=15,
+        early_stopping_rounds=2,
+        cache_dir=tmp_path,
+    )
+
+    assert result["best_params"]["n_estimators"] <= 15
+    assert fits
+    for fit_rows, valid_rows in fits:
+        test_rows = test_rows_of[tuple(np.sort(np.concatenate([fit_rows, valid_rows])))]
+        assert not np.intersect1d(fit_rows, valid_rows).size
+        assert not np.intersect1d(valid_rows, test_rows).size
+
+
+def test_prune_keeps_only_the_current_matrix(tmp_path, feature_table):
+    features, targets = feature_table
+    old = tuning.cache_feature_matrix(features.iloc[:100], targets.iloc[:100], tmp_path)
+    current = tuning.cache_feature_matrix(features, targets, tmp_path)
+
+    stale = tuning.prune_training_matrices(current, tmp_path)
+
+    names = ("matrix_path", "targets_path", "dataset_path")
+    assert sorted(stale) == sorted(old[name] for name in names)
+    assert sorted(tmp_path.iterdir()) == sorted(current[name] for name in names)